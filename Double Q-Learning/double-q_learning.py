@@ -1,5 +1,18 @@
+import os
+import sys
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rl_utils.action_selection import EpsilonGreedy, epsilon_greedy_one
+from rl_utils.batched_td import scatter_td_update
+from rl_utils.compiled_tables import grid_tables
+from rl_utils.instrumentation import EPISODE, clock
+from rl_utils.rng import make_rng
+from rl_utils.state_encoding import GridEncoder
+from rl_utils.training_control import TrainingControl
+from rl_utils.vector_gridworld import VectorGridWorld
+
 
 # Environment
 class Environment:
@@ -10,35 +23,19 @@ class Environment:
         self.terminal_state = (rows - 1, cols - 1)
         self.current_state = None
 
+        # dynamics compiled once (actions 0=up, 1=right, 2=left, 3=down, stay in place at
+        # the border); step() is a lookup in the compiled tables
+        self._outcomes = grid_tables(rows, cols, self.terminal_state).cell_outcomes(cols)
+
     def reset(self):
         self.current_state = self.start
         return self.current_state
 
     def step(self, action):
-        row, col = self.current_state
-
-        if action == 0:      # up
-            new_row, new_col = row - 1, col
-        elif action == 1:    # right
-            new_row, new_col = row, col + 1
-        elif action == 2:    # left
-            new_row, new_col = row, col - 1
-        elif action == 3:    # down
-            new_row, new_col = row + 1, col
-        else:
-            raise ValueError("Invalid action")
-
-        # boundary handling
-        if new_row < 0 or new_row >= self.rows or new_col < 0 or new_col >= self.cols:
-            new_row, new_col = row, col
-
-        next_state = (new_row, new_col)
-
-        if next_state == self.terminal_state:
-            reward, done = 0, True
-        else:
-            reward, done = -1, False
-
+        try:
+            next_state, reward, done = self._outcomes[self.current_state][action]
+        except IndexError:
+            raise ValueError("Invalid action") from None
         self.current_state = next_state
         return next_state, reward, done
 
@@ -46,32 +43,74 @@ class Environment:
 
 # Agent (Double Q-learning)
 class Agent:
-    def __init__(self, rows, cols, num_actions, alpha, gamma):
-        self.Q_A = np.zeros((rows, cols, num_actions))
-        self.Q_B = np.zeros((rows, cols, num_actions))
+    def __init__(self, rows, cols, num_actions, alpha, gamma, rng=None, encoder=None, table=None):
+        # both tables are (num_states, num_actions), indexed by int state ids; or pass
+        # table=rl_utils.hashed_q.HashedQTable(num_actions, num_tables=2) to allocate rows
+        # on first visit (Q_A / Q_B are its two tables, indexed by self.rows(state ids))
+        self.encoder = encoder if encoder is not None else GridEncoder(rows, cols)
+        self.table = table
+        if table is None:
+            self._tables = (np.zeros((self.encoder.num_states, num_actions)),
+                            np.zeros((self.encoder.num_states, num_actions)))
         self.alpha = alpha
         self.gamma = gamma
+        self.rng = make_rng(rng)       # coin flips (seed or rl_utils.rng stream)
+        self.td_error = 0.0            # of the last update()
 
-    def update(self, state, action, reward, next_state, done):
-        r, c = state
-        nr, nc = next_state
+    @property
+    def Q_A(self):
+        return self._tables[0] if self.table is None else self.table.tables[0]
+
+    @property
+    def Q_B(self):
+        return self._tables[1] if self.table is None else self.table.tables[1]
 
-        if np.random.rand() < 0.5:
+    def rows(self, state_ids):
+        """Q row of every state id: the id itself, or its hashed-table row."""
+        return state_ids if self.table is None else self.table.lookup(state_ids)
+
+    def update(self, state, action, reward, next_state, done):
+        # state / next_state are Q rows (self.rows(agent.encoder.encode(...)));
+        # returns the change made to the updated table
+        if self.rng.random() < 0.5:
             # update Q_A
-            best_action = np.argmax(self.Q_A[nr, nc])
+            best_action = self.Q_A[next_state].argmax()
             target = reward
             if not done:
-                target += self.gamma * self.Q_B[nr, nc, best_action]
+                target += self.gamma * self.Q_B[next_state, best_action]
 
-            self.Q_A[r, c, action] += self.alpha * (target - self.Q_A[r, c, action])
+            self.td_error = target - self.Q_A[state, action]
+            delta = self.alpha * self.td_error
+            self.Q_A[state, action] += delta
         else:
             # update Q_B
-            best_action = np.argmax(self.Q_B[nr, nc])
+            best_action = self.Q_B[next_state].argmax()
             target = reward
             if not done:
-                target += self.gamma * self.Q_A[nr, nc, best_action]
+                target += self.gamma * self.Q_A[next_state, best_action]
+
+            self.td_error = target - self.Q_B[state, action]
+            delta = self.alpha * self.td_error
+            self.Q_B[state, action] += delta
+        return delta
 
-            self.Q_B[r, c, action] += self.alpha * (target - self.Q_B[r, c, action])
+    def update_batch(self, states, actions, rewards, next_states, dones, duplicates="sequential"):
+        Q_A, Q_B = self.Q_A, self.Q_B
+
+        # vectorized coin flip: True -> update Q_A, False -> update Q_B
+        update_a = self.rng.generator.random(len(states)) < 0.5
+        update_b = ~update_a
+        not_done = 1.0 - dones
+
+        # both targets come from the tables as they were before this batch
+        ns_a, ns_b = next_states[update_a], next_states[update_b]
+        best_a = np.argmax(Q_A[ns_a], axis=1)
+        target_a = rewards[update_a] + self.gamma * not_done[update_a] * Q_B[ns_a, best_a]
+        best_b = np.argmax(Q_B[ns_b], axis=1)
+        target_b = rewards[update_b] + self.gamma * not_done[update_b] * Q_A[ns_b, best_b]
+
+        scatter_td_update(Q_A, states[update_a], actions[update_a], target_a, self.alpha, duplicates)
+        scatter_td_update(Q_B, states[update_b], actions[update_b], target_b, self.alpha, duplicates)
 
 
 
@@ -79,10 +118,9 @@ class Agent:
 
  
 # Epsilon-greedy policy
-def epsilon_greedy_policy(q_values, epsilon):
-    if np.random.rand() < epsilon:
-        return np.random.randint(len(q_values))
-    return np.argmax(q_values)
+def epsilon_greedy_policy(q_values, epsilon, rng=None):
+    # greedy ties are broken at random (rl_utils.action_selection)
+    return epsilon_greedy_one(np.asarray(q_values).tolist(), epsilon, make_rng(rng))
 
 
 
@@ -91,24 +129,87 @@ def epsilon_greedy_policy(q_values, epsilon):
 
 
 # Training loop
-def train_double_qlearning(episodes, rows, cols, num_actions, epsilon, gamma, alpha):
+def train_double_qlearning(episodes, rows, cols, num_actions, epsilon, gamma, alpha, rng=None, explorer=None,
+                           table=None, returns=None, agent=None, control=None, instrument=None):
+    # explorer: behaviour policy from rl_utils.action_selection (default epsilon-greedy)
+    # table: optional rl_utils.hashed_q.HashedQTable with num_tables=2 (see Agent)
+    # returns: optional list, gets the total reward of every episode appended
+    # agent: continue training this agent for `episodes` more (its rng is used)
+    # control: rl_utils.training_control.TrainingControl (budgets, per-episode step cap,
+    #          convergence criteria; the greedy policy is that of Q_A + Q_B); `episodes`
+    #          caps the run too, pass None to rely on control alone
+    # instrument: rl_utils.instrumentation.Recorder (phase timers, visits, TD errors)
+    control = (control if control is not None else TrainingControl()).start(episodes)
+    rec = instrument
     env = Environment(rows, cols)
-    agent = Agent(rows, cols, num_actions, alpha, gamma)
+    if agent is None:
+        agent = Agent(rows, cols, num_actions, alpha, gamma, make_rng(rng), table=table)
+    rng = agent.rng
+    if explorer is None:
+        explorer = EpsilonGreedy(epsilon, rng)
 
 
-    for _ in range(episodes):
-        state = env.reset()
+    encode = lambda obs: agent.rows(agent.encoder.encode(obs))
+    while not control.stopped:
+        started = clock() if rec else 0
+        state = encode(env.reset())
         done = False
+        total = 0.0
 
         while not done:
-            # combine Q-values ONLY for behavior
-            combined_q = agent.Q_A[state] + agent.Q_B[state]
+            # combine Q-values ONLY for behavior (Q_A + Q_B)
+            t0 = clock() if rec else 0
+            action = explorer.select_one((agent.Q_A, agent.Q_B), state)
+            t1 = clock() if rec else 0
+            next_obs, reward, done = env.step(action)
+            next_state = encode(next_obs)
+            total += reward
+
+            t2 = clock() if rec else 0
+            delta = agent.update(state, action, reward, next_state, done)
+            control.update(state, delta, agent.Q_A[state] + agent.Q_B[state] if control.tracks_policy else None)
+            if rec:
+                rec.step(state, agent.td_error, t0, t1, t2, clock())
+            state = next_state
+            if control.step():
+                break
 
-            action = epsilon_greedy_policy(combined_q, epsilon)
-            next_state, reward, done = env.step(action)
+        if returns is not None:
+            returns.append(total)
+        if rec:
+            rec.span(EPISODE, started, clock())
+        control.end_episode(truncated=not done)
 
-            agent.update(state, action, reward, next_state, done)
-            state = next_state
+    if rec:
+        rec.add("episodes", control.episode)
+        rec.add("steps", control.steps)
+        rec.add("backups", control.steps)
+
+    return agent
+
+
+
+# Vectorized training loop (one transition per environment per step)
+def train_double_qlearning_vectorized(steps, num_envs, rows, cols, num_actions, epsilon, gamma, alpha,
+                                      duplicates="sequential", env=None, agent=None, reset=True, rng=None,
+                                      explorer=None):
+    # pass env (e.g. a generated maze, rl_utils/maze_generator.py) and/or agent to train on
+    # another layout or continue training; reset=False keeps the env's running episodes
+    if env is None:
+        env = VectorGridWorld(num_envs, rows, cols)
+    if agent is None:
+        agent = Agent(env.rows, env.cols, env.num_actions, alpha, gamma, rng)
+    if explorer is None:
+        explorer = EpsilonGreedy(epsilon, agent.rng)
+
+    states = env.reset() if reset else env.states
+    for _ in range(steps):
+        rows = agent.rows(states)
+        actions = explorer.select((agent.Q_A, agent.Q_B), rows)
+        next_states, rewards, dones = env.step(actions)
+
+        agent.update_batch(rows, actions, rewards, agent.rows(next_states), dones, duplicates)
+        states = env.states
 
     return agent
 
@@ -123,7 +224,11 @@ if __name__ == "__main__":
 
     print("Q_A shape:", agent.Q_A.shape)
     print("Q_B shape:", agent.Q_B.shape)
-    print("Combined Q:", Q_combined)
+    print("Combined Q:", agent.encoder.grid(Q_combined))
     print(agent.Q_A, agent.Q_B)
 
+    vec_agent = train_double_qlearning_vectorized(steps=200, num_envs=256, rows=10, cols=5, num_actions=4,
+                                                  epsilon=0.1, gamma=0.99, alpha=0.1)
+    print("Combined Q (vectorized):", vec_agent.encoder.grid(vec_agent.Q_A + vec_agent.Q_B))
+
    
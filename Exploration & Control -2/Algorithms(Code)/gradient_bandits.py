@@ -1,45 +1,97 @@
 ## Gradient Bandits with Baseline Implementation
 
+import os
+import sys
+
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from rl_utils.alias_sampling import AliasTable
+from rl_utils.bandit_testbed import run_batched
+from rl_utils.instrumentation import clock
+from rl_utils.rng import make_rng, stream
+
 
 class BanditEnv():
-    def __init__(self, true_rewards):
-        self.true_rewards = np.array(true_rewards)
+    def __init__(self, true_rewards, rng=None):
+        self.true_rewards = np.array(true_rewards)   # shape (K,), or (B, K) for B problems at once
         self.std = 1.0
+        self.rng = make_rng(rng)   # seed or rl_utils.rng stream (None -> shared global stream)
         
 
     def give_reward(self, action):
         """Returns noisy reward for the chosen action"""
-        reward = np.random.normal(self.true_rewards[action], self.std)
+        reward = self.rng.normal(self.true_rewards[action], self.std)
         return reward
+
+
+    def rewards_batch(self, actions):
+        """One noisy reward per problem, shape (B,)"""
+        means = self.true_rewards[np.arange(len(actions)), actions]
+        return means + self.std * self.rng.generator.standard_normal(len(actions))
     
 
 class BanditAgent():
-    def __init__(self, number_of_actions):
-        self.preferences = np.zeros(number_of_actions)
+    def __init__(self, number_of_actions, num_runs=None, alpha=0.01, sampler="softmax", refresh_every=100, rng=None):
+        # num_runs=B keeps B independent agents: (B, K) preferences and (B,) baselines
+        self.preferences = np.zeros(number_of_actions if num_runs is None else (num_runs, number_of_actions))
         self.k_actions = number_of_actions
-        self.average_reward = 0
+        self.average_reward = 0 if num_runs is None else np.zeros(num_runs)
         self.n = 0
-        self.alpha = 0.01
+        self.alpha = alpha
+        self.rng = make_rng(rng)
+
+        # softmax(preferences), computed once per step and shared by select and update
+        self._probabilities = None
+
+        # sampler="alias" (single agent, very large K): draw in O(1) from an alias table
+        # rebuilt every `refresh_every` updates; the update then uses the table's
+        # probabilities (the policy the action was actually drawn from)
+        if sampler not in ("softmax", "alias"):
+            raise ValueError("sampler must be 'softmax' or 'alias'")
+        self.sampler = sampler
+        self.refresh_every = refresh_every
+        self._alias = None
+        self._alias_age = 0
 
 
     def softmax(self, preferences):
-        """Convert preferences to probabilities"""
-        exp_preferences = np.exp(preferences - np.max(preferences))  
-        probabilities = exp_preferences / np.sum(exp_preferences)
+        """Convert preferences to probabilities (row-wise for (B, K) preferences)"""
+        exp_preferences = np.exp(preferences - np.max(preferences, axis=-1, keepdims=True))
+        probabilities = exp_preferences / np.sum(exp_preferences, axis=-1, keepdims=True)
         return probabilities
+
+
+    def probabilities(self):
+        """Cached softmax of the current preferences"""
+        if self._probabilities is None:
+            self._probabilities = self.softmax(self.preferences)
+        return self._probabilities
+
+
+    def behaviour_probabilities(self):
+        """Probabilities the next action is drawn with (and the update uses)"""
+        if self.sampler == "softmax":
+            return self.probabilities()
+        if self._alias is None or self._alias_age >= self.refresh_every:
+            self._alias = AliasTable(self.probabilities())
+            self._alias_age = 0
+        return self._alias.probabilities
     
 
     def select_action(self):
         """Select action based on softmax probabilities"""
-        probabilities = self.softmax(self.preferences)
-        action = np.random.choice(self.k_actions, p=probabilities)
-        return action
+        probabilities = self.behaviour_probabilities()
+        if self.sampler == "alias":
+            return self._alias.sample(rng=self.rng)
+        # inverse CDF: same distribution as np.random.choice(k, p=probabilities), without its checks
+        action = int(np.searchsorted(np.cumsum(probabilities), self.rng.random() * probabilities.sum(), side="right"))
+        return min(action, self.k_actions - 1)
     
 
     def update(self, action, reward):
-        """Update preferences based on received reward"""
+        """Update preferences based on received reward; returns the error the step used"""
         self.n += 1
         
         # Baseline update (incremental average)
@@ -48,22 +100,45 @@ class BanditAgent():
         # Error (how much better/worse than baseline)
         error = reward - self.average_reward
 
-        # Get current probabilities
-        probability = self.softmax(self.preferences)
+        # Probabilities the action was selected with (cached by select_action)
+        probability = self.behaviour_probabilities()
+
+        # H_a += alpha * error * (1[a == action] - pi_a), for all actions at once
+        step = self.alpha * error
+        self.preferences -= step * probability
+        self.preferences[action] += step
+
+        self._probabilities = None
+        self._alias_age += 1
+        return error
 
-        # Update preferences for all actions
-        for a in range(self.k_actions):
-            if a == action:
-                # BUG FIX: Use self.alpha, not alpha
-                self.preferences[a] += self.alpha * error * (1 - probability[a])
-            else: 
-                # BUG FIX: Use self.alpha, not alpha
-                self.preferences[a] -= self.alpha * error * probability[a]
 
+    def select_batch(self):
+        """One softmax draw per problem (inverse CDF with one uniform per row)"""
+        cumulative = np.cumsum(self.probabilities(), axis=1)
+        u = self.rng.generator.random((len(cumulative), 1)) * cumulative[:, -1:]
+        return np.minimum((cumulative < u).sum(axis=1), self.k_actions - 1)
 
 
-def run_experiment(n_times):
-    """Run the gradient bandit experiment"""
+    def update_batch(self, actions, rewards):
+        """Same update as `update`, for every problem at once"""
+        self.n += 1
+        self.average_reward += (rewards - self.average_reward) / self.n
+        error = rewards - self.average_reward
+
+        step = self.alpha * error
+        self.preferences -= step[:, None] * self.probabilities()
+        self.preferences[np.arange(len(actions)), actions] += step
+        self._probabilities = None
+
+
+
+def run_experiment(n_times, instrument=None):
+    """
+    Run the gradient bandit experiment.
+    instrument: rl_utils.instrumentation.Recorder; arm pulls go to its visit histogram and
+    the error of each preference step (reward - updated baseline) to its TD-error statistics
+    """
     true_rewards = [1.25, 2.5, 2.0, 1.75]
     env = BanditEnv(true_rewards)
     # BUG FIX: Pass number of actions (length), not the list itself
@@ -71,13 +146,60 @@ def run_experiment(n_times):
 
     total_reward = 0
     
+    rec = instrument
     for i in range(n_times):
+        t0 = clock() if rec else 0
         action = agent.select_action()
+        t1 = clock() if rec else 0
         reward = env.give_reward(action)
-        agent.update(action, reward)
+        t2 = clock() if rec else 0
+        error = agent.update(action, reward)
+        if rec:
+            rec.step(action, error, t0, t1, t2, clock())
         total_reward += reward
 
+    if rec:
+        rec.add("steps", n_times)
+
     # Return useful information
     return agent.preferences, agent.softmax(agent.preferences), total_reward / n_times
 
 
+def run_testbed(num_runs=2000, n_times=1000, number_of_actions=10, alpha=0.1, mean_offset=4.0, seed=None):
+    """
+    Gradient bandit on num_runs problems at once (true means ~ N(mean_offset, 1), as in the
+    Sutton & Barto experiment where the baseline matters).
+    Returns rl_utils.bandit_testbed.TestbedResults with (num_runs, n_times) arrays.
+    """
+    env_rng, agent_rng = stream(seed, 0), stream(seed, 1)
+    true_rewards = env_rng.generator.standard_normal((num_runs, number_of_actions)) + mean_offset
+    env = BanditEnv(true_rewards, rng=env_rng)
+    agent = BanditAgent(number_of_actions, num_runs=num_runs, alpha=alpha, rng=agent_rng)
+    return run_batched(agent, env.rewards_batch, true_rewards, n_times)
+
+
+def time_large_action_set(k_actions=100_000, n_times=2000, refresh_every=500, seed=None):
+    """Seconds per select+update step with a huge action set, exact softmax vs lazily refreshed alias table"""
+    import time
+
+    env_rng = stream(seed, 0)
+    true_rewards = env_rng.generator.standard_normal(k_actions)
+    env = BanditEnv(true_rewards, rng=env_rng)
+    timings = {}
+    for sampler in ("softmax", "alias"):
+        agent = BanditAgent(k_actions, alpha=0.1, sampler=sampler, refresh_every=refresh_every, rng=stream(seed, 1))
+        start = time.perf_counter()
+        for _ in range(n_times):
+            action = agent.select_action()
+            agent.update(action, env.give_reward(action))
+        timings[sampler] = (time.perf_counter() - start) / n_times
+    return timings
+
+
+if __name__ == "__main__":
+    results = run_testbed()
+    print(f"gradient bandit alpha=0.1: optimal action {results.optimal_fraction()[-100:].mean():.1%}, "
+          f"regret {results.cumulative_regret()[-1]:.1f}")
+
+    for sampler, seconds in time_large_action_set().items():
+        print(f"100000 arms, {sampler:>7} sampler: {seconds * 1e6:.0f} us per step")
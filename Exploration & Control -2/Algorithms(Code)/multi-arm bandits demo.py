@@ -2,34 +2,53 @@
 
 
 
+import os
+import sys
+
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from rl_utils.bandit_testbed import run_batched
+from rl_utils.instrumentation import clock
+from rl_utils.rng import make_rng, stream
+
 class MultiArmEnv:
-    def __init__(self, true_mean_of_rewards):
-        self.true_mean_of_rewards = np.array(true_mean_of_rewards)   ##  this will be the alread known true value or rewards
+    def __init__(self, true_mean_of_rewards, rng=None):
+        self.rng = make_rng(rng)   ## seed or rl_utils.rng stream (None -> shared global stream)
+        self.true_mean_of_rewards = np.array(true_mean_of_rewards)   ##  this will be the alread known true value or rewards,,, shape (K,) or (B, K) for B problems at once
         self.reward_std = 1.0   ## scaling factor for sampling a reward from normal distribution,,,  mean as value of true reward vlaue (already given), std as 1.0
 
     def reward(self, action):
-        return np.random.normal(
+        return self.rng.normal(
             loc=self.true_mean_of_rewards[action],
             scale=self.reward_std
         )   ## this function will sample from true value or reward ans std=1, and that reward will be later improved
 
+    def rewards_batch(self, actions):
+        ## one reward per problem, for true_mean_of_rewards of shape (B, K)
+        means = self.true_mean_of_rewards[np.arange(len(actions)), actions]
+        return means + self.reward_std * self.rng.generator.standard_normal(len(actions))
+
 
 class MultiArmAgent:
-    def __init__(self, number_of_actions, epsilon=0.1):
+    def __init__(self, number_of_actions, epsilon=0.1, num_runs=None, rng=None):
         self.number_of_actions = number_of_actions
         self.epsilon = epsilon
+        self.rng = make_rng(rng)
+
+        # num_runs=B keeps B independent agents as rows of (B, K) arrays (select_batch / update_batch)
+        shape = number_of_actions if num_runs is None else (num_runs, number_of_actions)
 
         # Average reward estimates
-        self.rewards = np.zeros(number_of_actions)
+        self.rewards = np.zeros(shape)
 
         # Count of how many times each action is tried
-        self.actions = np.zeros(number_of_actions)
+        self.actions = np.zeros(shape)
 
     def choose_action(self):
-        if np.random.rand() < self.epsilon:
-            return np.random.randint(self.number_of_actions)
+        if self.rng.random() < self.epsilon:
+            return self.rng.integers(self.number_of_actions)
         else:
             return np.argmax(self.rewards)
 
@@ -41,36 +60,77 @@ class MultiArmAgent:
 
         self.rewards[action] += alpha * (reward - self.rewards[action])
 
+    def select_batch(self):
+        # same rule as choose_action, for every problem at once
+        num_runs = self.rewards.shape[0]
+        explore = self.rng.generator.random(num_runs) < self.epsilon
+        random_actions = self.rng.generator.integers(self.number_of_actions, size=num_runs)
+        return np.where(explore, random_actions, np.argmax(self.rewards, axis=1))
 
+    def update_batch(self, actions, rewards):
+        runs = np.arange(len(actions))
+        self.actions[runs, actions] += 1
+        self.rewards[runs, actions] += (rewards - self.rewards[runs, actions]) / self.actions[runs, actions]
 
 
 
 
-def run_experiment(iterations, true_mean_of_rewards):
+
+
+def run_experiment(iterations, true_mean_of_rewards, instrument=None):
+    # instrument: rl_utils.instrumentation.Recorder; arm pulls go to its visit histogram
+    # and reward - the arm's estimate to its TD-error statistics
     env = MultiArmEnv(true_mean_of_rewards)
     agent = MultiArmAgent(len(true_mean_of_rewards))
 
     rewards = []
     actions = []
 
+    rec = instrument
     for _ in range(iterations):
+        t0 = clock() if rec else 0
         action = agent.choose_action()
+        t1 = clock() if rec else 0
         reward = env.reward(action)
+        t2 = clock() if rec else 0
+        if rec:
+            error = reward - agent.rewards[action]
         agent.update_reward_estimate(reward, action)
+        if rec:
+            rec.step(action, error, t0, t1, t2, clock())
 
         rewards.append(reward)
         actions.append(action)
 
+    if rec:
+        rec.add("steps", iterations)
     return rewards, actions, agent
 
 
+def run_testbed(num_runs=2000, steps=1000, number_of_actions=10, epsilon=0.1, seed=None):
+    ## the classic 10-armed testbed: every run gets its own true means ~ N(0, 1),
+    ## all runs advance together; returns rl_utils.bandit_testbed.TestbedResults ((B, T) arrays)
+    env_rng, agent_rng = stream(seed, 0), stream(seed, 1)
+    true_means = env_rng.generator.standard_normal((num_runs, number_of_actions))
+    env = MultiArmEnv(true_means, rng=env_rng)
+    agent = MultiArmAgent(number_of_actions, epsilon, num_runs=num_runs, rng=agent_rng)
+    return run_batched(agent, env.rewards_batch, true_means, steps)
+
+
+
 
 
+if __name__ == "__main__":
+    ## (under __main__ so other scripts can import MultiArmEnv / MultiArmAgent)
+    rewards, actions, agent = run_experiment(
+        iterations=1000,
+        true_mean_of_rewards=[1.2, 2.0, 1.7, 1.5]
+    )
 
-rewards, actions, agent = run_experiment(
-    iterations=1000,
-    true_mean_of_rewards=[1.2, 2.0, 1.7, 1.5]
-)
+    print("Estimated means:", agent.rewards)
+    print("True means:", [1.2, 2.0, 1.7, 1.5])
 
-print("Estimated means:", agent.rewards)
-print("True means:", [1.2, 2.0, 1.7, 1.5])
+    for epsilon in (0.0, 0.01, 0.1):
+        results = run_testbed(epsilon=epsilon)
+        print(f"epsilon={epsilon}: final avg reward {results.mean_reward()[-100:].mean():.3f}, "
+              f"optimal action {results.optimal_fraction()[-100:].mean():.1%}")
@@ -0,0 +1,299 @@
+## Non-stationary bandits: discounted and sliding-window agents on drifting arms
+##
+## MultiArmAgent (1/n sample averages), UCBAgent and ThompsonAgent weigh a reward from
+## step 1 the same as one from step 10000, so once the arm means drift they keep
+## exploiting stale estimates. Two standard fixes, each for all three agents:
+##   discounted      every statistic decays by gamma per step (recent rewards weigh more)
+##   sliding window  statistics over the last `window` pulls only, kept in a ring buffer:
+##                   each step adds the new pull and subtracts the one it overwrites, O(1)
+## The drifting environments extend MultiArmEnv (Gaussian rewards) and ThompsonEnv
+## (Bernoulli rewards): arm means follow a random walk, optionally with abrupt changes.
+## Run: python nonstationary_bandits.py   (dynamic regret and cost per step)
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from rl_utils.rng import stream
+from rl_utils.scripts import load_script
+
+_here = "Exploration & Control -2/Algorithms(Code)/"
+_epsilon_greedy = load_script(_here + "multi-arm bandits demo.py")
+_ucb = load_script(_here + "ucb_multi-arm_bandit.py")
+_thompson = load_script(_here + "thompson_sampling.py")
+
+MultiArmEnv, MultiArmAgent = _epsilon_greedy.MultiArmEnv, _epsilon_greedy.MultiArmAgent
+UCBAgent = _ucb.UCBAgent
+ThompsonEnv, ThompsonAgent = _thompson.ThompsonEnv, _thompson.ThompsonAgent
+
+
+# -------- Bounded-memory statistics --------
+class DiscountedStats:
+    """Per-arm discounted pull counts and reward sums: N <- gamma N + 1[a], S <- gamma S + r 1[a]"""
+
+    def __init__(self, n_actions, gamma):
+        self.gamma = gamma
+        self.counts = np.zeros(n_actions)
+        self.sums = np.zeros(n_actions)
+
+    def push(self, action, reward):
+        """Returns -1: no pull leaves the statistics (same interface as WindowStats.push)."""
+        self.counts *= self.gamma
+        self.sums *= self.gamma
+        self.counts[action] += 1
+        self.sums[action] += reward
+        return -1
+
+    def total(self):
+        return self.counts.sum()
+
+
+class WindowStats:
+    """Per-arm pull counts and reward sums over the last `window` pulls (ring buffer, O(1) per push).
+    push returns the arm of the pull that fell out of the window (-1 while the window fills)."""
+
+    def __init__(self, n_actions, window):
+        self.window = window
+        self.counts = np.zeros(n_actions)
+        self.sums = np.zeros(n_actions)
+        self._actions = np.full(window, -1, dtype=np.int64)
+        self._rewards = np.zeros(window)
+        self._next = 0
+        self.size = 0
+
+    def push(self, action, reward):
+        i = self._next
+        old = int(self._actions[i])
+        if old >= 0:                                              # overwrite the oldest pull
+            self.counts[old] -= 1
+            self.sums[old] -= self._rewards[i]
+        self._actions[i] = action
+        self._rewards[i] = reward
+        self.counts[action] += 1
+        self.sums[action] += reward
+        self._next = (i + 1) % self.window
+        self.size = min(self.size + 1, self.window)
+        return old
+
+    def total(self):
+        return self.size
+
+
+# -------- Epsilon-greedy --------
+class DiscountedEpsilonGreedyAgent(MultiArmAgent):
+    def __init__(self, number_of_actions, epsilon=0.1, gamma=0.99, rng=None):
+        super().__init__(number_of_actions, epsilon, rng=rng)
+        self.stats = DiscountedStats(number_of_actions, gamma)
+
+    def update_reward_estimate(self, reward, action):
+        self.stats.push(action, reward)
+        self.actions[action] += 1
+        # discounting scales S_a and N_a alike, so only the pulled arm's estimate moves
+        self.rewards[action] = self.stats.sums[action] / self.stats.counts[action]
+
+
+class SlidingWindowEpsilonGreedyAgent(MultiArmAgent):
+    def __init__(self, number_of_actions, epsilon=0.1, window=200, rng=None):
+        super().__init__(number_of_actions, epsilon, rng=rng)
+        self.stats = WindowStats(number_of_actions, window)
+
+    def update_reward_estimate(self, reward, action):
+        evicted = self.stats.push(action, reward)
+        self.actions[action] += 1
+        for arm in {action, evicted} - {-1}:
+            counts = self.stats.counts[arm]
+            # an arm that dropped out of the window keeps its last estimate
+            if counts > 0:
+                self.rewards[arm] = self.stats.sums[arm] / counts
+
+
+# -------- UCB --------
+class _WindowedUCB(UCBAgent):
+    """UCB on windowed/discounted statistics: arms with no weight left are tried first."""
+
+    def select_actions(self):
+        self.t += 1
+        counts = self.stats.counts
+        untried = counts <= 1e-12
+        if untried.any():
+            return int(np.argmax(untried))
+        ucb_score = self.average_reward_of_every_action + self.c * np.sqrt(np.log(self.stats.total()) / counts)
+        return np.argmax(ucb_score)
+
+    def update(self, action, reward):
+        evicted = self.stats.push(action, reward)
+        self.count_of_every_action_selected[action] += 1
+        # discounting scales S_a and N_a alike and the window only loses the evicted pull,
+        # so only the pulled and the evicted arm's means move
+        for arm in {action, evicted} - {-1}:
+            counts = self.stats.counts[arm]
+            self.average_reward_of_every_action[arm] = self.stats.sums[arm] / counts if counts > 0 else 0.0
+
+
+class DiscountedUCBAgent(_WindowedUCB):
+    """D-UCB (Garivier & Moulines): discounted means, bonus c sqrt(log n_gamma / N_gamma(a))"""
+
+    def __init__(self, all_actions, c=2, gamma=0.99):
+        super().__init__(all_actions, c)
+        self.stats = DiscountedStats(all_actions, gamma)
+
+
+class SlidingWindowUCBAgent(_WindowedUCB):
+    """SW-UCB: means and counts over the last `window` pulls, bonus c sqrt(log min(t, window) / N_w(a))"""
+
+    def __init__(self, all_actions, c=2, window=200):
+        super().__init__(all_actions, c)
+        self.stats = WindowStats(all_actions, window)
+
+
+# -------- Thompson Sampling --------
+class DiscountedThompsonAgent(ThompsonAgent):
+    """Beta(1 + discounted successes, 1 + discounted failures)"""
+
+    def __init__(self, n_actions, gamma=0.99, rng=None):
+        super().__init__(n_actions, rng=rng)
+        self.successes = DiscountedStats(n_actions, gamma)
+        self.failures = DiscountedStats(n_actions, gamma)
+
+    def update(self, action, reward):
+        self.successes.push(action, float(reward == 1))
+        self.failures.push(action, float(reward != 1))
+        self.alpha = 1.0 + self.successes.sums
+        self.beta = 1.0 + self.failures.sums
+
+
+class SlidingWindowThompsonAgent(ThompsonAgent):
+    """Beta(1 + successes, 1 + failures) over the last `window` pulls"""
+
+    def __init__(self, n_actions, window=200, rng=None):
+        super().__init__(n_actions, rng=rng)
+        self.stats = WindowStats(n_actions, window)
+
+    def update(self, action, reward):
+        evicted = self.stats.push(action, reward)
+        for arm in {action, evicted} - {-1}:
+            self.alpha[arm] = 1.0 + self.stats.sums[arm]
+            self.beta[arm] = 1.0 + self.stats.counts[arm] - self.stats.sums[arm]
+
+
+# -------- Drifting environments --------
+class DriftingMultiArmEnv(MultiArmEnv):
+    """Gaussian arms whose means follow a random walk (drift_std per step); every
+    switch_every steps (if set) all means are redrawn from N(0, 1)."""
+
+    def __init__(self, true_mean_of_rewards, drift_std=0.01, switch_every=None, rng=None):
+        super().__init__(true_mean_of_rewards, rng=rng)
+        self.true_mean_of_rewards = self.true_mean_of_rewards.astype(np.float64)
+        self.drift_std = drift_std
+        self.switch_every = switch_every
+        self.t = 0
+
+    def advance(self):
+        self.t += 1
+        if self.switch_every and self.t % self.switch_every == 0:
+            self.true_mean_of_rewards = self.rng.generator.standard_normal(len(self.true_mean_of_rewards))
+        else:
+            self.true_mean_of_rewards += self.drift_std * self.rng.generator.standard_normal(len(self.true_mean_of_rewards))
+
+    @property
+    def means(self):
+        return self.true_mean_of_rewards
+
+
+class DriftingThompsonEnv(ThompsonEnv):
+    """Bernoulli arms whose success probabilities random-walk inside [0, 1] (reflected);
+    every switch_every steps (if set) all probabilities are redrawn uniformly."""
+
+    def __init__(self, true_probabilities, drift_std=0.01, switch_every=None, rng=None):
+        super().__init__(true_probabilities, rng=rng)
+        self.true_probabilities = self.true_probabilities.astype(np.float64)
+        self.drift_std = drift_std
+        self.switch_every = switch_every
+        self.t = 0
+
+    def advance(self):
+        self.t += 1
+        if self.switch_every and self.t % self.switch_every == 0:
+            self.true_probabilities = self.rng.generator.random(len(self.true_probabilities))
+        else:
+            p = self.true_probabilities + self.drift_std * self.rng.generator.standard_normal(len(self.true_probabilities))
+            self.true_probabilities = 1.0 - np.abs(1.0 - np.abs(p))          # reflect into [0, 1]
+
+    @property
+    def means(self):
+        return self.true_probabilities
+
+
+# -------- Benchmark --------
+def run_drift(env, agent, select, pull, update, steps):
+    """
+    Dynamic regret: sum over t of (best current mean - current mean of the chosen arm).
+    Returns (cumulative dynamic regret per step, seconds per select + update).
+    """
+    regret = np.empty(steps)
+    total, agent_seconds = 0.0, 0.0
+    for t in range(steps):
+        start = time.perf_counter()
+        action = select()
+        agent_seconds += time.perf_counter() - start
+
+        means = env.means
+        total += means.max() - means[action]
+        regret[t] = total
+        reward = pull(action)
+
+        start = time.perf_counter()
+        update(action, reward)
+        agent_seconds += time.perf_counter() - start
+        env.advance()
+    return regret, agent_seconds / steps
+
+
+def benchmark(n_actions=10, steps=5000, runs=5, drift_std=0.02, switch_every=1000, gamma=0.995, window=300):
+    """Average final dynamic regret and microseconds per step for every agent, same drift across agents"""
+    gaussian = {
+        "epsilon-greedy (1/n)": lambda rng: MultiArmAgent(n_actions, rng=rng),
+        "epsilon-greedy discounted": lambda rng: DiscountedEpsilonGreedyAgent(n_actions, gamma=gamma, rng=rng),
+        "epsilon-greedy window": lambda rng: SlidingWindowEpsilonGreedyAgent(n_actions, window=window, rng=rng),
+        "UCB": lambda rng: UCBAgent(n_actions),
+        "UCB discounted": lambda rng: DiscountedUCBAgent(n_actions, gamma=gamma),
+        "UCB window": lambda rng: SlidingWindowUCBAgent(n_actions, window=window),
+    }
+    bernoulli = {
+        "Thompson": lambda rng: ThompsonAgent(n_actions, rng=rng),
+        "Thompson discounted": lambda rng: DiscountedThompsonAgent(n_actions, gamma=gamma, rng=rng),
+        "Thompson window": lambda rng: SlidingWindowThompsonAgent(n_actions, window=window, rng=rng),
+    }
+
+    results = {}
+    for name, make in {**gaussian, **bernoulli}.items():
+        regrets, costs = [], []
+        for run in range(runs):
+            env_rng = stream(run, 0)                            # same drift for every agent
+            agent = make(stream(run, 1))
+            if name in gaussian:
+                env = DriftingMultiArmEnv(env_rng.generator.standard_normal(n_actions), drift_std, switch_every, rng=env_rng)
+                if isinstance(agent, MultiArmAgent):
+                    select, update = agent.choose_action, lambda a, r: agent.update_reward_estimate(r, a)
+                else:
+                    select, update = agent.select_actions, agent.update
+                pull = env.reward
+            else:
+                env = DriftingThompsonEnv(env_rng.generator.random(n_actions), drift_std, switch_every, rng=env_rng)
+                select, update = agent.select_action, agent.update
+                pull = lambda a: int(env.give_rewards(a))
+            regret, seconds = run_drift(env, agent, select, pull, update, steps)
+            regrets.append(regret[-1])
+            costs.append(seconds)
+        results[name] = {"dynamic_regret": float(np.mean(regrets)), "us_per_step": float(np.mean(costs)) * 1e6}
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'agent':>26} {'dynamic regret':>15} {'us/step':>8}")
+    for name, r in benchmark().items():
+        print(f"{name:>26} {r['dynamic_regret']:>15.1f} {r['us_per_step']:>8.1f}")
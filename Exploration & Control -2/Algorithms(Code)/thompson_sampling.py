@@ -1,12 +1,23 @@
+import os
+import sys
+
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from rl_utils.bandit_testbed import run_batched
+from rl_utils.instrumentation import clock
+from rl_utils.rng import make_rng, stream
+
 
 # -------- Environment --------
 # This simulates the world (slot machines)
 class ThompsonEnv:
-    def __init__(self, true_probabilities):
-        # True (hidden) success probability of each arm
+    def __init__(self, true_probabilities, rng=None):
+        # True (hidden) success probability of each arm, shape (K,) or (B, K) for B problems
         self.true_probabilities = np.array(true_probabilities)
+        # seed or rl_utils.rng stream (None -> shared global stream)
+        self.rng = make_rng(rng)
 
     def give_rewards(self, action):
         """
@@ -14,24 +25,32 @@ class ThompsonEnv:
         Returns True (success) with probability true_probabilities[action],
         otherwise False (failure).
         """
-        return np.random.rand() < self.true_probabilities[action]
+        return self.rng.random() < self.true_probabilities[action]
+
+    def rewards_batch(self, actions):
+        """One pull per problem: returns an int array of 0/1 rewards, shape (B,)."""
+        p = self.true_probabilities[np.arange(len(actions)), actions]
+        return (self.rng.generator.random(len(actions)) < p).astype(np.int64)
 
 
 # -------- Agent --------
 # This is Thompson Sampling
 class ThompsonAgent:
-    def __init__(self, n_actions):
+    def __init__(self, n_actions, num_runs=None, rng=None):
         # Alpha = successes + 1 (prior)
         # Beta  = failures  + 1 (prior)
-        self.alpha = np.ones(n_actions)
-        self.beta = np.ones(n_actions)
+        # num_runs=B keeps B independent agents as rows of (B, K) arrays
+        shape = n_actions if num_runs is None else (num_runs, n_actions)
+        self.alpha = np.ones(shape)
+        self.beta = np.ones(shape)
+        self.rng = make_rng(rng)
 
     def select_action(self):
         """
         1. Sample one value from each arm's belief (Beta distribution)
         2. Pick the arm with the highest sampled value
         """
-        samples = np.random.beta(self.alpha, self.beta)
+        samples = self.rng.generator.beta(self.alpha, self.beta)
         return np.argmax(samples)
 
     def update(self, action, reward):
@@ -45,27 +64,85 @@ class ThompsonAgent:
         else:
             self.beta[action] += 1
 
+    def select_batch(self):
+        """select_action for every problem: one Beta draw per (problem, arm)."""
+        samples = self.rng.generator.beta(self.alpha, self.beta)
+        return np.argmax(samples, axis=1)
+
+    def update_batch(self, actions, rewards):
+        """update for every problem: rewards is a 0/1 array of shape (B,)."""
+        runs = np.arange(len(actions))
+        self.alpha[runs, actions] += rewards
+        self.beta[runs, actions] += 1 - rewards
+
+    def select_many(self, n):
+        """
+        n decisions from this one agent (e.g. a micro-batch of concurrent requests):
+        one Beta draw of shape (n, K), same distribution as n select_action calls.
+        """
+        samples = self.rng.generator.beta(self.alpha, self.beta, size=(n, len(self.alpha)))
+        return np.argmax(samples, axis=1)
+
+    def update_many(self, actions, rewards):
+        """Apply a batch of (action, 0/1 reward) feedback; repeated arms are all counted."""
+        rewards = np.asarray(rewards)
+        self.alpha += np.bincount(actions, weights=rewards, minlength=len(self.alpha))
+        self.beta += np.bincount(actions, weights=1 - rewards, minlength=len(self.beta))
+
 
 # -------- Experiment loop --------
-def run_experiment(true_probs, n_times):
+def run_experiment(true_probs, n_times, instrument=None):
+    # instrument: rl_utils.instrumentation.Recorder; arm pulls go to its visit histogram
+    # and reward - the arm's posterior mean to its TD-error statistics
     env = ThompsonEnv(true_probs)
     agent = ThompsonAgent(len(true_probs))
 
     actions = []
     rewards = []
 
+    rec = instrument
     for _ in range(n_times):
         # Agent chooses an action based on current beliefs
+        t0 = clock() if rec else 0
         action = agent.select_action()
 
         # Environment returns reward (0 or 1)
+        t1 = clock() if rec else 0
         reward = int(env.give_rewards(action))
 
         # Agent updates belief using observed reward
+        t2 = clock() if rec else 0
+        if rec:
+            error = reward - agent.alpha[action] / (agent.alpha[action] + agent.beta[action])
         agent.update(action, reward)
+        if rec:
+            rec.step(action, error, t0, t1, t2, clock())
 
         actions.append(action)
         rewards.append(reward)
 
+    if rec:
+        rec.add("steps", n_times)
+
     # Return history and final beliefs
     return actions, rewards, agent.alpha, agent.beta
+
+
+# -------- Batched testbed --------
+def run_testbed(num_runs=2000, n_times=1000, n_actions=10, seed=None):
+    """
+    num_runs independent Bernoulli bandits (success probabilities ~ U(0, 1)) run together.
+    Returns rl_utils.bandit_testbed.TestbedResults with (num_runs, n_times) arrays.
+    """
+    env_rng, agent_rng = stream(seed, 0), stream(seed, 1)
+    true_probs = env_rng.generator.random((num_runs, n_actions))
+    env = ThompsonEnv(true_probs, rng=env_rng)
+    agent = ThompsonAgent(n_actions, num_runs=num_runs, rng=agent_rng)
+    return run_batched(agent, env.rewards_batch, true_probs, n_times)
+
+
+if __name__ == "__main__":
+    results = run_testbed()
+    print(f"Thompson: final success rate {results.mean_reward()[-100:].mean():.3f}, "
+          f"optimal arm {results.optimal_fraction()[-100:].mean():.1%}, "
+          f"regret {results.cumulative_regret()[-1]:.1f}")
@@ -1,25 +1,45 @@
 ## in this file we will implement the, ucb algorithm in multi-arm bandits 
 
 
+import heapq
+import math
+import os
+import sys
+
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from rl_utils.bandit_testbed import run_batched
+from rl_utils.instrumentation import clock
+from rl_utils.rng import make_rng, stream
+
 class UCBEnv():
-    def __init__(self, true_rewards):
-        self.true_rewards = np.array(true_rewards)
+    def __init__(self, true_rewards, rng = None):
+        self.true_rewards = np.array(true_rewards)   ## shape (K,), or (B, K) for B problems at once
+        self.rng = make_rng(rng)   ## seed or rl_utils.rng stream (None -> shared global stream)
         self.std = 1.0  ## this is the standard deviation
 
 
     def give_rewards(self, action):
-        reward = np.random.normal(self.true_rewards[action], self.std)
+        reward = self.rng.normal(self.true_rewards[action], self.std)
 
         return reward 
+
+
+    def rewards_batch(self, actions):
+        ## one reward per problem
+        means = self.true_rewards[np.arange(len(actions)), actions]
+        return means + self.std * self.rng.generator.standard_normal(len(actions))
     
 
 class UCBAgent():
-    def __init__(self, all_actions, c = 2):
+    def __init__(self, all_actions, c = 2, num_runs = None):
         self.all_actions = all_actions
-        self.average_reward_of_every_action = np.zeros(all_actions)
-        self.count_of_every_action_selected = np.zeros(all_actions)
+        ## num_runs=B keeps B independent agents as rows of (B, K) arrays (select_batch / update_batch)
+        shape = all_actions if num_runs is None else (num_runs, all_actions)
+        self.average_reward_of_every_action = np.zeros(shape)
+        self.count_of_every_action_selected = np.zeros(shape)
         self.c = c   ## exploration hyper-parameters
         self.t = 0   ## overall count of action-selection
 
@@ -54,21 +74,210 @@ class UCBAgent():
         self.average_reward_of_every_action[action] += (reward - self.average_reward_of_every_action[action]) / n
 
 
-def run_experiment(true_means, iterations):
+    def select_batch(self):
+        ## same rule as select_actions, for every problem at once (all problems share t)
+        self.t += 1
+        counts = self.count_of_every_action_selected
+        untried = counts == 0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ucb_score = self.average_reward_of_every_action + self.c * np.sqrt(np.log(self.t) / counts)
+
+        ## first untried arm where there is one, else the best ucb score
+        return np.where(untried.any(axis=1), np.argmax(untried, axis=1), np.argmax(ucb_score, axis=1))
+
+
+    def update_batch(self, actions, rewards):
+        runs = np.arange(len(actions))
+        self.count_of_every_action_selected[runs, actions] += 1
+        n = self.count_of_every_action_selected[runs, actions]
+        self.average_reward_of_every_action[runs, actions] += (rewards - self.average_reward_of_every_action[runs, actions]) / n
+
+
+    def select_many(self, n):
+        ## n decisions from this one agent with no update in between (a micro-batch of
+        ## concurrent requests): same as calling select_actions n times, t advances per decision
+        t = self.t + np.arange(1, n + 1)
+        self.t += n
+        counts = self.count_of_every_action_selected
+        untried = np.flatnonzero(counts == 0)
+        if len(untried):
+            return np.full(n, untried[0])
+
+        ucb_score = self.average_reward_of_every_action + self.c * np.sqrt(np.log(t)[:, None] / counts)
+        return np.argmax(ucb_score, axis=1)
+
+
+    def update_many(self, actions, rewards):
+        ## a batch of feedback for this one agent; k rewards for the same arm give the same
+        ## mean as k sequential updates
+        pulls = np.bincount(actions, minlength=self.all_actions)
+        totals = np.bincount(actions, weights=rewards, minlength=self.all_actions)
+        pulled = pulls > 0
+        counts = self.count_of_every_action_selected
+        means = self.average_reward_of_every_action
+        means[pulled] = (means[pulled] * counts[pulled] + totals[pulled]) / (counts[pulled] + pulls[pulled])
+        counts += pulls
+
+
+class IndexedUCBAgent(UCBAgent):
+    """
+    Same choices as UCBAgent.select_actions (first untried arm, else argmax of the ucb score
+    with ties to the lowest index), without touching all K arms per pull:
+      - untried arms sit in a min-heap of indices, so the first one is O(log K)
+      - tried arms sit in a max-heap keyed by their bound at a horizon t_h >= t; the bound
+        only grows with t, so keys are upper bounds until t passes t_h. Selection pops
+        keys until the next key cannot beat the best exact bound found so far, then pushes
+        them back. When t passes t_h the heap is rebuilt with t_h = t + t/64: an O(K)
+        rebuild every t/64 pulls, with keys close enough to the exact bounds that only a
+        few entries are popped per selection
+      - update pushes the pulled arm with its new key; its old entry is skipped lazily
+    """
+
+    def __init__(self, all_actions, c = 2):
+        super().__init__(all_actions, c)
+        self.untried = list(range(all_actions))          ## already a valid min-heap
+        self.heap = []                                   ## (-key, arm, version)
+        self.version = [0] * all_actions
+        self.horizon = 2
+
+
+    def _key(self, action, log_t):
+        ## exactly the UCBAgent expression, so ties and rounding match
+        n = self.count_of_every_action_selected[action]
+        return float(self.average_reward_of_every_action[action] + self.c * math.sqrt(log_t / n))
+
+
+    def _rebuild(self):
+        log_h = float(np.log(self.horizon))
+        tried = np.flatnonzero(self.count_of_every_action_selected > 0)
+        keys = self.average_reward_of_every_action[tried] + self.c * np.sqrt(log_h / self.count_of_every_action_selected[tried])
+        version = self.version
+        self.heap = [(-key, a, version[a]) for key, a in zip(keys.tolist(), tried.tolist())]
+        heapq.heapify(self.heap)
+
+
+    def select_actions(self):
+        self.t += 1
+
+        ## first untried arm (skip arms that were updated without being selected)
+        while self.untried and self.count_of_every_action_selected[self.untried[0]] != 0:
+            heapq.heappop(self.untried)
+        if self.untried:
+            return self.untried[0]
+
+        if self.t > self.horizon:
+            self.horizon = self.t + self.t // 64 + 1
+            self._rebuild()
+
+        log_t = float(np.log(self.t))
+        best_value, best_action = -math.inf, -1
+        popped = []
+        while self.heap:
+            neg_key, a, version = self.heap[0]
+            if version != self.version[a]:
+                heapq.heappop(self.heap)                 ## stale entry
+                continue
+            ## stop once the next upper bound cannot beat (or tie with a lower index) the best
+            if -neg_key < best_value or (-neg_key == best_value and a > best_action):
+                break
+            popped.append(heapq.heappop(self.heap))
+            value = self._key(a, log_t)
+            if value > best_value or (value == best_value and a < best_action):
+                best_value, best_action = value, a
+
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return best_action
+
+
+    def update(self, action, reward):
+        super().update(action, reward)
+        self.version[action] += 1
+        key = self._key(action, float(np.log(self.horizon)))
+        heapq.heappush(self.heap, (-key, action, self.version[action]))
+
+        ## drop stale entries once they dominate the heap
+        if len(self.heap) > 4 * self.all_actions:
+            self._rebuild()
+
+
+    def update_many(self, actions, rewards):
+        super().update_many(actions, rewards)
+        log_h = float(np.log(self.horizon))
+        for action in np.unique(actions).tolist():
+            self.version[action] += 1
+            heapq.heappush(self.heap, (-self._key(action, log_h), action, self.version[action]))
+        if len(self.heap) > 4 * self.all_actions:
+            self._rebuild()
+
+
+def run_experiment(true_means, iterations, instrument=None):
+    ## instrument: rl_utils.instrumentation.Recorder; arm pulls go to its visit histogram
+    ## and reward - the arm's average to its TD-error statistics
     env = UCBEnv([1.5, 2.5, 2.0, 1.7])
     agent = UCBAgent(len(true_means))
 
 
     actions = []
 
+    rec = instrument
     for i in range(iterations):
+        t0 = clock() if rec else 0
         action = agent.select_actions()
+        t1 = clock() if rec else 0
         reward = env.give_rewards(action)
+        t2 = clock() if rec else 0
+        if rec:
+            error = reward - agent.average_reward_of_every_action[action]
         agent.update(action, reward)
+        if rec:
+            rec.step(action, error, t0, t1, t2, clock())
 
         actions.append(action)
 
+    if rec:
+        rec.add("steps", iterations)
+
 
     return agent.average_reward_of_every_action, agent.count_of_every_action_selected
 
 
+def run_testbed(num_runs=2000, steps=1000, all_actions=10, c=2, seed=None):
+    ## 10-armed testbed: true means ~ N(0, 1) per run, all runs advance together;
+    ## returns rl_utils.bandit_testbed.TestbedResults ((B, T) reward / regret / optimal arrays)
+    env_rng = stream(seed, 0)
+    true_means = env_rng.generator.standard_normal((num_runs, all_actions))
+    env = UCBEnv(true_means, rng=env_rng)
+    agent = UCBAgent(all_actions, c, num_runs=num_runs)
+    return run_batched(agent, env.rewards_batch, true_means, steps)
+
+
+def compare_indexed(all_actions=10_000, iterations=20_000, seed=None):
+    """Run UCBAgent and IndexedUCBAgent on the same reward stream; returns (same choices, seconds each)."""
+    import time
+
+    generator = stream(seed, 0).generator
+    true_means = generator.standard_normal(all_actions)
+    noise = generator.standard_normal(iterations)
+    choices, seconds = [], []
+    for agent in (UCBAgent(all_actions), IndexedUCBAgent(all_actions)):
+        actions = np.empty(iterations, dtype=np.int64)
+        start = time.perf_counter()
+        for i in range(iterations):
+            action = agent.select_actions()
+            agent.update(action, true_means[action] + noise[i])
+            actions[i] = action
+        seconds.append(time.perf_counter() - start)
+        choices.append(actions)
+    return np.array_equal(choices[0], choices[1]), seconds
+
+
+if __name__ == "__main__":
+    same, (plain_seconds, indexed_seconds) = compare_indexed()
+    print(f"10000 arms: same choices {same}, UCBAgent {plain_seconds:.2f}s, IndexedUCBAgent {indexed_seconds:.2f}s")
+
+    results = run_testbed()
+    print(f"UCB c=2: final avg reward {results.mean_reward()[-100:].mean():.3f}, "
+          f"optimal action {results.optimal_fraction()[-100:].mean():.1%}, "
+          f"regret {results.cumulative_regret()[-1]:.1f}")
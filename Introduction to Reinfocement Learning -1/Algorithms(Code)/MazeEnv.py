@@ -1,8 +1,16 @@
+import os
+import sys
 import random
-from copy import deepcopy
 import matplotlib.pyplot as plt
 import numpy as np
 import time
+from scipy import sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rl_utils.sparse_model import solve_policy_values
+from value_table import ArrayValueTable, argmax_random_ties
 
 # ---------- CONFIG ----------
 GRID_N = 5                          # Size of the grid: 5x5 (states are (1,1) to (5,5))
@@ -13,9 +21,10 @@ GAMMA = 0.99                        # Discount factor — how much future reward
 ACTIONS = ["Right", "Left", "Up", "Down"]  # All possible actions
 
 # ---------- State-value table ----------
-# Dictionary mapping every state (r,c) → its current estimated value V(s)
+# Maps every state (r,c) → its current estimated value V(s), like a dict,
+# but the values are stored in one float array (V.array, see value_table.py)
 # Initially all values are 0.0
-V = {(r, c): 0.0 for r in range(1, GRID_N + 1) for c in range(1, GRID_N + 1)}
+V = ArrayValueTable((r, c) for r in range(1, GRID_N + 1) for c in range(1, GRID_N + 1))
 
 # ---------- Helpers ----------
 def in_bounds(state):
@@ -65,6 +74,51 @@ def state_transition(state, action):
     return next_s, STEP_REWARD, False                           # Normal move
 
 
+# ---------- Compiled model (array form of the functions above) ----------
+# Row i = state V.states[i], column j = ACTIONS[j]:
+#   NEXT_INDEX[i, j], REWARD[i, j], CONTINUES[i, j]  → state_transition (CONTINUES = 0.0 if done)
+#   MOVE_INDEX[i, j]                                  → transition_function (used for greedy improvement)
+ACTION_ID = {a: j for j, a in enumerate(ACTIONS)}
+
+def compile_model(states):
+    """Tabulate state_transition / transition_function for every (state, action)."""
+    index = {s: i for i, s in enumerate(states)}
+    shape = (len(states), len(ACTIONS))
+    next_index = np.zeros(shape, dtype=np.int64)
+    move_index = np.zeros(shape, dtype=np.int64)
+    reward = np.zeros(shape)
+    continues = np.zeros(shape)
+
+    for i, s in enumerate(states):
+        for j, a in enumerate(ACTIONS):
+            next_s, r, done = state_transition(s, a)
+            next_index[i, j] = index[next_s]
+            move_index[i, j] = index[transition_function(s, a)]
+            reward[i, j] = r
+            continues[i, j] = 0.0 if done else 1.0
+
+    terminal_mask = np.array([is_terminal(s) for s in states])
+    return next_index, move_index, reward, continues, terminal_mask
+
+NEXT_INDEX, MOVE_INDEX, REWARD, CONTINUES, TERMINAL_MASK = compile_model(V.states)
+
+
+def use_grid(n):
+    """Switch to an n x n grid with the goal at (n, n): fresh V, recompiled model arrays."""
+    global GRID_N, TERMINAL, V, NEXT_INDEX, MOVE_INDEX, REWARD, CONTINUES, TERMINAL_MASK
+    GRID_N, TERMINAL = n, (n, n)
+    V = ArrayValueTable((r, c) for r in range(1, GRID_N + 1) for c in range(1, GRID_N + 1))
+    NEXT_INDEX, MOVE_INDEX, REWARD, CONTINUES, TERMINAL_MASK = compile_model(V.states)
+
+
+def value_table():
+    """The global V as an ArrayValueTable (converts a plain dict assigned to V)."""
+    global V
+    if not isinstance(V, ArrayValueTable):
+        V = ArrayValueTable.from_dict(V)
+    return V
+
+
 
 
 
@@ -98,24 +152,23 @@ def policy_for_state(state, first_iteration=False):
     if is_terminal(state):
         return None                                             # No action in goal
 
-    actions = ["Right", "Left", "Up", "Down"]
-    moves = {a: transition_function(state, a) for a in actions}
-
     if first_iteration:
-        return random.choice(actions)                           # Random policy at beginning
+        return random.choice(ACTIONS)                           # Random policy at beginning
+
+    # Greedy policy improvement: values of the resulting states, argmax with random ties
+    table = value_table()
+    values = table.array[MOVE_INDEX[table.index[state]]]
+    return ACTIONS[argmax_random_ties(values[None, :])[0]]
 
-    # Greedy policy improvement
-    best_value = -float("inf")
-    best_actions = []
-    for a, ns in moves.items():
-        val = V[ns]                                             # Value of resulting state
-        if val > best_value:
-            best_value = val
-            best_actions = [a]                                  # New best
-        elif val == best_value:
-            best_actions.append(a)                              # Tie → keep it
 
-    return random.choice(best_actions)                          # Random among best
+def greedy_policy():
+    """
+    policy_for_state for every state at once: one vectorized argmax (random tie-breaking)
+    over V of the resulting states. Returns {state: action} with None for the goal.
+    """
+    table = value_table()
+    best = argmax_random_ties(table.array[MOVE_INDEX])
+    return {s: (None if TERMINAL_MASK[i] else ACTIONS[best[i]]) for i, s in enumerate(table.states)}
 
 
 
@@ -123,42 +176,85 @@ def policy_for_state(state, first_iteration=False):
 
 
 
-def evaluate_policy_once(chosen_actions, theta=1e-6, max_sweeps=1000):
+def policy_linear_system(chosen_actions):
+    """
+    The fixed point of policy evaluation as a linear system V = r_pi + γ P_pi V
+    over the states of V (in dict order). Terminal states keep TERMINAL_REWARD,
+    states without an action keep their current value.
+    Returns (states, P_pi, r_pi).
+    """
+    states = list(V)
+    index = {s: i for i, s in enumerate(states)}
+    r_pi = np.zeros(len(states))
+    rows, cols = [], []
+
+    for i, s in enumerate(states):
+        if is_terminal(s):
+            r_pi[i] = TERMINAL_REWARD                                   # Goal value is fixed
+            continue
+        a = chosen_actions.get(s)
+        if a is None:
+            r_pi[i] = V[s]                                              # Left unchanged
+            continue
+        next_s, r, done = state_transition(s, a)
+        r_pi[i] = r
+        if not done:
+            rows.append(i)
+            cols.append(index[next_s])
+
+    P_pi = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(states), len(states)))
+    return states, P_pi, r_pi
+
+
+def evaluate_policy_once(chosen_actions, theta=1e-6, max_sweeps=1000, backend="sweep"):
     """
     Policy Evaluation step:
     Repeatedly apply Bellman expectation backup for the fixed policy
     until the value function stops changing significantly (delta < theta).
     Uses synchronous updates (old V → new V in one full sweep).
-    Updates the global V when done.
+    backend="direct" / "gmres" / "bicgstab" instead solves the linear system
+    (I - γ P_pi) V = r_pi (see policy_linear_system), which does not slow down as γ → 1.
+    Updates the global V when done and returns the remaining Bellman residual
+    max |r_pi + γ P_pi V - V|.
     """
-    global V
-    local_V = deepcopy(V)                                       # Work on a copy
+    table = value_table()
+    if backend != "sweep":
+        states, P_pi, r_pi = policy_linear_system(chosen_actions)
+        values, residual = solve_policy_values(P_pi, r_pi, gamma=GAMMA, backend=backend)
+        table.array[:] = values
+        return residual
+
+    # per-state backup r + γ·c·V(s') of the chosen action, as flat arrays
+    rows = np.arange(len(table))
+    action_ids = np.array([ACTION_ID.get(chosen_actions.get(s), -1) for s in table.states])
+    keep = (action_ids < 0) & ~TERMINAL_MASK                    # No action → value unchanged
+    action_ids[action_ids < 0] = 0
+    next_index = NEXT_INDEX[rows, action_ids]
+    reward = REWARD[rows, action_ids]                           # Goal: TERMINAL_REWARD, never continues
+    discount = GAMMA * CONTINUES[rows, action_ids]
+
+    # double buffering: two value arrays swapped every sweep, nothing allocated inside the loop
+    current = table.array.copy()
+    new = np.empty_like(current)
+    scratch = np.empty_like(current)
+
+    def backup(values, out):
+        np.take(values, next_index, out=out)
+        out *= discount
+        out += reward                                           # Bellman expectation update: V(s) ← r + γV(s')
+        np.copyto(out, values, where=keep)
+        np.subtract(out, values, out=scratch)
+        np.abs(scratch, out=scratch)
+        return scratch.max()
 
     for _ in range(max_sweeps):
-        delta = 0.0
-        V_new = local_V.copy()
-
-        for s in local_V:
-            if is_terminal(s):
-                V_new[s] = TERMINAL_REWARD                          # Goal value is fixed
-                continue
-
-            a = chosen_actions.get(s)
-            if a is None:
-                continue                                            # Shouldn't happen
-
-            old_val = local_V[s]
-            # Bellman expectation update: V(s) ← r + γV(s')
-            V_new[s] = evaluate_state_once(s, a)
-
-            delta = max(delta, abs(V_new[s] - old_val))
-
-        local_V = V_new                                          # Synchronous update
-
-        if delta < theta:                                        # Converged?
+        delta = backup(current, new)
+        current, new = new, current                             # Synchronous update
+        if delta < theta:                                       # Converged?
             break
 
-    V = local_V                                                  # Write final values back
+    table.array[:] = current                                    # Write final values back
+    return float(backup(current, new))                          # Remaining Bellman residual
 
 
 ## above code is designed or skelton designed by me, refined by chat and gemini  (can't write all myself it takes time...)
@@ -247,7 +343,7 @@ def update_display(policy_dict, iteration):
 
 # ---------- MAIN LOOP WITH LIVE UI ----------
 if __name__ == "__main__":
-    V = {(r, c): 0.0 for r in range(1, GRID_N + 1) for c in range(1, GRID_N + 1)}
+    V = ArrayValueTable((r, c) for r in range(1, GRID_N + 1) for c in range(1, GRID_N + 1))
     
     # Initial random policy
     current_policy_actions = {s: policy_for_state(s, first_iteration=True) for s in V.keys()}
@@ -268,15 +364,9 @@ if __name__ == "__main__":
 
         # Policy Improvement
         policy_stable = True
-        new_policy = {}
+        new_policy = greedy_policy()  # Greedy w.r.t current V
         for s in V:
-            if is_terminal(s):
-                new_policy[s] = None
-                continue
-            old_a = current_policy_actions[s]
-            new_a = policy_for_state(s)  # Greedy w.r.t current V
-            new_policy[s] = new_a
-            if new_a != old_a:
+            if new_policy[s] != current_policy_actions[s]:
                 policy_stable = False
         current_policy_actions = new_policy
 
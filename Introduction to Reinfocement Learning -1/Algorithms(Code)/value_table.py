@@ -0,0 +1,63 @@
+## Array-backed state-value table for MazeEnv.py
+##
+## Behaves like the old dict V[(r, c)] (indexing, iteration, keys/items, copy) so existing
+## code keeps working, but the values live in one contiguous float array (V.array) in a
+## fixed state order (V.index[state] -> position). That lets policy evaluation and policy
+## improvement run as NumPy operations over all states at once.
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from rl_utils.rng import make_rng
+
+
+class ArrayValueTable(MutableMapping):
+    def __init__(self, states, initial_value=0.0):
+        self.states = list(states)                                  # position -> (r, c)
+        self.index = {s: i for i, s in enumerate(self.states)}      # (r, c) -> position
+        self.array = np.full(len(self.states), initial_value, dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, values):
+        table = cls(values.keys())
+        table.array[:] = list(values.values())
+        return table
+
+    # ---------- dict interface ----------
+    def __getitem__(self, state):
+        return float(self.array[self.index[state]])
+
+    def __setitem__(self, state, value):
+        self.array[self.index[state]] = value
+
+    def __delitem__(self, state):
+        raise TypeError("States cannot be removed from an ArrayValueTable")
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, state):
+        return state in self.index
+
+    def copy(self):
+        table = ArrayValueTable.__new__(ArrayValueTable)
+        table.states = self.states
+        table.index = self.index
+        table.array = self.array.copy()
+        return table
+
+    def __repr__(self):
+        return f"ArrayValueTable({dict(zip(self.states, self.array.tolist()))})"
+
+
+def argmax_random_ties(values, rng=None):
+    """
+    Row-wise argmax of a (n, k) array, choosing uniformly at random among tied maxima.
+    rng: seed or rl_utils.rng stream (None -> shared global stream)
+    """
+    is_best = values == values.max(axis=1, keepdims=True)
+    return np.argmax(make_rng(rng).generator.random(values.shape) * is_best, axis=1)
@@ -0,0 +1,57 @@
+## Policy Iteration (model-based planning), serial and multi-process
+##
+## 1) the demos/test.py maze solved by its own policy_iteration and by the parallel
+##    version (state blocks swept by a process pool, V in shared memory)
+## 2) a strong-scaling benchmark: the same large grid solved with 1..N worker processes
+##    (N defaults to the CPU count, but at least 4; past the CPU count the workers share
+##    cores, which shows the cost of oversubscribing rather than a speedup)
+## Run: python "Policy Iteration.py" [--size 1000] [--max-workers N] [--mode jacobi|gauss-seidel]
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+
+from rl_utils.compiled_tables import TransitionTables, grid_tables
+from rl_utils.parallel_dp import MODES, strong_scaling
+from rl_utils.scripts import load_script
+from rl_utils.sparse_model import SparseModel
+
+
+def large_grid_model(size):
+    """size x size open grid, -1 per step, +10 for reaching the bottom-right corner."""
+    grid = grid_tables(size, size)
+    grid = TransitionTables(grid.next_state, np.where(grid.done, 10.0, -1.0), grid.done)
+    return SparseModel.from_tables(grid)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=500, help="side of the benchmark grid")
+    parser.add_argument("--max-workers", type=int, default=max(os.cpu_count() or 1, 4))
+    parser.add_argument("--mode", choices=MODES, default="jacobi")
+    parser.add_argument("--gamma", type=float, default=0.95)
+    args = parser.parse_args()
+
+    # 1) same answer as the serial policy iteration on the demos/test.py maze
+    maze = load_script("demos/test.py")
+    policy, V = maze.policy_iteration(maze.build_sparse_model(), gamma=args.gamma)
+    par_policy, par_V = maze.parallel_policy_iteration(
+        maze.build_sparse_model(), gamma=args.gamma, workers=2, mode=args.mode
+    )
+    print("demos/test.py maze")
+    print("max |V_serial - V_parallel| =", np.max(np.abs(V - par_V)))
+    print("same policy:", np.array_equal(np.argmax(policy, axis=1), np.argmax(par_policy, axis=1)))
+
+    # 2) strong scaling: fixed problem, growing number of processes
+    model = large_grid_model(args.size)
+    print(f"\nstrong scaling, policy iteration on a {args.size}x{args.size} grid ({args.mode}, "
+          f"{os.cpu_count()} CPUs)")
+    print(f"{'workers':>8} {'seconds':>9} {'sweeps':>7} {'speedup':>8} {'efficiency':>10}")
+    results = strong_scaling(model, list(range(1, args.max_workers + 1)), gamma=args.gamma,
+                             mode=args.mode, task="policy_iteration")
+    for r in results:
+        print(f"{r['workers']:>8} {r['seconds']:>9.2f} {r['sweeps']:>7} {r['speedup']:>8.2f} {r['efficiency']:>10.2f}")
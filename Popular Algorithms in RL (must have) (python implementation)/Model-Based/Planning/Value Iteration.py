@@ -0,0 +1,65 @@
+## Value Iteration (model-based planning)
+##
+## Two ways of solving the same maze model:
+##   1) synchronous value iteration: back up every state, every sweep
+##   2) prioritized sweeping: back up the most urgent state first, and queue the
+##      predecessors of a state only when its value changed by more than theta
+## Work is compared as backups + error evaluations (each costs about one backup) against
+## the backups of full sweeps; the full sweeps are vectorized and prioritized sweeping is
+## a Python loop, so the wall times are reported next to it.
+## The model is the one from demos/test.py (walls + reward_fn), compiled into tables and a
+## sparse model, plus a larger open grid to show how the saving grows with the state count.
+## Run: python "Value Iteration.py"
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+
+from rl_utils.compiled_tables import TransitionTables, grid_tables
+from rl_utils.prioritized_sweeping import prioritized_value_iteration
+from rl_utils.scripts import load_script
+from rl_utils.sparse_model import SparseModel, greedy_policy, value_iteration
+
+GAMMA = 0.95
+THETA = 1e-6
+
+
+def compare(name, model):
+    active_states = int(model.active.sum())
+
+    start = time.perf_counter()
+    V_sync, sweeps = value_iteration(model, gamma=GAMMA, theta=THETA)
+    sync_seconds = time.perf_counter() - start
+    sync_backups = sweeps * active_states
+
+    V_prio, stats = prioritized_value_iteration(model, gamma=GAMMA, theta=THETA)
+
+    same_policy = np.array_equal(
+        np.argmax(greedy_policy(model, V_sync, GAMMA), axis=1),
+        np.argmax(greedy_policy(model, V_prio, GAMMA), axis=1),
+    )
+
+    print(f"--- {name}: {active_states} states")
+    print(f"full sweeps:          {sweeps} sweeps, {sync_backups} backups, {sync_seconds:.3f}s")
+    work = stats["backups"] + stats["error_evaluations"]
+    print(f"prioritized sweeping: {stats['backups']} backups + {stats['error_evaluations']} error evaluations "
+          f"({work / sync_backups:.1%} of full sweeps), {stats['seconds']:.3f}s "
+          f"({stats['seconds'] / sync_seconds:.1f}x the full-sweep wall time)")
+    print(f"max |V_sync - V_prio| = {np.max(np.abs(V_sync - V_prio)):.2e}, same greedy policy: {same_policy}")
+    return V_prio
+
+
+if __name__ == "__main__":
+    # 1) the demos/test.py maze
+    maze = load_script("demos/test.py")
+    V = compare("demos/test.py maze", maze.build_sparse_model())
+    print(np.round(V.reshape(maze.ROWS, maze.COLS), 2))
+
+    # 2) open 60x60 grid, -1 per step, +10 for reaching the bottom-right corner
+    grid = grid_tables(60, 60)
+    grid = TransitionTables(grid.next_state, np.where(grid.done, 10.0, -1.0), grid.done)
+    compare("60x60 grid", SparseModel.from_tables(grid))
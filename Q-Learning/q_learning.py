@@ -1,5 +1,17 @@
+import os
+import sys
 import numpy as np
-import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rl_utils.action_selection import EpsilonGreedy, epsilon_greedy_one
+from rl_utils.batched_td import scatter_td_update
+from rl_utils.compiled_tables import grid_tables
+from rl_utils.instrumentation import EPISODE, clock
+from rl_utils.rng import make_rng
+from rl_utils.state_encoding import GridEncoder
+from rl_utils.training_control import TrainingControl
+from rl_utils.vector_gridworld import VectorGridWorld
 
 # =========================
 # Environment
@@ -13,37 +25,19 @@ class GridWorld:
         self.terminal = (rows - 1, cols - 1)
         self.state = None
 
+        # dynamics compiled once (actions 0=up, 1=right, 2=left, 3=down, stay in place at
+        # the border); step() is a lookup in the compiled tables
+        self._outcomes = grid_tables(rows, cols, self.terminal).cell_outcomes(cols)
+
     def reset(self):
         self.state = self.start
         return self.state
 
     def step(self, action):
-        r, c = self.state
-
-        if action == 0:      # up
-            r -= 1
-        elif action == 1:    # right
-            c += 1
-        elif action == 2:    # left
-            c -= 1
-        elif action == 3:    # down
-            r += 1
-        else:
-            raise ValueError("Invalid action")
-
-        # boundary check
-        if r < 0 or r >= self.rows or c < 0 or c >= self.cols:
-            r, c = self.state
-
-        next_state = (r, c)
-
-        if next_state == self.terminal:
-            reward = 0
-            done = True
-        else:
-            reward = -1
-            done = False
-
+        try:
+            next_state, reward, done = self._outcomes[self.state][action]
+        except IndexError:
+            raise ValueError("Invalid action") from None
         self.state = next_state
         return next_state, reward, done
 
@@ -52,14 +46,9 @@ class GridWorld:
 # Behavior Policy (ε-greedy)
 # =========================
 
-def epsilon_greedy(Q, state, epsilon):
-    if random.random() < epsilon:
-        return random.randint(0, Q.shape[-1] - 1)
-
-    q_vals = Q[state]
-    max_q = np.max(q_vals)
-    best_actions = np.where(q_vals == max_q)[0]
-    return np.random.choice(best_actions)
+def epsilon_greedy(Q, state, epsilon, rng=None):
+    # rng: rl_utils.rng stream (scalars come from pre-drawn blocks), None -> global stream
+    return epsilon_greedy_one(Q[state].tolist(), epsilon, make_rng(rng))
 
 
 # =========================
@@ -67,31 +56,124 @@ def epsilon_greedy(Q, state, epsilon):
 # =========================
 
 class QLearningAgent:
-    def __init__(self, rows, cols, num_actions, alpha, gamma, epsilon):
-        self.Q = np.zeros((rows, cols, num_actions))
+    def __init__(self, rows, cols, num_actions, alpha, gamma, epsilon, rng=None, explorer=None, encoder=None,
+                 table=None):
+        # Q is (num_states, num_actions), indexed by int state ids; the encoder maps the
+        # environment's states to ids (default: (row, col) -> row * cols + col).
+        # table: rl_utils.hashed_q.HashedQTable to allocate rows on first visit instead;
+        # Q rows are then indexed by self.rows(state ids)
+        self.encoder = encoder if encoder is not None else GridEncoder(rows, cols)
+        self.table = table
+        self._Q = np.zeros((self.encoder.num_states, num_actions)) if table is None else None
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
         self.num_actions = num_actions
-
-    def train(self, env, episodes):
-        for _ in range(episodes):
-            state = env.reset()
+        self.rng = make_rng(rng)       # seed or rl_utils.rng stream, for reproducible runs
+
+        # behaviour policy (rl_utils.action_selection): epsilon-greedy unless another
+        # selector (Boltzmann, UCBExploration) is passed
+        self.explorer = explorer if explorer is not None else EpsilonGreedy(epsilon, self.rng)
+
+    @property
+    def Q(self):
+        return self._Q if self.table is None else self.table.values
+
+    def rows(self, state_ids):
+        """Q row of every state id: the id itself, or its hashed-table row."""
+        return state_ids if self.table is None else self.table.lookup(state_ids)
+
+    def train(self, env, episodes=None, returns=None, control=None, instrument=None):
+        # returns: optional list, gets the total reward of every episode appended
+        # control: rl_utils.training_control.TrainingControl with time / step budgets, a
+        #          per-episode step cap and convergence criteria; `episodes` caps the run too.
+        # instrument: rl_utils.instrumentation.Recorder (phase timers, visits, TD errors)
+        # Returns the TrainingReport (why and when training stopped).
+        control = (control if control is not None else TrainingControl()).start(episodes)
+        rec = instrument
+        encode = self.encoder.encode
+        if self.table is not None:
+            lookup = self.table.lookup
+            encode = lambda obs: lookup(self.encoder.encode(obs))
+
+        while not control.stopped:
+            started = clock() if rec else 0
+            state = encode(env.reset())
             done = False
+            total = 0.0
 
             while not done:
                 # behavior
-                action = epsilon_greedy(self.Q, state, self.epsilon)
+                t0 = clock() if rec else 0
+                action = self.explorer.select_one(self.Q, state)
 
-                next_state, reward, done = env.step(action)
+                t1 = clock() if rec else 0
+                next_obs, reward, done = env.step(action)
+                next_state = encode(next_obs)
+                t2 = clock() if rec else 0
+                Q = self.Q                      # a hashed table may have grown
+                total += reward
 
                 # Q-learning target (OFF-POLICY)
-                td_target = reward + self.gamma * np.max(self.Q[next_state])
-                td_error = td_target - self.Q[state][action]
+                td_target = reward + self.gamma * Q[next_state].max()
+                td_error = td_target - Q[state, action]
 
-                self.Q[state][action] += self.alpha * td_error
+                delta = self.alpha * td_error
+                Q[state, action] += delta
+                control.update(state, delta, Q[state] if control.tracks_policy else None)
+                if rec:
+                    rec.step(state, td_error, t0, t1, t2, clock())
 
                 state = next_state
+                if control.step():
+                    break
+
+            if returns is not None:
+                returns.append(total)
+            if rec:
+                rec.span(EPISODE, started, clock())
+            control.end_episode(truncated=not done)
+
+        if rec:
+            rec.add("episodes", control.episode)
+            rec.add("steps", control.steps)
+            rec.add("backups", control.steps)
+        return control.report()
+
+    # -------------------------
+    # Batched (vectorized) path
+    # -------------------------
+    # states / next_states are flat ids (row * cols + col), as used by VectorGridWorld;
+    # update_batch takes Q rows (self.rows(ids), the ids themselves without a hashed table)
+
+    def update_batch(self, states, actions, rewards, next_states, dones, duplicates="sequential"):
+        Q = self.Q
+
+        # Q-learning target (OFF-POLICY), no bootstrap from terminal transitions
+        td_target = rewards + self.gamma * np.max(Q[next_states], axis=1) * (1.0 - dones)
+
+        scatter_td_update(Q, states, actions, td_target, self.alpha, duplicates)
+
+    def train_vectorized(self, vec_env, steps, duplicates="sequential", reset=True):
+        """
+        Run `steps` batched steps on a VectorGridWorld; returns the number of finished episodes.
+        reset=False continues the environments' running episodes (training in chunks).
+        """
+        states = vec_env.reset() if reset else vec_env.states
+        episodes = 0
+
+        for _ in range(steps):
+            rows = self.rows(states)
+            actions = self.explorer.select(self.Q, rows)
+
+            next_states, rewards, dones = vec_env.step(actions)
+
+            self.update_batch(rows, actions, rewards, self.rows(next_states), dones, duplicates)
+
+            states = vec_env.states
+            episodes += int(dones.sum())
+
+        return episodes
 
 
 # =========================
@@ -116,4 +198,11 @@ if __name__ == "__main__":
     agent.train(env, episodes=500)
 
     print("Learned Q-values:")
-    print(agent.Q)
+    print(agent.encoder.grid(agent.Q))
+
+    # same problem, 256 environments per step
+    vec_agent = QLearningAgent(rows, cols, num_actions, alpha=0.1, gamma=0.99, epsilon=0.1)
+    vec_agent.train_vectorized(VectorGridWorld(256, rows, cols), steps=200)
+
+    print("Learned Q-values (vectorized):")
+    print(vec_agent.encoder.grid(vec_agent.Q))
@@ -1,5 +1,18 @@
+import os
+import sys
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rl_utils.action_selection import EpsilonGreedy, epsilon_greedy_one
+from rl_utils.batched_td import scatter_td_update
+from rl_utils.compiled_tables import grid_tables
+from rl_utils.instrumentation import ENV_STEP, EPISODE, SELECT, UPDATE, clock
+from rl_utils.rng import make_rng
+from rl_utils.state_encoding import GridEncoder
+from rl_utils.training_control import TrainingControl
+from rl_utils.vector_gridworld import VectorGridWorld
+
 class Environment:
     def __init__(self, rows, cols):
         self.rows = rows
@@ -7,97 +20,175 @@ class Environment:
         self.start = (0, 0)
         self.terminal_state = (rows - 1, cols - 1)
         self.current_state = None
+        self.encoder = GridEncoder(rows, cols)     # states are handed out as flat ids
 
-    def _coord_to_state_id(self, coord):
-        row, col = coord
-        return row * self.cols + col
+        # dynamics compiled once (actions 0=up, 1=right, 2=left, 3=down, stay in place at
+        # the border); step() is a lookup in the compiled tables
+        self._outcomes = grid_tables(rows, cols, self.terminal_state).cell_outcomes(cols, flat_ids=True)
 
     def reset_env(self):
         self.current_state = self.start
-        return self._coord_to_state_id(self.current_state)
+        return self.encoder.encode(self.current_state)
 
     def step(self, action):
-        row, col = self.current_state
-
-        if action == 0:      # up
-            new_row, new_col = row - 1, col
-        elif action == 1:    # right
-            new_row, new_col = row, col + 1
-        elif action == 2:    # left
-            new_row, new_col = row, col - 1
-        elif action == 3:    # down
-            new_row, new_col = row + 1, col
-        else:
-            raise ValueError("Invalid action")
-
-        # boundary check
-        if (
-            new_row < 0 or new_row >= self.rows or
-            new_col < 0 or new_col >= self.cols
-        ):
-            new_row, new_col = row, col
-
-        self.current_state = (new_row, new_col)
-        next_state_id = self._coord_to_state_id(self.current_state)
-
-        if self.current_state == self.terminal_state:
-            reward = 0
-            done = True
-        else:
-            reward = -1
-            done = False
-
+        try:
+            next_state_id, reward, done = self._outcomes[self.current_state][action]
+        except IndexError:
+            raise ValueError("Invalid action") from None
+        self.current_state = divmod(next_state_id, self.cols)
         return next_state_id, reward, done
 
 
 
 class Agent:
-    def __init__(self, num_states, num_actions, alpha, gamma):
-        self.q_values = np.zeros((num_states, num_actions))
+    def __init__(self, num_states, num_actions, alpha, gamma, table=None):
+        # table: rl_utils.hashed_q.HashedQTable to allocate rows on first visit instead of
+        # (num_states, num_actions) up front; s / s_next below are then Q rows (self.rows(ids))
+        self.table = table
+        self._q_values = np.zeros((num_states, num_actions)) if table is None else None
         self.alpha = alpha
         self.gamma = gamma
+        self.td_error = 0.0                        # of the last update()
+
+    @property
+    def q_values(self):
+        return self._q_values if self.table is None else self.table.values
+
+    def rows(self, state_ids):
+        """Q row of every state id: the id itself, or its hashed-table row."""
+        return state_ids if self.table is None else self.table.lookup(state_ids)
 
     def update(self, s, a, r, s_next, a_next):
         current = self.q_values[s, a]
         next_val = self.q_values[s_next, a_next]
 
         target = r + self.gamma * next_val
-        self.q_values[s, a] += self.alpha * (target - current)
+        self.td_error = target - current
+        delta = self.alpha * self.td_error
+        self.q_values[s, a] += delta
+        return delta
+
+    def update_batch(self, s, a, r, s_next, a_next, done, duplicates="sequential"):
+        next_val = self.q_values[s_next, a_next] * (1.0 - done)
+
+        target = r + self.gamma * next_val
+        scatter_td_update(self.q_values, s, a, target, self.alpha, duplicates)
 
 
 
-def epsilon_greedy_policy(q_vals, epsilon):
-    if np.random.rand() < epsilon:
-        return np.random.randint(len(q_vals))
-    else:
-        max_q = np.max(q_vals)
-        best_actions = np.where(q_vals == max_q)[0]
-        return np.random.choice(best_actions)
+def epsilon_greedy_policy(q_vals, epsilon, rng=None):
+    # rng: rl_utils.rng stream (scalars come from pre-drawn blocks), None -> global stream
+    return epsilon_greedy_one(np.asarray(q_vals).tolist(), epsilon, make_rng(rng))
 
 
 
-def train_sarsa(episodes=50, rows=5, cols=5, alpha=0.1, gamma=0.99, epsilon=0.1):
+def train_sarsa(episodes=50, rows=5, cols=5, alpha=0.1, gamma=0.99, epsilon=0.1, rng=None, explorer=None,
+                table=None, returns=None, agent=None, control=None, instrument=None):
+    # explorer: behaviour policy from rl_utils.action_selection (default epsilon-greedy)
+    # table: optional rl_utils.hashed_q.HashedQTable (see Agent)
+    # returns: optional list, gets the total reward of every episode appended
+    # agent: continue training this agent for `episodes` more (pass the same rng to keep
+    #        one random stream across calls)
+    # control: rl_utils.training_control.TrainingControl (budgets, per-episode step cap,
+    #          convergence criteria); `episodes` caps the run too, pass None to rely on
+    #          control alone. control.report() tells why and when training stopped.
+    # instrument: rl_utils.instrumentation.Recorder (phase timers, visits, TD errors)
+    control = (control if control is not None else TrainingControl()).start(episodes)
+    rec = instrument
+    if explorer is None:
+        explorer = EpsilonGreedy(epsilon, rng)
     env = Environment(rows, cols)
-    agent = Agent(
-        num_states=rows * cols,
-        num_actions=4,
-        alpha=alpha,
-        gamma=gamma
-    )
-
-    for _ in range(episodes):
-        state = env.reset_env()
-        action = epsilon_greedy_policy(agent.q_values[state], epsilon)
+    if agent is None:
+        agent = Agent(
+            num_states=rows * cols,
+            num_actions=4,
+            alpha=alpha,
+            gamma=gamma,
+            table=table
+        )
+
+    while not control.stopped:
+        started = clock() if rec else 0
+        state = agent.rows(env.reset_env())
+        action = explorer.select_one(agent.q_values, state)
         done = False
+        total = 0.0
 
         while not done:
+            t0 = clock() if rec else 0
             next_state, reward, done = env.step(action)
-            next_action = epsilon_greedy_policy(agent.q_values[next_state], epsilon)
-
-            agent.update(state, action, reward, next_state, next_action)
+            total += reward
+            next_state = agent.rows(next_state)
+            t1 = clock() if rec else 0
+            next_action = explorer.select_one(agent.q_values, next_state)
+
+            t2 = clock() if rec else 0
+            delta = agent.update(state, action, reward, next_state, next_action)
+            control.update(state, delta, agent.q_values[state] if control.tracks_policy else None)
+            if rec:
+                # SARSA steps the env before it picks the next action
+                rec.span(ENV_STEP, t0, t1)
+                rec.span(SELECT, t1, t2)
+                rec.span(UPDATE, t2, clock())
+                rec.transition(state, agent.td_error)
 
             state = next_state
             action = next_action
+            if control.step():
+                break
+
+        if returns is not None:
+            returns.append(total)
+        if rec:
+            rec.span(EPISODE, started, clock())
+        control.end_episode(truncated=not done)
+
+    if rec:
+        rec.add("episodes", control.episode)
+        rec.add("steps", control.steps)
+        rec.add("backups", control.steps)
+
+    return agent
+
+
+
+def train_sarsa_vectorized(steps=200, num_envs=256, rows=5, cols=5, alpha=0.1, gamma=0.99,
+                           epsilon=0.1, duplicates="sequential", env=None, agent=None, reset=True, rng=None,
+                           explorer=None):
+    # pass env (e.g. a generated maze, rl_utils/maze_generator.py) and/or agent to train on
+    # another layout or continue training; reset=False keeps the env's running episodes
+    if env is None:
+        env = VectorGridWorld(num_envs, rows, cols)
+    if agent is None:
+        agent = Agent(
+            num_states=env.num_states,
+            num_actions=env.num_actions,
+            alpha=alpha,
+            gamma=gamma
+        )
+
+    if explorer is None:
+        explorer = EpsilonGreedy(epsilon, rng)
+
+    # action and next action live in two buffers that swap every step; states are held
+    # as Q rows (agent.rows)
+    state = agent.rows(env.reset() if reset else env.states)
+    action = explorer.select(agent.q_values, state, out=np.empty(env.num_envs, dtype=np.int64))
+    spare = np.empty_like(action)
+
+    for _ in range(steps):
+        next_state, reward, done = env.step(action)
+        next_state = agent.rows(next_state)
+
+        # finished environments were reset, so their next action is picked from the start
+        # state; it is not used in their (terminal) target
+        acting = agent.rows(env.states)
+        next_action = explorer.select(agent.q_values, acting, out=spare)
+
+        agent.update_batch(state, action, reward, next_state, next_action, done, duplicates)
+
+        state = acting
+        action, spare = next_action, action
 
     return agent
 
@@ -106,3 +197,6 @@ def train_sarsa(episodes=50, rows=5, cols=5, alpha=0.1, gamma=0.99, epsilon=0.1)
 if __name__ == "__main__":
     training = train_sarsa()
     print(training.q_values)
+
+    vectorized = train_sarsa_vectorized()
+    print(vectorized.q_values)
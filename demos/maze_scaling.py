@@ -0,0 +1,148 @@
+# maze_scaling.py
+# Scaling benchmark on procedurally generated mazes (rl_utils/maze_generator.py).
+# For every maze size, records per algorithm:
+#   seconds     time to convergence (or to the budget, see "converged")
+#   backups/s   Bellman backups per second (policy iteration) or TD updates per second
+#   memory_mb   bytes of the main data structures (sparse model + V, or Q tables)
+#   rss_mb      peak resident set size of the process so far
+# Policy iteration has converged when its policy is stable; the TD agents when their greedy
+# policy walks from START to GOAL along a shortest path (checked between training chunks).
+# Run: python demos/maze_scaling.py [--sizes 10 20 50 100] [--kind random] [--json out.json]
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rl_utils.maze_generator import generate_maze
+from rl_utils.rng import stream
+from rl_utils.scripts import load_script
+from rl_utils.sparse_model import modified_policy_iteration
+
+ALGORITHMS = ("pi", "q_learning", "sarsa", "double_q")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def greedy_path_length(tables, Q, start, limit):
+    """Steps the greedy policy of Q needs from start to a terminal transition (inf if it never gets there)."""
+    s = start
+    for steps in range(1, limit + 1):
+        a = int(np.argmax(Q[s]))
+        s_next = int(tables.next_state[s, a])
+        if tables.done[s, a]:
+            return steps
+        s = s_next
+    return np.inf
+
+
+def bench_policy_iteration(maze, gamma):
+    start = time.perf_counter()
+    model = maze.model()
+    _, V, history = modified_policy_iteration(model, gamma=gamma, eval_sweeps=None, warm_start=False)
+    seconds = time.perf_counter() - start
+    backups = sum(h["backups"] for h in history)
+    P = model.P
+    model_bytes = P.data.nbytes + P.indices.nbytes + P.indptr.nbytes + model.R.nbytes + V.nbytes
+    return {"seconds": seconds, "converged": True, "updates": backups,
+            "iterations": len(history), "memory_mb": model_bytes / 2**20}
+
+
+def bench_td(name, maze, args):
+    """Train in chunks until the greedy path is a shortest path or args.max_steps batched steps."""
+    shortest = maze.shortest_path_length()
+    tables = maze.tables()
+    start_id = maze.state_id(maze.start)
+    env = maze.vector_env(args.num_envs, rng=stream(args.seed, 0))
+    rng = stream(args.seed, 1)                 # exploration (and Double Q's coin flips)
+
+    if name == "q_learning":
+        module = load_script("Q-Learning/q_learning.py")
+        agent = module.QLearningAgent(maze.rows, maze.cols, env.num_actions, args.alpha, args.gamma, args.epsilon,
+                                      rng=rng)
+        train = lambda reset: agent.train_vectorized(env, args.chunk, reset=reset)
+        q_values = lambda: agent.Q
+        table_bytes = lambda: agent.Q.nbytes
+    elif name == "sarsa":
+        module = load_script("SARSA/sarsa.py")
+        agent = module.Agent(maze.num_states, env.num_actions, args.alpha, args.gamma)
+        train = lambda reset: module.train_sarsa_vectorized(
+            args.chunk, epsilon=args.epsilon, env=env, agent=agent, reset=reset, rng=rng)
+        q_values = lambda: agent.q_values
+        table_bytes = lambda: agent.q_values.nbytes
+    else:
+        module = load_script("Double Q-Learning/double-q_learning.py")
+        agent = module.Agent(maze.rows, maze.cols, env.num_actions, args.alpha, args.gamma, rng=rng)
+        train = lambda reset: module.train_double_qlearning_vectorized(
+            args.chunk, args.num_envs, maze.rows, maze.cols, env.num_actions, args.epsilon,
+            args.gamma, args.alpha, env=env, agent=agent, reset=reset)
+        q_values = lambda: agent.Q_A + agent.Q_B
+        table_bytes = lambda: agent.Q_A.nbytes + agent.Q_B.nbytes
+
+    steps, seconds, converged = 0, 0.0, False
+    while steps < args.max_steps:
+        start = time.perf_counter()
+        train(reset=steps == 0)
+        seconds += time.perf_counter() - start
+        steps += args.chunk
+        if greedy_path_length(tables, q_values(), start_id, int(shortest)) == shortest:
+            converged = True
+            break
+
+    return {"seconds": seconds, "converged": converged, "updates": steps * args.num_envs,
+            "iterations": steps, "memory_mb": table_bytes() / 2**20}
+
+
+def run(args):
+    results = []
+    for size in args.sizes:
+        start = time.perf_counter()
+        maze = generate_maze(size, size, kind=args.kind, seed=args.seed, slip=args.slip)
+        generate_seconds = time.perf_counter() - start
+        print(f"--- {size}x{size} {args.kind} maze: {int((maze.walls == 0).sum())} open cells, "
+              f"shortest path {maze.shortest_path_length():.0f}, generated in {generate_seconds:.2f}s")
+
+        for name in args.algorithms:
+            if name != "pi" and size > args.max_td_size:
+                continue
+            record = bench_policy_iteration(maze, args.gamma) if name == "pi" else bench_td(name, maze, args)
+            record.update({"size": size, "algorithm": name, "kind": args.kind, "seed": args.seed,
+                           "slip": args.slip, "updates_per_sec": record["updates"] / max(record["seconds"], 1e-12),
+                           "rss_mb": peak_rss_mb()})
+            results.append(record)
+            print(f"{name:>11} {record['seconds']:>9.3f}s {'' if record['converged'] else '(budget) '}"
+                  f"{record['updates_per_sec']:>14,.0f} backups/s {record['memory_mb']:>9.2f} MB "
+                  f"rss {record['rss_mb']:>8.1f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--kind", choices=("backtracker", "random"), default="backtracker")
+    parser.add_argument("--slip", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--epsilon", type=float, default=0.1)
+    parser.add_argument("--num-envs", type=int, default=256)
+    parser.add_argument("--chunk", type=int, default=100, help="batched steps between convergence checks")
+    parser.add_argument("--max-steps", type=int, default=20_000, help="batched-step budget per TD agent")
+    parser.add_argument("--max-td-size", type=int, default=100, help="largest maze the TD agents are run on")
+    parser.add_argument("--json", help="write the records to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
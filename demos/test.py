@@ -3,9 +3,19 @@
 # EDIT only in the section marked: "# --- USER: edit here ---"
 # Run: python simple_maze_policy_iteration.py
 
+import os
+import sys
 import numpy as np
 import cv2
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rl_utils.compiled_tables import compile_transition_fn
+from rl_utils.instrumentation import EVALUATE, IMPROVE, SWEEP, clock
+from rl_utils.sparse_model import SparseModel, bellman_residual, evaluate_policy, evaluate_policy_exact, greedy_policy
+from rl_utils.sparse_model import modified_policy_iteration as sparse_modified_policy_iteration
+from rl_utils.parallel_dp import ParallelDP
+
 # --------------------------
 # 1) Maze config (numpy grid)
 # --------------------------
@@ -26,6 +36,17 @@ def s2rc(s): return (s // COLS, s % COLS)
 N_STATES = ROWS * COLS
 N_ACTIONS = 4   # 0=up,1=right,2=down,3=left
 
+# Swap in a generated maze (rl_utils/maze_generator.py) instead of the config above.
+# For big mazes build the model with build_sparse_model(maze.tables()): compile_tables()
+# calls reward_fn once per (state, action) in Python.
+def use_maze(maze):
+    global ROWS, COLS, WALLS, START, GOAL, walls, N_STATES
+    ROWS, COLS = maze.rows, maze.cols
+    WALLS = maze.wall_list
+    START, GOAL = maze.start, maze.goal
+    walls = maze.walls.copy()
+    N_STATES = ROWS * COLS
+
 # --------------------------
 # --- USER: edit here ------
 # Define reward and terminal logic here. Keep it simple.
@@ -69,23 +90,61 @@ def next_state_reward_done(s, a, step_count=0):
     return next_s, float(reward), bool(done)
 
 # --------------------------
-# 3) Build model P[s][a] = [(prob, next_s, r, done)]
+# 3) Compile dynamics into flat tables next_state[S,A], reward[S,A], done[S,A]
+#    and build model P[s][a] = [(prob, next_s, r, done)] from them
 #    (deterministic -> single tuple with prob=1)
+#    Tables are compiled with step_count=0, so the model ignores step_count; the
+#    greedy rollout in main() steps next_state_reward_done with the real count.
 # --------------------------
-def build_model():
-    P = {s: {a: [] for a in range(N_ACTIONS)} for s in range(N_STATES)}
-    for s in range(N_STATES):
-        for a in range(N_ACTIONS):
-            ns, r, done = next_state_reward_done(s, a, step_count=0)
-            P[s][a].append((1.0, ns, r, done))
-    return P
+def compile_tables():
+    return compile_transition_fn(
+        N_STATES, N_ACTIONS, lambda s, a: next_state_reward_done(s, a, step_count=0)
+    )
+
+def build_model(tables=None):
+    if tables is None:
+        tables = compile_tables()
+    return tables.to_model()
+
+# Same model in CSR form (see rl_utils/sparse_model.py) for large mazes:
+# policy_evaluation / policy_iteration below accept either format.
+def build_sparse_model(tables=None):
+    if tables is None:
+        tables = compile_tables()
+    return SparseModel.from_tables(tables, active=(walls.ravel() == 0))
 
 # --------------------------
 # 4) Policy Evaluation (model-based)
+#    backend="sweep" iterates the Bellman expectation backup (default);
+#    "direct" / "gmres" / "bicgstab" solve (I - gamma P_pi) V = r_pi instead,
+#    which is much faster for gamma close to 1. return_residual=True also
+#    returns max |r_pi + gamma P_pi V - V|. instrument (rl_utils.instrumentation.Recorder)
+#    times every in-place sweep and counts sweeps / backups.
 # --------------------------
-def policy_evaluation(P, policy, gamma=0.95, theta=1e-6):
+def policy_evaluation(P, policy, gamma=0.95, theta=1e-6, backend="sweep", return_residual=False,
+                      instrument=None):
+    if backend != "sweep" or return_residual:
+        model = P if isinstance(P, SparseModel) else SparseModel.from_dict(
+            P, N_STATES, N_ACTIONS, active=(walls.ravel() == 0))
+        if backend == "sweep":
+            V = policy_evaluation(P, policy, gamma=gamma, theta=theta)
+            P_pi, r_pi = model.policy_operator(policy)
+            residual = bellman_residual(P_pi, r_pi, V, gamma)
+        else:
+            V, residual = evaluate_policy_exact(model, policy, gamma=gamma, backend=backend)
+        return (V, residual) if return_residual else V
+    if isinstance(P, SparseModel):
+        # one sparse matrix-vector product per sweep
+        V, sweeps = evaluate_policy(P, policy, gamma=gamma, theta=theta)
+        if instrument:
+            instrument.add("sweeps", sweeps)
+            instrument.add("backups", sweeps * int(P.active.sum()))
+        return V
+    rec = instrument
     V = np.zeros(N_STATES)
     while True:
+        t0 = clock() if rec else 0
+        backups = 0
         delta = 0.0
         for s in range(N_STATES):
             # skip wall cells (optional: treat wall states as not used)
@@ -98,17 +157,41 @@ def policy_evaluation(P, policy, gamma=0.95, theta=1e-6):
                     v += pi_sa * prob * (rew + (0.0 if done else gamma * V[ns]))
             delta = max(delta, abs(v - V[s]))
             V[s] = v
+            backups += 1
+        if rec:
+            rec.span(SWEEP, t0, clock())
+            rec.add("sweeps")
+            rec.add("backups", backups)
         if delta < theta:
             break
     return V
 
 # --------------------------
 # 5) Policy Iteration (model-based)
+#    instrument: rl_utils.instrumentation.Recorder (evaluate / sweep / improve timers,
+#    iteration, sweep and backup counters)
 # --------------------------
-def policy_iteration(P, gamma=0.95):
+def policy_iteration(P, gamma=0.95, backend="sweep", instrument=None):
+    rec = instrument
     policy = np.ones((N_STATES, N_ACTIONS)) / N_ACTIONS  # start uniform
+    if backend != "sweep" and not isinstance(P, SparseModel):
+        P = SparseModel.from_dict(P, N_STATES, N_ACTIONS, active=(walls.ravel() == 0))
     while True:
-        V = policy_evaluation(P, policy, gamma=gamma)
+        t0 = clock() if rec else 0
+        V = policy_evaluation(P, policy, gamma=gamma, backend=backend, instrument=rec)
+        t1 = clock() if rec else 0
+        if rec:
+            rec.span(EVALUATE, t0, t1)
+            rec.add("iterations")
+        if isinstance(P, SparseModel):
+            new_policy = greedy_policy(P, V, gamma=gamma)
+            policy_stable = np.array_equal(np.argmax(new_policy, axis=1), np.argmax(policy, axis=1))
+            policy = new_policy
+            if rec:
+                rec.span(IMPROVE, t1, clock())
+            if policy_stable:
+                return policy, V
+            continue
         policy_stable = True
         for s in range(N_STATES):
             r,c = s2rc(s)
@@ -126,9 +209,35 @@ def policy_iteration(P, gamma=0.95):
             policy[s] = new_pi
             if best_a != old_action:
                 policy_stable = False
+        if rec:
+            rec.span(IMPROVE, t1, clock())
         if policy_stable:
             return policy, V
 
+# --------------------------
+# 5b) Modified policy iteration (model-based)
+#     Warm-starts from the previous V and runs only a few evaluation sweeps per
+#     improvement step. eval_sweeps: k (int), "adaptive", or None (full evaluation).
+#     Returns (policy, V, history) with sweeps / backups / seconds per outer iteration.
+# --------------------------
+def modified_policy_iteration(P, gamma=0.95, eval_sweeps="adaptive", theta=1e-6):
+    if not isinstance(P, SparseModel):
+        P = SparseModel.from_dict(P, N_STATES, N_ACTIONS, active=(walls.ravel() == 0))
+    return sparse_modified_policy_iteration(P, gamma=gamma, theta=theta, eval_sweeps=eval_sweeps)
+
+# --------------------------
+# 5c) Parallel policy iteration (model-based)
+#     States are split into blocks swept by a process pool, V lives in shared memory
+#     (see rl_utils/parallel_dp.py). mode: "jacobi" or "gauss-seidel".
+#     Call it under `if __name__ == "__main__":` (worker processes are started).
+# --------------------------
+def parallel_policy_iteration(P, gamma=0.95, workers=None, mode="jacobi", theta=1e-6):
+    if not isinstance(P, SparseModel):
+        P = SparseModel.from_dict(P, N_STATES, N_ACTIONS, active=(walls.ravel() == 0))
+    with ParallelDP(P, workers=workers, mode=mode) as dp:
+        policy, V, _ = dp.policy_iteration(gamma=gamma, theta=theta)
+    return policy, V
+
 # --------------------------
 # 6) Minimal OpenCV UI to show grid, values and greedy arrows
 #    Press SPACE to run a greedy rollout from START. ESC or q to quit.
@@ -193,7 +302,8 @@ def draw_agent(img, s):
 # 7) Run policy iteration and UI
 # --------------------------
 def main():
-    P = build_model()
+    tables = compile_tables()
+    P = build_model(tables)
     policy, V = policy_iteration(P, gamma=0.95)
 
     cv2.namedWindow("Maze - Policy Iteration", cv2.WINDOW_AUTOSIZE)
@@ -220,7 +330,7 @@ def main():
                 cv2.waitKey(200)
                 a = int(np.argmax(policy[s])) if np.sum(policy[s])>0 else np.random.randint(0,N_ACTIONS)
                 ns, rwd, done = next_state_reward_done(s, a, step_count=steps+1)
-                s = ns
+                s = int(ns)
                 steps += 1
             # final display
             frame = init_frame()
@@ -0,0 +1,4 @@
+## Shared helpers for the tabular agents, the dynamic-programming demos and the bandits.
+##
+## The algorithm folders (Q-Learning/, SARSA/, Double Q-Learning/, demos/, ...) are plain
+## scripts, so they add the repository root to sys.path before importing from here.
@@ -0,0 +1,247 @@
+import math
+
+import numpy as np
+
+from rl_utils.rng import make_rng
+
+# =========================
+# Shared action selection for the tabular agents
+# =========================
+# One interface, three exploration rules:
+#   EpsilonGreedy(epsilon)       greedy with probability 1 - epsilon, else uniform
+#   Boltzmann(temperature)       softmax over Q / temperature
+#   UCBExploration(c)            argmax Q + c sqrt(log N(s) / N(s, a)), untried actions first
+#
+#   selector.select_one(Q, state)            one action for one state (plain Python scalars)
+#   selector.select(Q, states, out=None)     one action per state of a batch
+#   selector.select_rows(q_rows, out=None)   one action per row of a (B, A) slice of Q
+#
+# Q is the agent's table indexed by state (Q[state] is the action row), or a tuple of
+# tables whose rows are summed (Double Q acts on Q_A + Q_B). Batched calls work in
+# (B, A) / (B,) buffers kept on the selector and reused while B stays the same, so a
+# training loop allocates nothing per step. The result is written to `out`, or to an
+# internal buffer that the next call overwrites (pass out= to keep two actions alive,
+# e.g. SARSA's action and next action).
+#
+# Greedy ties are broken uniformly at random without np.where / np.random.choice:
+# every greedy action gets the key 1 + u (u uniform in [0, 1)), every other action u,
+# and argmax of the keys picks one of the greedy actions uniformly.
+#
+# greedy_one / epsilon_greedy_one are the scalar rules on a plain list of action values,
+# for code that has a single Q row rather than a table (e.g. the epsilon_greedy helpers
+# of the agent scripts).
+
+
+def greedy_one(values, rng):
+    """Index of the largest value in a list, ties broken uniformly with one draw from rng."""
+    best = max(values)
+    ties = values.count(best)
+    if ties == 1:
+        return values.index(best)
+    pick = rng.integers(ties)
+    for action, value in enumerate(values):
+        if value == best:
+            if pick == 0:
+                return action
+            pick -= 1
+
+
+def epsilon_greedy_one(values, epsilon, rng):
+    """Epsilon-greedy action for a list of action values; rng is an rl_utils.rng stream."""
+    if rng.random() < epsilon:
+        return rng.integers(len(values))
+    return greedy_one(values, rng)
+
+
+class ActionSelector:
+    def __init__(self, rng=None):
+        self.rng = make_rng(rng)       # seed or rl_utils.rng stream, None -> global stream
+        self._shape = None
+
+    # ---------- buffers ----------
+    def _buffers(self, batch, num_actions):
+        if self._shape != (batch, num_actions):
+            self._shape = (batch, num_actions)
+            self._rows = np.empty((batch, num_actions))
+            self._extra = np.empty((batch, num_actions))
+            self._keys = np.empty((batch, num_actions))
+            self._mask = np.empty((batch, num_actions), dtype=bool)
+            self._column = np.empty((batch, 1))
+            self._uniform = np.empty(batch)
+            self._flag = np.empty(batch, dtype=bool)
+            self._actions = np.empty(batch, dtype=np.int64)
+
+    def _gather(self, q, states):
+        """Q rows of a batch of flat state ids into the reused (B, A) buffer."""
+        tables = q if isinstance(q, tuple) else (q,)
+        num_actions = tables[0].shape[-1]
+        self._buffers(len(states), num_actions)
+        np.take(tables[0].reshape(-1, num_actions), states, axis=0, out=self._rows)
+        for table in tables[1:]:
+            np.take(table.reshape(-1, num_actions), states, axis=0, out=self._extra)
+            self._rows += self._extra
+        return self._rows
+
+    def _row_max(self, scores):
+        # np.max(axis=1) over a handful of actions is dominated by reduction overhead;
+        # a running np.maximum over the columns is several times faster there
+        column = self._column[:, 0]
+        if scores.shape[1] > 16:
+            return np.max(scores, axis=1, out=column)
+        np.copyto(column, scores[:, 0])
+        for a in range(1, scores.shape[1]):
+            np.maximum(column, scores[:, a], out=column)
+        return column
+
+    def _argmax_random_ties(self, scores, out):
+        self._row_max(scores)
+        np.equal(scores, self._column, out=self._mask)
+        self.rng.generator.random(out=self._keys)
+        self._keys += self._mask
+        return np.argmax(self._keys, axis=1, out=out)
+
+    # ---------- interface ----------
+    def select(self, q, states, out=None):
+        """One action per flat state id in `states`, shape (B,)."""
+        return self._select(self._gather(q, states), states, out)
+
+    def select_rows(self, q_rows, out=None):
+        """One action per row of a (B, A) slice of Q."""
+        self._buffers(*q_rows.shape)
+        return self._select(q_rows, None, out)
+
+    def select_one(self, q, state):
+        """One action (int) for one state."""
+        if isinstance(q, tuple):
+            row = q[0][state]
+            for table in q[1:]:
+                row = row + table[state]
+            values = row.tolist()
+        else:
+            values = q[state].tolist()
+        return self._select_one(values, q, state)
+
+    def _select(self, q_rows, states, out):
+        raise NotImplementedError
+
+    def _select_one(self, values, q, state):
+        raise NotImplementedError
+
+    def _greedy_one(self, values):
+        return greedy_one(values, self.rng)
+
+
+class EpsilonGreedy(ActionSelector):
+    def __init__(self, epsilon, rng=None):
+        super().__init__(rng)
+        self.epsilon = epsilon
+
+    def _select(self, q_rows, states, out):
+        out = self._actions if out is None else out
+        self._argmax_random_ties(q_rows, out)
+        if self.epsilon <= 0:
+            return out
+
+        # u < epsilon explores; u / epsilon is then uniform in [0, 1) and picks the action
+        uniform = self.rng.generator.random(out=self._uniform)
+        np.less(uniform, self.epsilon, out=self._flag)
+        uniform *= q_rows.shape[1] / self.epsilon
+        np.floor(uniform, out=uniform)
+        np.minimum(uniform, q_rows.shape[1] - 1, out=uniform)
+        np.copyto(out, uniform, casting="unsafe", where=self._flag)
+        return out
+
+    def _select_one(self, values, q, state):
+        return epsilon_greedy_one(values, self.epsilon, self.rng)
+
+
+class Boltzmann(ActionSelector):
+    """Softmax exploration: P(a) proportional to exp(Q(s, a) / temperature)."""
+
+    def __init__(self, temperature=1.0, rng=None):
+        super().__init__(rng)
+        self.temperature = temperature
+
+    def _select(self, q_rows, states, out):
+        out = self._actions if out is None else out
+        # inverse CDF on the unnormalised cumulative weights, row by row
+        self._row_max(q_rows)
+        np.subtract(q_rows, self._column, out=self._keys)
+        self._keys /= self.temperature
+        np.exp(self._keys, out=self._keys)
+        np.cumsum(self._keys, axis=1, out=self._keys)
+        uniform = self.rng.generator.random(out=self._uniform)
+        np.multiply(uniform[:, None], self._keys[:, -1:], out=self._column)
+        np.greater(self._keys, self._column, out=self._mask)
+        return np.argmax(self._mask, axis=1, out=out)
+
+    def _select_one(self, values, q, state):
+        best = max(values)
+        weights = [math.exp((v - best) / self.temperature) for v in values]
+        threshold = self.rng.random() * sum(weights)
+        for action, weight in enumerate(weights):
+            threshold -= weight
+            if threshold < 0:
+                return action
+        return len(weights) - 1
+
+
+class UCBExploration(ActionSelector):
+    """
+    Count-based UCB over state-action visits: argmax Q(s, a) + c sqrt(log N(s) / N(s, a)),
+    where N(s, a) counts how often this selector picked a in s and N(s) = sum_a N(s, a).
+    Actions never picked in s come first (ties at random). Counts live in self.counts,
+    shaped like the Q table and grown with it when the table gains rows (the values of a
+    rl_utils.hashed_q.HashedQTable); a row the table reuses after eviction keeps its counts.
+    """
+
+    def __init__(self, c=1.0, rng=None):
+        super().__init__(rng)
+        self.c = c
+        self.counts = None
+
+    def _counts(self, q):
+        table = q[0] if isinstance(q, tuple) else q
+        if self.counts is None:
+            self.counts = np.zeros(table.shape)
+        elif len(self.counts) < len(table):
+            grown = np.zeros(table.shape)
+            grown[:len(self.counts)] = self.counts
+            self.counts = grown
+        return self.counts.reshape(-1, table.shape[-1])
+
+    def select(self, q, states, out=None):
+        self._flat_counts = self._counts(q)
+        return super().select(q, states, out)
+
+    def select_rows(self, q_rows, out=None):
+        raise TypeError("UCBExploration needs the states: use select(Q, states)")
+
+    def _select(self, q_rows, states, out):
+        out = self._actions if out is None else out
+        counts = self._flat_counts
+        np.take(counts, states, axis=0, out=self._keys)                      # N(s, a)
+        np.sum(self._keys, axis=1, keepdims=True, out=self._column)          # N(s)
+        np.maximum(self._column, 1.0, out=self._column)
+        np.log(self._column, out=self._column)
+        np.equal(self._keys, 0.0, out=self._mask)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(self._column, self._keys, out=self._keys)
+        np.sqrt(self._keys, out=self._keys)
+        self._keys *= self.c
+        self._keys += q_rows
+        np.copyto(self._keys, np.inf, where=self._mask)                      # untried first
+        np.copyto(self._extra, self._keys)
+        self._argmax_random_ties(self._extra, out)
+        np.add.at(counts, (states, out), 1.0)
+        return out
+
+    def _select_one(self, values, q, state):
+        self._counts(q)
+        counts = self.counts[state]
+        visits = counts.tolist()
+        log_total = math.log(max(sum(visits), 1.0))
+        scores = [v + self.c * math.sqrt(log_total / n) if n else math.inf for v, n in zip(values, visits)]
+        action = self._greedy_one(scores)
+        counts[action] += 1
+        return action
@@ -0,0 +1,43 @@
+import numpy as np
+
+from rl_utils.rng import make_rng
+
+# =========================
+# Alias-table sampling (Walker / Vose)
+# =========================
+# O(K) to build, O(1) per draw: pick a column uniformly, then keep it or take its alias
+# with one biased coin. Used by the gradient bandit for very large action sets, where the
+# table is rebuilt only every few updates instead of renormalizing a softmax per draw.
+
+
+class AliasTable:
+    def __init__(self, probabilities):
+        p = np.asarray(probabilities, dtype=np.float64)
+        k = len(p)
+        scaled = (p * (k / p.sum())).tolist()
+        self.probabilities = p / p.sum()
+        self.keep = np.ones(k)
+        self.alias = np.arange(k)
+
+        small = [i for i, x in enumerate(scaled) if x < 1.0]
+        large = [i for i, x in enumerate(scaled) if x >= 1.0]
+        keep, alias = self.keep, self.alias
+        while small and large:
+            s, l = small.pop(), large[-1]
+            keep[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(large.pop())
+        # whatever is left in small/large is 1 up to rounding error: keep[i] stays 1
+        self.k = k
+
+    def sample(self, size=None, rng=None):
+        """One index (size=None) or an array of `size` indices drawn from the table."""
+        rng = make_rng(rng)
+        if size is None:
+            column = rng.integers(self.k)
+            return column if rng.random() < self.keep[column] else int(self.alias[column])
+        column = rng.generator.integers(self.k, size=size)
+        keep = rng.generator.random(size) < self.keep[column]
+        return np.where(keep, column, self.alias[column])
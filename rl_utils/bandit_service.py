@@ -0,0 +1,216 @@
+import asyncio
+import itertools
+import time
+
+import numpy as np
+
+# =========================
+# Micro-batched bandit decision service (asyncio)
+# =========================
+# Concurrent select() calls are queued; a single batcher task waits until max_batch
+# requests are queued or max_wait seconds have passed since the first one, then answers
+# the whole micro-batch with one agent.select_many(n) call (for ThompsonAgent: one
+# Beta draw of shape (n, K)). Every decision gets an id; reward feedback for it
+# may arrive any time later (delayed feedback) and is buffered, then applied with one
+# agent.update_many(actions, rewards) call before the next micro-batch is served (or as
+# soon as feedback_batch rewards are pending).
+# If the agent raises while serving a micro-batch, every select() in that batch raises
+# the same exception and the service keeps serving; stop() cancels the select() calls
+# still queued. If update_many raises, the rewards of that update are dropped (counted
+# in dropped_feedback, the exception kept in feedback_errors) and the exception goes to
+# the feedback() call that triggered the update, never to select() callers.
+# Works with any agent exposing select_many / update_many: ThompsonAgent, UCBAgent and
+# IndexedUCBAgent in "Exploration & Control -2/Algorithms(Code)/".
+# Run: python -m rl_utils.bandit_service   (throughput / latency per agent and max_batch)
+
+
+class BanditService:
+    def __init__(self, agent, max_batch=256, max_wait=0.001, feedback_batch=1024):
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.feedback_batch = feedback_batch
+
+        self._waiting = []                      # futures of queued select() calls
+        self._arrived = None                    # set when the queue becomes non-empty
+        self._full = None                       # set when max_batch requests are queued
+        self._task = None
+
+        self._ids = itertools.count()
+        self._outstanding = {}                  # decision id -> action, until feedback arrives
+        self._feedback_actions = []
+        self._feedback_rewards = []
+
+        self.batches = 0
+        self.decisions = 0
+        self.dropped_feedback = 0               # rewards lost to a failed update_many
+        self.feedback_errors = []               # the exceptions of those updates
+
+    # ---------- lifecycle ----------
+    async def start(self):
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._serve())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        for future in self._waiting:
+            future.cancel()
+        self._waiting = []
+        self._flush_quietly()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # ---------- requests ----------
+    async def select(self):
+        """Returns (decision_id, action) once the micro-batch holding this request is served."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        self._arrived.set()
+        if len(self._waiting) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    def feedback(self, decision_id, reward):
+        """Reward for an earlier decision; buffered and applied in batched updates."""
+        action = self._outstanding.pop(decision_id, None)
+        if action is None:
+            raise ValueError(f"unknown decision id or feedback already given: {decision_id!r}")
+        self._feedback_actions.append(action)
+        self._feedback_rewards.append(reward)
+        if len(self._feedback_actions) >= self.feedback_batch:
+            self.flush_feedback()
+
+    def flush_feedback(self):
+        """Apply the buffered rewards; if update_many raises they are dropped and it re-raises."""
+        if not self._feedback_actions:
+            return
+        actions, rewards = self._feedback_actions, self._feedback_rewards
+        self._feedback_actions, self._feedback_rewards = [], []
+        try:
+            self.agent.update_many(np.array(actions), np.array(rewards))
+        except Exception as exc:
+            self.dropped_feedback += len(actions)
+            self.feedback_errors.append(exc)
+            raise
+
+    def _flush_quietly(self):
+        # failures are recorded in feedback_errors by flush_feedback
+        try:
+            self.flush_feedback()
+        except Exception:
+            pass
+
+    @property
+    def pending_feedback(self):
+        """Decisions served whose reward has not arrived yet."""
+        return len(self._outstanding)
+
+    # ---------- batcher ----------
+    async def _serve(self):
+        while True:
+            await self._arrived.wait()
+            if len(self._waiting) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._waiting[:self.max_batch]
+            self._waiting = self._waiting[self.max_batch:]
+            if not self._waiting:
+                self._arrived.clear()
+            if len(self._waiting) < self.max_batch:
+                self._full.clear()
+
+            self._flush_quietly()
+            try:
+                actions = self.agent.select_many(len(batch)).tolist()
+            except Exception as exc:
+                for future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for future, action in zip(batch, actions):
+                if not future.done():
+                    decision_id = next(self._ids)
+                    future.set_result((decision_id, action))
+                    self._outstanding[decision_id] = action
+            self.batches += 1
+            self.decisions += len(batch)
+
+
+# =========================
+# Local load generator
+# =========================
+
+async def generate_load(service, reward_fn, clients=500, requests_per_client=200, feedback_delay=0.01):
+    """
+    `clients` concurrent callers, each issuing select() back to back; the reward for every
+    decision, reward_fn(action), is reported feedback_delay seconds later.
+    Returns {decisions, seconds, throughput, p50_ms, p99_ms, mean_batch}.
+    """
+    loop = asyncio.get_running_loop()
+    latencies = []
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            decision_id, action = await service.select()
+            latencies.append(time.perf_counter() - start)
+            loop.call_later(feedback_delay, service.feedback, decision_id, reward_fn(action))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    seconds = time.perf_counter() - start
+    await asyncio.sleep(2 * feedback_delay)                  # let the last rewards arrive
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        "decisions": len(latencies),
+        "seconds": seconds,
+        "throughput": len(latencies) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_batch": service.decisions / max(service.batches, 1),
+    }
+
+
+async def _benchmark(agent_factory, reward_fn, max_batch, **load):
+    async with BanditService(agent_factory(), max_batch=max_batch) as service:
+        return await generate_load(service, reward_fn, **load)
+
+
+if __name__ == "__main__":
+    from rl_utils.rng import stream
+    from rl_utils.scripts import load_script
+
+    bandits = "Exploration & Control -2/Algorithms(Code)/"
+    thompson = load_script(bandits + "thompson_sampling.py")
+    ucb = load_script(bandits + "ucb_multi-arm_bandit.py")
+
+    k_actions = 100
+    env_rng = stream(None, 0)
+    probabilities = env_rng.generator.random(k_actions)
+    uniform = env_rng.random
+    bernoulli = lambda action: int(uniform() < probabilities[action])
+    agents = {
+        "Thompson": lambda: thompson.ThompsonAgent(k_actions),
+        "UCB": lambda: ucb.UCBAgent(k_actions),
+    }
+
+    print(f"{'agent':>9} {'max_batch':>9} {'decisions/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>10}")
+    for name, factory in agents.items():
+        for max_batch in (1, 64, 512):
+            stats = asyncio.run(_benchmark(factory, bernoulli, max_batch))
+            print(f"{name:>9} {max_batch:>9} {stats['throughput']:>12,.0f} {stats['p50_ms']:>8.2f} "
+                  f"{stats['p99_ms']:>8.2f} {stats['mean_batch']:>10.1f}")
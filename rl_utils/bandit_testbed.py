@@ -0,0 +1,57 @@
+import numpy as np
+
+# =========================
+# Batched bandit testbed
+# =========================
+# Runs B independent bandit problems in lockstep, the way the 2000-run 10-armed testbed
+# is usually reported. The agents in "Exploration & Control -2/Algorithms(Code)/" keep
+# their state as (B, K) arrays in this mode and expose:
+#   agent.select_batch()                 -> actions, shape (B,)
+#   agent.update_batch(actions, rewards)
+# and their environments expose env.rewards_batch(actions) -> rewards, shape (B,).
+# Every time step is a handful of array operations over all runs; results are written
+# into preallocated (B, T) arrays instead of growing Python lists.
+
+
+class TestbedResults:
+    def __init__(self, num_runs, steps):
+        self.actions = np.empty((num_runs, steps), dtype=np.int64)
+        self.rewards = np.empty((num_runs, steps))
+        self.regret = np.empty((num_runs, steps))                # best mean - mean of the chosen arm
+        self.optimal = np.empty((num_runs, steps), dtype=bool)   # chosen arm is a best arm
+
+    def mean_reward(self):
+        """Average reward per step over runs, shape (T,)."""
+        return self.rewards.mean(axis=0)
+
+    def optimal_fraction(self):
+        """Fraction of runs that picked an optimal arm, per step, shape (T,)."""
+        return self.optimal.mean(axis=0)
+
+    def cumulative_regret(self):
+        """Expected cumulative regret per step averaged over runs, shape (T,)."""
+        return self.regret.cumsum(axis=1).mean(axis=0)
+
+
+def run_batched(agent, rewards_fn, means, steps):
+    """
+    Run `steps` lockstep steps of a batched agent.
+    rewards_fn(actions) -> (B,) rewards; means: (B, K) true expected reward of every arm.
+    """
+    means = np.asarray(means, dtype=np.float64)
+    num_runs = means.shape[0]
+    runs = np.arange(num_runs)
+    best = means.max(axis=1)
+
+    results = TestbedResults(num_runs, steps)
+    for t in range(steps):
+        actions = agent.select_batch()
+        rewards = rewards_fn(actions)
+        agent.update_batch(actions, rewards)
+
+        chosen = means[runs, actions]
+        results.actions[:, t] = actions
+        results.rewards[:, t] = rewards
+        results.regret[:, t] = best - chosen
+        results.optimal[:, t] = chosen == best
+    return results
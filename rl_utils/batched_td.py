@@ -0,0 +1,56 @@
+import numpy as np
+
+# =========================
+# Batched tabular TD updates
+# =========================
+# Used by the vectorized training paths of the Q-learning, SARSA and Double Q agents.
+# A batch holds one transition per environment of a VectorGridWorld; all TD targets are
+# computed from the table as it was before the batch, then written back in one scatter.
+
+DUPLICATE_MODES = ("sequential", "average")
+
+
+def scatter_td_update(q_table, states, actions, targets, alpha, duplicates="sequential"):
+    """
+    In-place update Q[s, a] += alpha * (target - Q[s, a]) for a batch of (s, a, target).
+
+    q_table must be a C-contiguous (num_states, num_actions) array (a reshape view of a
+    (rows, cols, actions) table works too). When the same (s, a) pair shows up more than
+    once in the batch:
+      - "sequential": same result as applying the updates one by one in batch order
+                      (with the targets fixed), i.e. Q <- (1-alpha)^k Q + sum of
+                      alpha (1-alpha)^(k-1-j) * target_j
+      - "average":    one update towards the mean of the k targets
+    """
+    if duplicates not in DUPLICATE_MODES:
+        raise ValueError(f"duplicates must be one of {DUPLICATE_MODES}")
+
+    flat_q = q_table.reshape(-1)
+    keys = states * q_table.shape[1] + actions
+
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    # no duplicates -> plain fancy-indexed update
+    if len(unique_keys) == len(keys):
+        flat_q[keys] += alpha * (targets - flat_q[keys])
+        return
+
+    old = flat_q[unique_keys]
+
+    if duplicates == "average":
+        mean_targets = np.bincount(inverse, weights=targets, minlength=len(unique_keys)) / counts
+        flat_q[unique_keys] = old + alpha * (mean_targets - old)
+        return
+
+    # position of every transition inside its (s, a) group, in batch order
+    order = np.argsort(inverse, kind="stable")
+    group_start = np.cumsum(counts) - counts
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = np.arange(len(keys)) - np.repeat(group_start, counts)
+
+    later_updates = counts[inverse] - 1 - rank
+    weights = alpha * (1.0 - alpha) ** later_updates
+    flat_q[unique_keys] = (1.0 - alpha) ** counts * old + np.bincount(
+        inverse, weights=weights * targets, minlength=len(unique_keys)
+    )
+
@@ -0,0 +1,374 @@
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rl_utils.instrumentation import Recorder
+from rl_utils.maze_generator import generate_maze
+from rl_utils.rng import stream
+from rl_utils.scripts import REPO_ROOT, load_script
+from rl_utils.training_control import TrainingControl
+
+# =========================
+# Benchmark suite and regression check
+# =========================
+# Every runnable algorithm at a few problem sizes, one case per (algorithm, size):
+#   q_learning / sarsa / double_q        GridWorld n x n, trained one episode at a time
+#   policy_iteration(_sparse)            demos/test.py on a generated n x n maze (dict
+#   policy_evaluation                    model, or the CSR model for _sparse)
+#   evaluate_policy_once                 MazeEnv.py on an n x n grid, fixed number of sweeps
+#   epsilon_greedy / ucb / gradient /    the four bandit agents with k arms, one pull at a time
+#   thompson
+# and records whichever of these apply:
+#   steps_per_sec, updates_per_sec       env steps / TD (or bandit estimate) updates per second
+#   backups_per_sec                      Bellman backups per second (DP)
+#   seconds                              wall time of the measured run
+#   steps_to_threshold                   env steps / pulls until the trailing mean return
+#   time_to_threshold_s                  reaches the case's threshold (None if never)
+#   peak_rss_mb                          peak resident set size of the case's process
+# Each case runs in a fresh (spawned) process, so peak RSS is the case's own; throughput
+# and times are the best of --repeats runs after one untimed warm-up run. The result is a JSON file with a
+# schema_version, the commit and the machine it was measured on.
+#
+# compare flags every metric that got worse than the baseline by more than --tolerance
+# (relative), and exits with status 1 if there is any. Wall-clock metrics of the short
+# cases vary by tens of percent on a busy or shared machine: compare on the machine the
+# baseline came from, raise --repeats, or widen --tolerance; steps_to_threshold is
+# deterministic for a given seed and flags behaviour changes rather than noise.
+# Run: python -m rl_utils.benchmark run --out bench.json [--filter sarsa bandit] [--repeats 3]
+#      python -m rl_utils.benchmark compare baseline.json bench.json [--tolerance 0.1]
+#      python -m rl_utils.benchmark list
+
+SCHEMA_VERSION = 1
+
+HIGHER_IS_BETTER = ("steps_per_sec", "updates_per_sec", "backups_per_sec")
+LOWER_IS_BETTER = ("seconds", "time_to_threshold_s", "steps_to_threshold", "peak_rss_mb")
+
+_AGENTS = {
+    "q_learning": "Q-Learning/q_learning.py",
+    "sarsa": "SARSA/sarsa.py",
+    "double_q": "Double Q-Learning/double-q_learning.py",
+}
+_BANDITS = "Exploration & Control -2/Algorithms(Code)/"
+_MAZE_ENV = "Introduction to Reinfocement Learning -1/Algorithms(Code)/MazeEnv.py"
+
+GRID_SIZES = (5, 10, 20)
+DP_SIZES = {                               # the dict-model loops are pure Python
+    "policy_iteration": (6, 10, 14),
+    "policy_iteration_sparse": (16, 32, 64),
+    "policy_evaluation": (8, 16, 24),
+}
+ARM_COUNTS = (10, 100, 1000)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _first_reaching(values, window, threshold):
+    """Index of the first value whose trailing mean over `window` reaches threshold, or None."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return None
+    csum = np.concatenate([[0.0], np.cumsum(values)])
+    trailing = (csum[window:] - csum[:-window]) / window
+    hits = np.flatnonzero(trailing >= threshold)
+    return int(hits[0]) + window - 1 if len(hits) else None
+
+
+# ---------- tabular agents ----------
+def bench_td(algorithm, n, seed, episodes=400, alpha=0.5, gamma=0.99, epsilon=0.1, window=10):
+    """
+    Train on an n x n GridWorld for `episodes` episodes (each capped at 20 n^2 steps).
+    Threshold: trailing mean return of `window` episodes >= 2 x the optimal return.
+    """
+    module = load_script(_AGENTS[algorithm])
+    rng = stream(seed, 0)
+    explorer = module.EpsilonGreedy(epsilon, rng)
+    control = TrainingControl(max_episode_steps=20 * n * n)
+    returns, step_counts, times = [], [], []
+
+    if algorithm == "q_learning":
+        env = module.GridWorld(n, n)
+        agent = module.QLearningAgent(n, n, 4, alpha, gamma, epsilon, rng=rng, explorer=explorer)
+        episode = lambda: agent.train(env, 1, returns=returns, control=control)
+    elif algorithm == "sarsa":
+        agent = module.Agent(n * n, 4, alpha, gamma)
+        episode = lambda: module.train_sarsa(1, n, n, alpha, gamma, epsilon, rng=rng, explorer=explorer,
+                                             returns=returns, agent=agent, control=control)
+    else:
+        agent = module.Agent(n, n, 4, alpha, gamma, rng=rng)
+        episode = lambda: module.train_double_qlearning(1, n, n, 4, epsilon, gamma, alpha, rng=rng,
+                                                        explorer=explorer, returns=returns, agent=agent,
+                                                        control=control)
+
+    start = time.perf_counter()
+    for _ in range(episodes):
+        episode()
+        step_counts.append(control.steps)
+        times.append(time.perf_counter() - start)
+    seconds = times[-1]
+
+    steps = int(np.sum(step_counts))
+    optimal = -(2 * n - 3)                  # -1 per step, 0 for the step onto the goal
+    hit = _first_reaching(returns, window, 2 * optimal)
+    return {
+        "seconds": seconds,
+        "steps_per_sec": steps / seconds,
+        "updates_per_sec": steps / seconds,          # one TD update per env step
+        "steps_to_threshold": None if hit is None else int(np.sum(step_counts[:hit + 1])),
+        "time_to_threshold_s": None if hit is None else times[hit],
+    }
+
+
+# ---------- dynamic programming ----------
+def bench_dp(algorithm, n, seed):
+    """demos/test.py policy iteration / evaluation on a generated n x n maze."""
+    module = load_script("demos/test.py")
+    module.use_maze(generate_maze(n, n, seed=seed))
+    tables = module.compile_tables()
+    rec = Recorder()
+
+    start = time.perf_counter()
+    if algorithm == "policy_iteration":
+        module.policy_iteration(module.build_model(tables), instrument=rec)
+    elif algorithm == "policy_iteration_sparse":
+        module.policy_iteration(module.build_sparse_model(tables), instrument=rec)
+    else:
+        policy = np.full((module.N_STATES, module.N_ACTIONS), 1.0 / module.N_ACTIONS)
+        module.policy_evaluation(module.build_model(tables), policy, instrument=rec)
+    seconds = time.perf_counter() - start      # includes building the model from the tables
+
+    return {"seconds": seconds, "backups_per_sec": rec.counters["backups"] / seconds}
+
+
+def bench_maze_env(n, seed, sweeps=2000):
+    """MazeEnv.evaluate_policy_once on an n x n grid: exactly `sweeps` sweeps (theta=0)."""
+    module = load_script(_MAZE_ENV)
+    module.use_grid(n)
+    # right along the row, then down the last column: reaches the goal from everywhere
+    policy = {(r, c): ("Right" if c < n else "Down") for r in range(1, n + 1) for c in range(1, n + 1)}
+    policy[module.TERMINAL] = None
+
+    start = time.perf_counter()
+    module.evaluate_policy_once(policy, theta=0.0, max_sweeps=sweeps)
+    seconds = time.perf_counter() - start
+    backups = (sweeps + 1) * n * n                 # + the residual backup
+    return {"seconds": seconds, "backups_per_sec": backups / seconds}
+
+
+# ---------- bandits ----------
+def _bandit(algorithm, k, rng):
+    """(env, select(), pull(action), update(action, reward), arm means) for one bandit agent."""
+    means_rng, env_rng, agent_rng = rng
+    if algorithm == "thompson":
+        module = load_script(_BANDITS + "thompson_sampling.py")
+        means = means_rng.generator.random(k)
+        env, agent = module.ThompsonEnv(means, rng=env_rng), module.ThompsonAgent(k, rng=agent_rng)
+        return agent.select_action, lambda a: int(env.give_rewards(a)), agent.update, means
+
+    means = means_rng.generator.standard_normal(k)
+    if algorithm == "epsilon_greedy":
+        module = load_script(_BANDITS + "multi-arm bandits demo.py")
+        env, agent = module.MultiArmEnv(means, rng=env_rng), module.MultiArmAgent(k, rng=agent_rng)
+        return agent.choose_action, env.reward, lambda a, r: agent.update_reward_estimate(r, a), means
+    if algorithm == "ucb":
+        module = load_script(_BANDITS + "ucb_multi-arm_bandit.py")
+        env, agent = module.UCBEnv(means, rng=env_rng), module.UCBAgent(k)
+        return agent.select_actions, env.give_rewards, agent.update, means
+    module = load_script(_BANDITS + "gradient_bandits.py")
+    env, agent = module.BanditEnv(means, rng=env_rng), module.BanditAgent(k, alpha=0.1, rng=agent_rng)
+    return agent.select_action, env.give_reward, agent.update, means
+
+
+def bench_bandit(algorithm, k, seed, pulls=20_000, window=500, checkpoint=100):
+    """
+    `pulls` single pulls with k arms. Threshold: trailing mean reward over `window` pulls
+    >= 90% of the way from the mean arm to the best arm.
+    """
+    select, pull, update, means = _bandit(algorithm, k, (stream(seed, 0), stream(seed, 1), stream(seed, 2)))
+    rewards = [0.0] * pulls
+    times = []
+
+    start = time.perf_counter()
+    for t in range(pulls):
+        action = select()
+        reward = pull(action)
+        update(action, reward)
+        rewards[t] = reward
+        if t % checkpoint == 0:
+            times.append(time.perf_counter() - start)
+    seconds = time.perf_counter() - start
+
+    hit = _first_reaching(rewards, window, means.mean() + 0.9 * (means.max() - means.mean()))
+    return {
+        "seconds": seconds,
+        "steps_per_sec": pulls / seconds,
+        "updates_per_sec": pulls / seconds,
+        "steps_to_threshold": None if hit is None else hit + 1,
+        "time_to_threshold_s": None if hit is None else times[min(hit // checkpoint + 1, len(times) - 1)],
+    }
+
+
+# ---------- suite ----------
+def cases():
+    """{case name: (function, args)} of the whole suite."""
+    suite = {}
+    for algorithm in _AGENTS:
+        for n in GRID_SIZES:
+            suite[f"{algorithm}/grid-{n}"] = (bench_td, (algorithm, n))
+    for algorithm, sizes in DP_SIZES.items():
+        for n in sizes:
+            suite[f"{algorithm}/maze-{n}"] = (bench_dp, (algorithm, n))
+    for n in GRID_SIZES:
+        suite[f"evaluate_policy_once/grid-{n}"] = (bench_maze_env, (n,))
+    for algorithm in ("epsilon_greedy", "ucb", "gradient", "thompson"):
+        for k in ARM_COUNTS:
+            suite[f"bandit_{algorithm}/arms-{k}"] = (bench_bandit, (algorithm, k))
+    return suite
+
+
+def _run_case(name, repeats, seed):
+    """Runs in a fresh process: best of `repeats` runs, plus the process's peak RSS."""
+    function, args = cases()[name]
+    function(*args, seed)                                   # warm-up: imports, caches, first-call costs
+    runs = [function(*args, seed) for _ in range(repeats)]
+    best = min(runs, key=lambda r: r["seconds"])
+    if "time_to_threshold_s" in best:                       # step counts are the same every run
+        reached = [r["time_to_threshold_s"] for r in runs if r["time_to_threshold_s"] is not None]
+        best["time_to_threshold_s"] = min(reached) if reached else None
+    best["peak_rss_mb"] = _peak_rss_mb()
+    return best
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(filters=None, repeats=3, seed=0, progress=None):
+    """Run every case whose name contains one of `filters` (all if None); returns the result document."""
+    names = [name for name in cases() if not filters or any(f in name for f in filters)]
+    results = {}
+    context = mp.get_context("spawn")
+    for name in names:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            results[name] = pool.submit(_run_case, name, repeats, seed).result()
+        if progress is not None:
+            progress(name, results[name])
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "numpy": np.__version__, "cpus": os.cpu_count()},
+        "settings": {"repeats": repeats, "seed": seed},
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    Metric-by-metric comparison of two result documents. Returns a list of rows
+    {case, metric, baseline, current, change, regression}; change is relative, positive = worse.
+    """
+    if baseline.get("schema_version") != current.get("schema_version"):
+        raise ValueError(f"schema_version {baseline.get('schema_version')} vs "
+                         f"{current.get('schema_version')}: rerun the baseline")
+    rows = []
+    for case in sorted(set(baseline["results"]) & set(current["results"])):
+        old, new = baseline["results"][case], current["results"][case]
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if metric not in old or metric not in new:
+                continue
+            a, b = old[metric], new[metric]
+            if a is None or b is None:
+                # reaching the threshold only in the baseline is a regression
+                rows.append({"case": case, "metric": metric, "baseline": a, "current": b,
+                             "change": None, "regression": a is not None})
+                continue
+            if a == 0:
+                change = 0.0 if b == 0 else float("inf")
+            elif metric in HIGHER_IS_BETTER:
+                change = (a - b) / a
+            else:
+                change = (b - a) / a
+            rows.append({"case": case, "metric": metric, "baseline": a, "current": b,
+                         "change": change, "regression": change > tolerance})
+    return rows
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the repo's algorithms")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and write a JSON result file")
+    run.add_argument("--out", required=True)
+    run.add_argument("--filter", nargs="+", default=None, help="only cases whose name contains one of these")
+    run.add_argument("--repeats", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+
+    commands.add_parser("list", help="print the case names")
+
+    check = commands.add_parser("compare", help="flag regressions of a result file against a baseline")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--tolerance", type=float, default=0.1, help="relative change allowed (0.1 = 10%%)")
+    check.add_argument("--all", action="store_true", help="print every metric, not only regressions")
+    return parser.parse_args()
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.4g}"
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+
+    if args.command == "list":
+        print("\n".join(cases()))
+
+    elif args.command == "run":
+        def progress(name, result):
+            rate = next((f"{result[m]:.3g} {m}" for m in HIGHER_IS_BETTER if m in result), "")
+            print(f"{name:<36} {result['seconds']:>8.3f}s  {rate}  {result['peak_rss_mb']:.0f} MB", flush=True)
+
+        document = run_suite(args.filter, args.repeats, args.seed, progress)
+        with open(args.out, "w") as f:
+            json.dump(document, f, indent=1)
+        print(f"{len(document['results'])} cases written to {args.out}")
+
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.tolerance)
+        regressions = [row for row in rows if row["regression"]]
+        shown = rows if args.all else regressions
+        if shown:
+            print(f"{'case':<36} {'metric':<20} {'baseline':>10} {'current':>10} {'worse by':>8}")
+        for row in shown:
+            change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['case']:<36} {row['metric']:<20} {_fmt(row['baseline']):>10} "
+                  f"{_fmt(row['current']):>10} {change:>8}{flag}")
+        missing = sorted(set(baseline["results"]) - set(current["results"]))
+        if missing:
+            print(f"not in {args.current}: {', '.join(missing)}")
+        print(f"{len(regressions)} regressions in {len(rows)} metrics (tolerance {args.tolerance:.0%})")
+        sys.exit(1 if regressions else 0)
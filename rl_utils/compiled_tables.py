@@ -0,0 +1,140 @@
+import numpy as np
+
+# =========================
+# Compiled transition / reward tables
+# =========================
+# Every deterministic grid environment in this repo boils down to three arrays of shape
+# (num_states, num_actions):
+#   next_state[s, a]   flat id of the cell reached
+#   reward[s, a]       reward for that move
+#   done[s, a]         True if the move ends the episode
+# Compiling them once means stepping is an array lookup (TableEnv, VectorGridWorld, and
+# through cell_outcomes() the GridWorld / Environment classes of the TD agents) and the
+# dynamic-programming code reads the model from the same arrays (to_model()).
+
+
+class TransitionTables:
+    def __init__(self, next_state, reward, done):
+        self.next_state = np.ascontiguousarray(next_state, dtype=np.int64)
+        self.reward = np.ascontiguousarray(reward, dtype=np.float64)
+        self.done = np.ascontiguousarray(done, dtype=bool)
+        self.num_states, self.num_actions = self.next_state.shape
+
+    def step(self, states, actions):
+        """Look up (next_state, reward, done) for scalars or whole arrays of states/actions."""
+        return self.next_state[states, actions], self.reward[states, actions], self.done[states, actions]
+
+    def cell_outcomes(self, cols, flat_ids=False):
+        """
+        {(row, col): ((next, reward, done) for every action)} for the scalar step() of the
+        (row, col)-state envs: one dict and one tuple lookup per step, no arithmetic.
+        next is the (row, col) cell reached, or its flat id with flat_ids=True.
+        """
+        next_state, reward, done = self.next_state.tolist(), self.reward.tolist(), self.done.tolist()
+        cells = [divmod(s, cols) for s in range(self.num_states)]
+        return {
+            cells[s]: tuple(
+                (next_state[s][a] if flat_ids else cells[next_state[s][a]], reward[s][a], done[s][a])
+                for a in range(self.num_actions)
+            )
+            for s in range(self.num_states)
+        }
+
+    def to_model(self):
+        """Dict model P[s][a] = [(prob, next_s, reward, done)] as used by demos/test.py."""
+        return {
+            s: {
+                a: [(1.0, int(self.next_state[s, a]), float(self.reward[s, a]), bool(self.done[s, a]))]
+                for a in range(self.num_actions)
+            }
+            for s in range(self.num_states)
+        }
+
+
+def compile_transition_fn(num_states, num_actions, transition_fn):
+    """
+    Build tables from any function transition_fn(s, a) -> (next_s, reward, done)
+    on flat state ids, e.g. next_state_reward_done in demos/test.py.
+    """
+    next_state = np.zeros((num_states, num_actions), dtype=np.int64)
+    reward = np.zeros((num_states, num_actions))
+    done = np.zeros((num_states, num_actions), dtype=bool)
+
+    for s in range(num_states):
+        for a in range(num_actions):
+            next_state[s, a], reward[s, a], done[s, a] = transition_fn(s, a)
+
+    return TransitionTables(next_state, reward, done)
+
+
+def compile_env(env, num_actions=4):
+    """
+    Build tables from one of the GridWorld / Environment classes
+    (Q-Learning/q_learning.py, SARSA/sarsa.py, Double Q-Learning/double-q_learning.py)
+    by placing the agent in every cell and calling env.step(action).
+    Works with both the (row, col) and the flat-id flavours of step(); the env's current
+    state is restored afterwards.
+    """
+    state_attr = "current_state" if hasattr(env, "current_state") else "state"
+    saved_state = getattr(env, state_attr)
+    cols = env.cols
+
+    def transition_fn(s, a):
+        setattr(env, state_attr, (s // cols, s % cols))
+        next_s, reward, done = env.step(a)
+        if isinstance(next_s, tuple):
+            next_s = next_s[0] * cols + next_s[1]
+        return next_s, reward, done
+
+    try:
+        return compile_transition_fn(env.rows * cols, num_actions, transition_fn)
+    finally:
+        setattr(env, state_attr, saved_state)
+
+
+def grid_tables(rows, cols, terminal=None, step_reward=-1.0, terminal_reward=0.0):
+    """
+    Vectorized construction of the tables for the plain GridWorld dynamics
+    (actions 0=up, 1=right, 2=left, 3=down, stay in place at the border),
+    without calling step() once per (state, action).
+    """
+    terminal = terminal if terminal is not None else (rows - 1, cols - 1)
+    row_delta = np.array([-1, 0, 0, 1])
+    col_delta = np.array([0, 1, -1, 0])
+
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    new_row = row[:, None] + row_delta[None, :]
+    new_col = col[:, None] + col_delta[None, :]
+
+    # boundary check
+    off_grid = (new_row < 0) | (new_row >= rows) | (new_col < 0) | (new_col >= cols)
+    new_row = np.where(off_grid, row[:, None], new_row)
+    new_col = np.where(off_grid, col[:, None], new_col)
+
+    next_state = new_row * cols + new_col
+    done = next_state == terminal[0] * cols + terminal[1]
+    reward = np.where(done, terminal_reward, step_reward)
+
+    return TransitionTables(next_state, reward, done)
+
+
+# =========================
+# Single environment backed by tables
+# =========================
+
+class TableEnv:
+    """reset()/step() like the SARSA Environment (flat state ids), but step is a table lookup."""
+
+    def __init__(self, tables, start_id=0):
+        self.tables = tables
+        self.start_id = start_id
+        self.current_state = None
+
+    def reset(self):
+        self.current_state = self.start_id
+        return self.current_state
+
+    def step(self, action):
+        s = self.current_state
+        self.current_state = int(self.tables.next_state[s, action])
+        return self.current_state, float(self.tables.reward[s, action]), bool(self.tables.done[s, action])
@@ -0,0 +1,310 @@
+import os
+
+import numpy as np
+
+# =========================
+# Hashed, growable Q store
+# =========================
+# For state spaces too large to preallocate (num_states, num_actions): Q rows are
+# allocated on first visit. HashedQTable maps non-negative int state ids (e.g. from
+# rl_utils.state_encoding) to row indices of dense (rows, num_actions) arrays:
+#   index   open-addressing slot array (linear probing, Fibonacci hashing), each slot
+#           holds a row index, EMPTY or DELETED; rehashed (doubled) above max_load
+#   rows    Q values, key, visit count and last-use tick per row, grown by doubling
+# lookup(ids) returns the row indices, inserting missing states with zero rows, so the
+# agents keep indexing a plain 2-D array: Q = table.values; Q[table.lookup(s), a].
+# Row indices stay valid across growth and rehashing; only eviction reuses rows.
+#
+# Memory cap: with max_entries set, inserting into a full table first evicts a chunk
+# (evict_fraction of the cap) of the least recently used ("lru") or least visited
+# ("least_visited") rows. Rows used by the last three lookups are never evicted: the
+# training loops hold rows of the current and next states, and SARSA also those of the
+# states it acts from. max_entries is therefore a soft cap. When every row in memory
+# was used by the last three lookups, _evict frees nothing and the table grows past
+# max_entries instead. With spill_path set, evicted rows go to a memory-mapped hash
+# table on disk (SpillFile) and are restored from it when their state comes back.
+
+EMPTY = -1
+DELETED = -2
+EVICTION_POLICIES = ("lru", "least_visited")
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def _home(key, bits):
+    """Fibonacci hash of a non-negative int key into 2**bits slots."""
+    return ((key * _GOLDEN) & _MASK64) >> (64 - bits)
+
+
+def _home_batch(keys, bits):
+    return ((keys.astype(np.uint64) * np.uint64(_GOLDEN)) >> np.uint64(64 - bits)).astype(np.int64)
+
+
+class SpillFile:
+    """Open-addressing table of evicted rows (key, visits, values) in a memory-mapped file."""
+
+    def __init__(self, path, num_tables, num_actions, capacity=1024, max_load=0.7):
+        self.path = path
+        self.max_load = max_load
+        self.dtype = np.dtype([
+            ("key", np.int64), ("visits", np.int64), ("values", np.float64, (num_tables, num_actions)),
+        ])
+        self.size = 0
+        self.records = self._create(path, capacity)
+
+    def _create(self, path, capacity):
+        capacity = 1 << max(capacity - 1, 1).bit_length()
+        records = np.memmap(path, dtype=self.dtype, mode="w+", shape=(capacity,))
+        records["key"] = EMPTY
+        self.bits = capacity.bit_length() - 1
+        return records
+
+    def _slot(self, key, keys, bits):
+        mask = len(keys) - 1
+        slot = _home(key, bits)
+        while keys[slot] != EMPTY and keys[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow(self):
+        old = self.records
+        tmp = self.path + ".grow"
+        self.records = self._create(tmp, 2 * len(old))
+        keys = self.records["key"]
+        for i in np.flatnonzero(old["key"] != EMPTY).tolist():
+            self.records[self._slot(int(old["key"][i]), keys, self.bits)] = old[i]
+        del old
+        self.records.flush()
+        os.replace(tmp, self.path)
+
+    def put(self, key, visits, values):
+        if self.size + 1 > self.max_load * len(self.records):
+            self._grow()
+        keys = self.records["key"]
+        slot = self._slot(key, keys, self.bits)
+        if keys[slot] == EMPTY:
+            self.size += 1
+        keys[slot] = key
+        self.records["visits"][slot] = visits
+        self.records["values"][slot] = values
+
+    def get(self, key):
+        """(visits, values) of a spilled key, or None."""
+        keys = self.records["key"]
+        slot = self._slot(key, keys, self.bits)
+        if keys[slot] == EMPTY:
+            return None
+        record = self.records[slot]
+        return int(record["visits"]), np.array(record["values"])
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+
+class HashedQTable:
+    def __init__(self, num_actions, num_tables=1, capacity=1024, max_entries=None, eviction="lru",
+                 spill_path=None, max_load=0.7, evict_fraction=1 / 16):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction must be one of {EVICTION_POLICIES}")
+        self.num_actions = num_actions
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.max_load = max_load
+        self.evict_fraction = evict_fraction
+
+        row_capacity = capacity if max_entries is None else min(capacity, max_entries)
+        self.tables = [np.zeros((row_capacity, num_actions)) for _ in range(num_tables)]
+        self.keys = np.full(row_capacity, EMPTY, dtype=np.int64)
+        self.visits = np.zeros(row_capacity, dtype=np.int64)
+        self.last_used = np.zeros(row_capacity, dtype=np.int64)
+        self.high_water = 0                    # rows [0, high_water) have been handed out
+        self._free = []                        # rows freed by eviction
+        self.count = 0                         # states currently held in memory
+        self.tick = 0                          # one per lookup call
+
+        self.bits = max(int(np.ceil(np.log2(row_capacity / max_load))), 1)
+        self._slots = np.full(1 << self.bits, EMPTY, dtype=np.int64)
+        self._filled = 0                       # slots not EMPTY (entries + DELETED)
+
+        self.spill = None if spill_path is None else SpillFile(spill_path, num_tables, num_actions)
+        self.evictions = 0
+        self.restored = 0
+
+    @property
+    def values(self):
+        """Q rows of the first table, shape (rows, num_actions); index with lookup()."""
+        return self.tables[0]
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self._probe(int(key))[1] >= 0
+
+    # ---------- probing ----------
+    def _probe(self, key):
+        """(slot, row): the key's slot and row, or (slot to insert at, -1)."""
+        slots, keys = self._slots, self.keys
+        mask = len(slots) - 1
+        slot = _home(key, self.bits)
+        insert_at = -1
+        while True:
+            row = slots[slot]
+            if row == EMPTY:
+                return (slot if insert_at < 0 else insert_at), -1
+            if row == DELETED:
+                if insert_at < 0:
+                    insert_at = slot
+            elif keys[row] == key:
+                return slot, int(row)
+            slot = (slot + 1) & mask
+
+    def _rehash(self):
+        # double when live entries alone fill most of the allowed load, else only clear
+        # the DELETED slots left by eviction
+        size = len(self._slots)
+        if self.count + 1 > 0.75 * self.max_load * size:
+            size *= 2
+        self.bits = size.bit_length() - 1
+        self._slots = np.full(size, EMPTY, dtype=np.int64)
+        mask = size - 1
+
+        # vectorized linear probing: every round, each free target slot takes the first
+        # pending row aiming at it, the others move one slot on
+        pending = np.flatnonzero(self.keys[:self.high_water] != EMPTY)
+        position = _home_batch(self.keys[pending], self.bits)
+        while len(pending):
+            free = np.flatnonzero(self._slots[position] == EMPTY)
+            _, first = np.unique(position[free], return_index=True)
+            winners = free[first]
+            self._slots[position[winners]] = pending[winners]
+            left = np.ones(len(pending), dtype=bool)
+            left[winners] = False
+            pending, position = pending[left], (position[left] + 1) & mask
+        self._filled = self.count
+
+    # ---------- rows ----------
+    def _grow_rows(self):
+        old = len(self.keys)
+        new = 2 * old
+        self.tables = [np.concatenate([t, np.zeros((new - old, self.num_actions))]) for t in self.tables]
+        self.keys = np.concatenate([self.keys, np.full(new - old, EMPTY, dtype=np.int64)])
+        self.visits = np.concatenate([self.visits, np.zeros(new - old, dtype=np.int64)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(new - old, dtype=np.int64)])
+
+    def _new_row(self):
+        if not self._free and self.max_entries is not None and self.count >= self.max_entries:
+            self._evict()
+        if self._free:
+            return self._free.pop()
+        if self.high_water == len(self.keys):
+            self._grow_rows()
+        self.high_water += 1
+        return self.high_water - 1
+
+    def _evict(self):
+        used = self.keys[:self.high_water] != EMPTY
+        candidates = np.flatnonzero(used & (self.last_used[:self.high_water] < self.tick - 2))
+        if not len(candidates):
+            return
+        score = (self.last_used if self.eviction == "lru" else self.visits)[candidates]
+        k = max(1, int(self.max_entries * self.evict_fraction))
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(score, k - 1)[:k]]
+
+        for row in candidates.tolist():
+            key = int(self.keys[row])
+            if self.spill is not None:
+                values = np.stack([t[row] for t in self.tables])
+                self.spill.put(key, int(self.visits[row]), values)
+            self._slots[self._probe(key)[0]] = DELETED
+            self.keys[row] = EMPTY
+            self._free.append(row)
+        self.count -= len(candidates)
+        self.evictions += len(candidates)
+
+    def _insert(self, key):
+        row = self._new_row()
+        if self._filled + 1 > self.max_load * len(self._slots):
+            self._rehash()
+        slot, _ = self._probe(key)
+        if self._slots[slot] == EMPTY:
+            self._filled += 1
+        self._slots[slot] = row
+        self.keys[row] = key
+        self.count += 1
+
+        spilled = None if self.spill is None else self.spill.get(key)
+        if spilled is None:
+            self.visits[row] = 0
+            for t in self.tables:
+                t[row] = 0.0
+        else:
+            self.visits[row] = spilled[0]
+            for t, values in zip(self.tables, spilled[1]):
+                t[row] = values
+            self.restored += 1
+        self.last_used[row] = self.tick
+        return row
+
+    # ---------- lookup ----------
+    def lookup(self, state_ids):
+        """Row index of every state id (int -> int, array -> array), inserting missing states."""
+        self.tick += 1
+        if np.ndim(state_ids) == 0:
+            key = int(state_ids)
+            row = self._probe(key)[1]
+            if row < 0:
+                row = self._insert(key)
+            self.visits[row] += 1
+            self.last_used[row] = self.tick
+            return row
+
+        keys = np.asarray(state_ids, dtype=np.int64)
+        rows = np.full(len(keys), EMPTY, dtype=np.int64)
+        mask = len(self._slots) - 1
+        pending = np.arange(len(keys))
+        position = _home_batch(keys, self.bits)
+        while len(pending):
+            found = self._slots[position]
+            hit = (found >= 0) & (self.keys[np.maximum(found, 0)] == keys[pending])
+            rows[pending[hit]] = found[hit]
+            go_on = ~hit & (found != EMPTY)
+            pending, position = pending[go_on], (position[go_on] + 1) & mask
+
+        missing = np.flatnonzero(rows == EMPTY)
+        self.last_used[rows[rows >= 0]] = self.tick          # protect hits from eviction below
+        if len(missing):
+            new_keys, inverse = np.unique(keys[missing], return_inverse=True)
+            new_rows = np.array([self._insert(key) for key in new_keys.tolist()], dtype=np.int64)
+            rows[missing] = new_rows[inverse]
+        np.add.at(self.visits, rows, 1)
+        return rows
+
+    # ---------- stats ----------
+    @property
+    def nbytes(self):
+        return (self._slots.nbytes + self.keys.nbytes + self.visits.nbytes + self.last_used.nbytes
+                + sum(t.nbytes for t in self.tables))
+
+    def stats(self):
+        """Load factor, probe lengths (slots read to find a key) and memory use."""
+        occupied = np.flatnonzero(self._slots >= 0)
+        home = _home_batch(self.keys[self._slots[occupied]], self.bits)
+        probes = ((occupied - home) & (len(self._slots) - 1)) + 1
+        return {
+            "entries": self.count,
+            "slots": len(self._slots),
+            "load_factor": self.count / len(self._slots),
+            "tombstones": self._filled - self.count,
+            "mean_probe": float(probes.mean()) if len(probes) else 0.0,
+            "max_probe": int(probes.max()) if len(probes) else 0,
+            "bytes": self.nbytes,
+            "bytes_per_entry": self.nbytes / max(self.count, 1),
+            "evictions": self.evictions,
+            "restored": self.restored,
+            "spilled": 0 if self.spill is None else self.spill.size,
+            "spill_bytes": 0 if self.spill is None else self.spill.nbytes,
+        }
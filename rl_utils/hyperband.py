@@ -0,0 +1,138 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from rl_utils.sweep import ALGORITHMS, Trial, grid
+
+# =========================
+# Successive halving / Hyperband over the tabular agents
+# =========================
+# Training every configuration to the full episode budget spends most of the compute on
+# settings that are obviously bad after a few dozen episodes. Successive halving trains
+# all n configurations for a small budget r, keeps the best 1/eta (by mean return over
+# the last score_window episodes), trains the survivors on to r * eta episodes - resuming
+# the same agents (rl_utils.sweep.Trial) rather than starting over - and so on until the
+# full budget. Hyperband runs several such brackets, from many configurations with a tiny
+# first budget to a few trained to the full budget from the start, which hedges against
+# configurations that only look good late. With a finite grid, brackets overlap in the
+# configurations they draw; hyperband keeps one Trial per configuration across brackets,
+# so a configuration is only trained on past the furthest any bracket took it (scores
+# at a budget use the first `budget` episodes, as if trained from scratch).
+# Both return a report: best configuration and score, episodes trained against the
+# exhaustive grid (every configuration to max_episodes), and the rungs of every bracket.
+# Run: python -m rl_utils.hyperband   (Hyperband against the exhaustive grid)
+
+
+def successive_halving(configs, min_episodes, max_episodes, eta=3, seed=0, score_window=10):
+    """
+    One bracket: rung i trains the survivors to min_episodes * eta**i episodes in total
+    (the last rung to max_episodes) and keeps the best ceil(n / eta).
+    """
+    return _halving([Trial(config, seed) for config in configs], min_episodes, max_episodes, eta, score_window)
+
+
+def _halving(trials, min_episodes, max_episodes, eta, score_window):
+    """successive_halving on existing Trials; only episodes beyond what they ran already count."""
+    budget = min_episodes
+    rungs, episodes_used = [], 0
+
+    while True:
+        budget = min(budget, max_episodes)
+        for trial in trials:
+            extra = max(0, budget - trial.episodes)
+            trial.train(extra)
+            episodes_used += extra
+        score = lambda t: t.score(score_window, at=budget)
+        trials = sorted(trials, key=score, reverse=True)
+        rungs.append({"configs": len(trials), "episodes": budget, "best_score": score(trials[0])})
+        if budget >= max_episodes:
+            break
+        trials = trials[:max(1, math.ceil(len(trials) / eta))]
+        budget *= eta
+
+    return {"best": trials[0], "rungs": rungs, "episodes_used": episodes_used}
+
+
+def hyperband(configs, max_episodes, eta=3, min_episodes=1, seed=0, score_window=10):
+    """
+    Hyperband over a finite list of configurations: bracket s starts
+    ceil((s_max + 1) / (s + 1) * eta**s) configurations (drawn without replacement, at
+    most all of them) at max_episodes * eta**-s episodes. Trials are shared between
+    brackets, so episodes_used never exceeds the exhaustive len(configs) * max_episodes.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    s_max = int(math.log(max_episodes / min_episodes, eta) + 1e-9)
+    trials = {}                                                   # config index -> Trial
+
+    brackets, best, best_score, episodes_used = [], None, -math.inf, 0
+    for s in range(s_max, -1, -1):
+        n = min(len(configs), math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        first_budget = max(min_episodes, int(max_episodes * eta ** -s))
+        chosen = []
+        for i in rng.permutation(len(configs))[:n].tolist():
+            if i not in trials:
+                trials[i] = Trial(configs[i], seed)
+            chosen.append(trials[i])
+
+        bracket = _halving(chosen, first_budget, max_episodes, eta, score_window)
+        episodes_used += bracket["episodes_used"]
+        trial = bracket["best"]
+        # every bracket ends with its survivor trained to the full budget
+        if trial.score(score_window) > best_score:
+            best, best_score = trial.job, trial.score(score_window)
+        brackets.append({"s": s, "rungs": bracket["rungs"], "episodes_used": bracket["episodes_used"]})
+
+    exhaustive = len(configs) * max_episodes
+    return {
+        "best": best,
+        "best_score": best_score,
+        "episodes_used": episodes_used,
+        "exhaustive_episodes": exhaustive,
+        "saved_fraction": 1.0 - episodes_used / exhaustive,
+        "seconds": time.perf_counter() - start,
+        "brackets": brackets,
+    }
+
+
+def exhaustive_search(configs, max_episodes, seed=0, score_window=10):
+    """Every configuration to max_episodes: (best config, best score, seconds)."""
+    start = time.perf_counter()
+    trials = [Trial(config, seed).train(max_episodes) for config in configs]
+    best = max(trials, key=lambda t: t.score(score_window))
+    return best.job, best.score(score_window), time.perf_counter() - start
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Hyperband search over the tabular agents")
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument("--alpha", type=float, nargs="+", default=[0.02, 0.05, 0.1, 0.3, 0.5, 0.9])
+    parser.add_argument("--epsilon", type=float, nargs="+", default=[0.01, 0.05, 0.1, 0.3, 0.6])
+    parser.add_argument("--gamma", type=float, nargs="+", default=[0.9, 0.99])
+    parser.add_argument("--max-episodes", type=int, default=243)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=8)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-exhaustive", action="store_true", help="skip the exhaustive grid comparison")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    configs = grid(algorithm=args.algorithms, alpha=args.alpha, epsilon=args.epsilon, gamma=args.gamma,
+                   rows=[args.rows], cols=[args.cols])
+
+    report = hyperband(configs, args.max_episodes, args.eta, seed=args.seed)
+    for bracket in report["brackets"]:
+        rungs = " -> ".join(f"{r['configs']}x{r['episodes']}" for r in bracket["rungs"])
+        print(f"bracket s={bracket['s']}: {rungs} ({bracket['episodes_used']} episodes)")
+    print(f"\nhyperband: best {report['best']} score {report['best_score']:.2f}, "
+          f"{report['episodes_used']} of {report['exhaustive_episodes']} episodes "
+          f"({report['saved_fraction']:.0%} saved), {report['seconds']:.1f}s")
+
+    if not args.no_exhaustive:
+        best, score, seconds = exhaustive_search(configs, args.max_episodes, args.seed)
+        print(f"exhaustive: best {best} score {score:.2f}, {seconds:.1f}s")
@@ -0,0 +1,247 @@
+import array
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+# =========================
+# Instrumentation for the training and planning loops
+# =========================
+# The tabular trainers (QLearningAgent.train, train_sarsa, train_double_qlearning), the
+# bandit run_experiment functions and the policy iteration loops (demos/test.py,
+# ParallelDP.policy_iteration) take instrument=Recorder(...). With instrument=None a
+# loop only pays for a few `if rec` checks per step.
+#
+# A Recorder collects
+#   per-phase timers     select / env_step / update / episode / evaluate / sweep / improve:
+#                        count, total, min and max duration
+#   counters             steps, backups, episodes, sweeps, iterations (rec.add(name, n))
+#   state visitation     histogram over the state ids (Q rows) passed to rec.step
+#   TD-error statistics  count, mean, std, min, max and a decade histogram of |TD error|
+# The hot path only writes into preallocated array.array rings:
+#   rec.span(phase, start_ns, end_ns)                       one timed phase
+#   rec.transition(state, td_error)                         one visit and TD error
+#   rec.step(state, td_error, t0, t1, t2, t3)               both of the above for a step
+#                                                           timed as select [t0, t1),
+#                                                           env_step [t1, t2), update [t2, t3)
+# and every `capacity` records the rings are folded into numpy aggregates at once (and
+# written to the Chrome trace, if any). Timestamps are rl_utils.instrumentation.clock()
+# (time.perf_counter_ns).
+#
+# Export: rec.to_json(path) (summary), rec.to_csv(path) (one row per phase / counter), and
+# trace_path=... streams every span as a Chrome trace event (chrome://tracing, Perfetto);
+# that file grows with three events per step, so keep runs short when tracing.
+
+PHASES = ("select", "env_step", "update", "episode", "evaluate", "sweep", "improve")
+SELECT, ENV_STEP, UPDATE, EPISODE, EVALUATE, SWEEP, IMPROVE = range(len(PHASES))
+
+TD_DECADES = np.arange(-8, 3)       # |TD error| histogram edges 1e-8 ... 1e2 (outer bins open)
+
+clock = time.perf_counter_ns
+
+
+class Recorder:
+    def __init__(self, num_states=0, capacity=1 << 14, trace_path=None):
+        self.capacity = capacity
+
+        # rings, filled by the hot path and emptied by flush()
+        self._phase = array.array("b", bytes(capacity))
+        self._start = array.array("q", bytes(8 * capacity))
+        self._end = array.array("q", bytes(8 * capacity))
+        self._spans = 0
+        self._state = array.array("q", bytes(8 * capacity))
+        self._error = array.array("d", bytes(8 * capacity))
+        self._steps = 0
+
+        # aggregates
+        self.phase_count = np.zeros(len(PHASES), dtype=np.int64)
+        self.phase_ns = np.zeros(len(PHASES), dtype=np.int64)
+        self.phase_min = np.full(len(PHASES), np.iinfo(np.int64).max, dtype=np.int64)
+        self.phase_max = np.zeros(len(PHASES), dtype=np.int64)
+        self.visits = np.zeros(num_states, dtype=np.int64)
+        self.td_count = 0
+        self.td_mean = 0.0
+        self._td_m2 = 0.0
+        self.td_min = np.inf
+        self.td_max = -np.inf
+        self.td_hist = np.zeros(len(TD_DECADES) + 1, dtype=np.int64)
+        self.counters = {}
+        self.flushes = 0
+
+        self._origin = clock()
+        self._trace = None
+        if trace_path is not None:
+            self._trace = open(trace_path, "w")
+            self._trace.write('{"traceEvents": [\n')
+            self._trace_first = True
+            self._pid = os.getpid()
+
+    # ---------- hot path ----------
+    def span(self, phase, start, end):
+        i = self._spans
+        if i == self.capacity:
+            self._flush_spans()
+            i = 0
+        self._phase[i] = phase
+        self._start[i] = start
+        self._end[i] = end
+        self._spans = i + 1
+
+    def step(self, state, td_error, t0, t1, t2, t3):
+        i = self._spans
+        if i + 3 > self.capacity:
+            self._flush_spans()
+            i = 0
+        phase, start, end = self._phase, self._start, self._end
+        phase[i], start[i], end[i] = SELECT, t0, t1
+        phase[i + 1], start[i + 1], end[i + 1] = ENV_STEP, t1, t2
+        phase[i + 2], start[i + 2], end[i + 2] = UPDATE, t2, t3
+        self._spans = i + 3
+        self.transition(state, td_error)
+
+    def transition(self, state, td_error):
+        """Visit of `state` (a Q row) and the TD error of its update, without timings."""
+        j = self._steps
+        self._state[j] = state
+        self._error[j] = td_error
+        self._steps = j + 1
+        if j + 1 == self.capacity:
+            self._flush_steps()
+
+    def add(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # ---------- flushing ----------
+    def _flush_spans(self):
+        n = self._spans
+        if not n:
+            return
+        phase = np.frombuffer(self._phase, dtype=np.int8, count=n).astype(np.intp)
+        start = np.frombuffer(self._start, dtype=np.int64, count=n)
+        duration = np.frombuffer(self._end, dtype=np.int64, count=n) - start
+        self.phase_count += np.bincount(phase, minlength=len(PHASES))
+        np.add.at(self.phase_ns, phase, duration)
+        np.minimum.at(self.phase_min, phase, duration)
+        np.maximum.at(self.phase_max, phase, duration)
+        if self._trace is not None:
+            self._write_trace(phase, start, duration)
+            if self.counters:
+                ts = (clock() - self._origin) / 1e3
+                self._emit(f'{{"name": "counters", "ph": "C", "ts": {ts:.3f}, "pid": {self._pid}, '
+                           f'"args": {json.dumps(self.counters)}}}')
+        self._spans = 0
+        self.flushes += 1
+
+    def _flush_steps(self):
+        n = self._steps
+        if not n:
+            return
+        states = np.frombuffer(self._state, dtype=np.int64, count=n)
+        errors = np.frombuffer(self._error, dtype=np.float64, count=n)
+
+        top = int(states.max()) + 1
+        if top > len(self.visits):
+            self.visits = np.concatenate([self.visits, np.zeros(top - len(self.visits), dtype=np.int64)])
+        self.visits += np.bincount(states, minlength=len(self.visits))
+
+        # merge the batch's mean / M2 into the running ones (Chan et al.)
+        mean = float(errors.mean())
+        m2 = float(((errors - mean) ** 2).sum())
+        total = self.td_count + n
+        delta = mean - self.td_mean
+        self.td_mean += delta * n / total
+        self._td_m2 += m2 + delta * delta * self.td_count * n / total
+        self.td_count = total
+        self.td_min = min(self.td_min, float(errors.min()))
+        self.td_max = max(self.td_max, float(errors.max()))
+        with np.errstate(divide="ignore"):
+            decades = np.log10(np.abs(errors))
+        self.td_hist += np.bincount(np.searchsorted(TD_DECADES, decades, side="right"),
+                                    minlength=len(self.td_hist))
+        self._steps = 0
+
+    def flush(self):
+        """Fold the rings into the aggregates (done automatically when they fill)."""
+        self._flush_spans()
+        self._flush_steps()
+
+    # ---------- Chrome trace ----------
+    def _emit(self, event):
+        self._trace.write(event if self._trace_first else ",\n" + event)
+        self._trace_first = False
+
+    def _write_trace(self, phase, start, duration):
+        ts = (start - self._origin) / 1e3                  # microseconds since the recorder started
+        dur = duration / 1e3
+        pid = self._pid
+        for p, t, d in zip(phase.tolist(), ts.tolist(), dur.tolist()):
+            self._emit(f'{{"name": "{PHASES[p]}", "ph": "X", "ts": {t:.3f}, "dur": {d:.3f}, '
+                       f'"pid": {pid}, "tid": 0}}')
+
+    def close(self):
+        """Flush and finish the trace file."""
+        self.flush()
+        if self._trace is not None:
+            self._trace.write("\n]}\n")
+            self._trace.close()
+            self._trace = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- export ----------
+    def phases(self):
+        """{phase: {count, seconds, mean_us, min_us, max_us}} for every phase seen."""
+        self.flush()
+        out = {}
+        for p in np.flatnonzero(self.phase_count).tolist():
+            count = int(self.phase_count[p])
+            out[PHASES[p]] = {
+                "count": count,
+                "seconds": float(self.phase_ns[p] / 1e9),
+                "mean_us": float(self.phase_ns[p] / count / 1e3),
+                "min_us": float(self.phase_min[p] / 1e3),
+                "max_us": float(self.phase_max[p] / 1e3),
+            }
+        return out
+
+    def td_stats(self):
+        self.flush()
+        if not self.td_count:
+            return {"count": 0}
+        return {
+            "count": self.td_count,
+            "mean": self.td_mean,
+            "std": (self._td_m2 / self.td_count) ** 0.5,
+            "min": self.td_min,
+            "max": self.td_max,
+            "abs_decades": {("<1e%d" % TD_DECADES[0]) if i == 0 else f">=1e{TD_DECADES[i - 1]}": int(c)
+                            for i, c in enumerate(self.td_hist.tolist())},
+        }
+
+    def summary(self):
+        return {
+            "phases": self.phases(),
+            "counters": dict(self.counters),
+            "td_error": self.td_stats(),
+            "visits": self.visits.tolist(),
+        }
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=1)
+
+    def to_csv(self, path):
+        """One row per phase (timings) and per counter (count only)."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "name", "count", "seconds", "mean_us", "min_us", "max_us"])
+            for name, p in self.phases().items():
+                writer.writerow(["phase", name, p["count"], p["seconds"], p["mean_us"], p["min_us"], p["max_us"]])
+            for name, value in self.counters.items():
+                writer.writerow(["counter", name, value, "", "", "", ""])
@@ -0,0 +1,163 @@
+import random
+
+import numpy as np
+from scipy import ndimage, sparse
+from scipy.sparse import csgraph
+
+from rl_utils.compiled_tables import TransitionTables
+from rl_utils.sparse_model import SparseModel
+from rl_utils.vector_gridworld import VectorGridWorld
+
+# =========================
+# Procedural maze generator
+# =========================
+# Seeded mazes from 10x10 up to a few thousand cells per side, in the same format as the
+# configuration of demos/test.py (ROWS, COLS, walls[r, c] = 1 for blocked cells, START,
+# GOAL), so they can drive the DP code and the tabular agents at any size:
+#   recursive_backtracker  perfect maze (one path between any two cells, long corridors)
+#   random_walls           open grid with randomly blocked cells; cells that cannot reach
+#                          the goal are filled in, so every open cell has a path to it
+# Optional slip: with probability `slip` the chosen action is replaced by a uniformly
+# random one (in the sparse model and in the vector environment).
+
+# demos/test.py action order: 0=up, 1=right, 2=down, 3=left
+ACTION_DELTA = np.array([(-1, 0), (0, 1), (1, 0), (0, -1)])
+
+
+class Maze:
+    def __init__(self, walls, start, goal, slip=0.0, seed=None):
+        self.walls = np.asarray(walls, dtype=np.int8)
+        self.rows, self.cols = self.walls.shape
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.slip = slip
+        self.seed = seed
+
+    @property
+    def num_states(self):
+        return self.rows * self.cols
+
+    @property
+    def wall_list(self):
+        """Blocked cells as a list of (r, c), like WALLS in demos/test.py."""
+        return [tuple(rc) for rc in np.argwhere(self.walls == 1).tolist()]
+
+    def state_id(self, cell):
+        return cell[0] * self.cols + cell[1]
+
+    def tables(self, goal_reward=10.0, wall_reward=-5.0, step_reward=-1.0):
+        """
+        Deterministic dynamics of demos/test.py (bumping into a wall or the border keeps
+        the agent in place) with its default reward_fn, built with array operations.
+        """
+        row, col = np.divmod(np.arange(self.num_states), self.cols)
+        new_row = row[:, None] + ACTION_DELTA[:, 0]
+        new_col = col[:, None] + ACTION_DELTA[:, 1]
+
+        hit_wall = (new_row < 0) | (new_row >= self.rows) | (new_col < 0) | (new_col >= self.cols)
+        hit_wall[~hit_wall] = self.walls[new_row[~hit_wall], new_col[~hit_wall]] == 1
+        new_row = np.where(hit_wall, row[:, None], new_row)
+        new_col = np.where(hit_wall, col[:, None], new_col)
+
+        next_state = new_row * self.cols + new_col
+        done = next_state == self.state_id(self.goal)
+        reward = np.where(done, goal_reward, np.where(hit_wall, wall_reward, step_reward))
+        return TransitionTables(next_state, reward, done)
+
+    def model(self, **rewards):
+        """SparseModel of the maze, including slip; wall cells are inactive."""
+        tables = self.tables(**rewards)
+        active = self.walls.ravel() == 0
+        if not self.slip:
+            return SparseModel.from_tables(tables, active=active)
+
+        # every (s, a) row has one outcome per executed action b
+        S, A = tables.num_states, tables.num_actions
+        probs = np.full((A, A), self.slip / A) + (1.0 - self.slip) * np.eye(A)     # [a, b]
+        data = np.broadcast_to(probs, (S, A, A)).ravel()
+        indices =np.broadcast_to(tables.next_state[:, None, :], (S, A, A)).ravel()
+        done = np.broadcast_to(tables.done[:, None, :], (S, A, A)).ravel()
+        P = sparse.csr_matrix((data, indices, np.arange(0, S * A * A + 1, A)), shape=(S * A, S))
+        R = (probs[None, :, :] * tables.reward[:, None, :]).sum(axis=2).ravel()
+        return SparseModel(P, R, done, S, A, active=active)
+
+    def shortest_path_length(self):
+        """Fewest moves from start to goal (inf if unreachable)."""
+        tables = self.tables()
+        S = self.num_states
+        graph = sparse.csr_matrix(
+            (np.ones(tables.next_state.size), tables.next_state.ravel(), np.arange(0, S * 4 + 1, 4)),
+            shape=(S, S),
+        )
+        distances = csgraph.dijkstra(graph, indices=self.state_id(self.start), unweighted=True)
+        return distances[self.state_id(self.goal)]
+
+    def vector_env(self, num_envs, rng=None):
+        """
+        VectorGridWorld running this maze (flat state ids, demos/test.py action order).
+        rng: seed or rl_utils.rng stream for the slip draws (None -> shared global stream)
+        """
+        return VectorGridWorld.from_tables(
+            num_envs, self.tables(), self.rows, self.cols, start=self.start, terminal=self.goal,
+            slip=self.slip, rng=rng,
+        )
+
+
+def recursive_backtracker(rows, cols, seed=None, slip=0.0):
+    """
+    Perfect maze: rooms on even (r, c), carved by a randomized depth-first search.
+    Start is (0, 0), the goal is the room closest to the bottom-right corner.
+    """
+    rng = random.Random(seed)
+    room_rows, room_cols = (rows + 1) // 2, (cols + 1) // 2
+    open_cells = [[False] * cols for _ in range(rows)]
+    visited = [[False] * room_cols for _ in range(room_rows)]
+
+    visited[0][0] = True
+    open_cells[0][0] = True
+    stack = [(0, 0)]
+    while stack:
+        r, c = stack[-1]
+        neighbours = [
+            (nr, nc) for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1))
+            if 0 <= nr < room_rows and 0 <= nc < room_cols and not visited[nr][nc]
+        ]
+        if not neighbours:
+            stack.pop()
+            continue
+        nr, nc = neighbours[rng.randrange(len(neighbours))]
+        visited[nr][nc] = True
+        open_cells[2 * nr][2 * nc] = True
+        open_cells[r + nr][c + nc] = True                             # knock down the wall between
+        stack.append((nr, nc))
+
+    walls = (~np.array(open_cells, dtype=bool)).astype(np.int8)
+    goal = (2 * (room_rows - 1), 2 * (room_cols - 1))
+    return Maze(walls, (0, 0), goal, slip=slip, seed=seed)
+
+
+def random_walls(rows, cols, density=0.25, seed=None, slip=0.0):
+    """
+    Each cell blocked with probability `density`; a random monotone path from start (0, 0)
+    to goal (rows-1, cols-1) is kept open, and open cells cut off from the goal are filled.
+    """
+    rng = np.random.default_rng(seed)
+    walls = (rng.random((rows, cols)) < density).astype(np.int8)
+
+    # carve a random right/down staircase so the goal is always reachable
+    moves = rng.permutation(np.r_[np.zeros(rows - 1, dtype=int), np.ones(cols - 1, dtype=int)])
+    path_rows = np.r_[0, np.cumsum(moves == 0)]
+    path_cols = np.r_[0, np.cumsum(moves == 1)]
+    walls[path_rows, path_cols] = 0
+
+    labels, _ = ndimage.label(walls == 0)
+    walls[labels != labels[rows - 1, cols - 1]] = 1
+    return Maze(walls, (0, 0), (rows - 1, cols - 1), slip=slip, seed=seed)
+
+
+def generate_maze(rows, cols, kind="backtracker", seed=None, slip=0.0, **kwargs):
+    if kind == "backtracker":
+        return recursive_backtracker(rows, cols, seed=seed, slip=slip)
+    if kind == "random":
+        return random_walls(rows, cols, seed=seed, slip=slip, **kwargs)
+    raise ValueError("kind must be 'backtracker' or 'random'")
@@ -0,0 +1,287 @@
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+
+from rl_utils.instrumentation import EVALUATE, IMPROVE, clock
+
+# =========================
+# Parallel dynamic programming over a partitioned state space
+# =========================
+# The model (CSR arrays of a rl_utils.sparse_model.SparseModel), the value function and
+# the policy all live in multiprocessing.shared_memory buffers. States are split into
+# contiguous blocks; every sweep the process pool backs up all blocks in parallel and
+# returns each block's largest change, so convergence is decided globally in the parent.
+#   mode="jacobi"        every block reads V_old and writes V_new (two buffers, swapped
+#                        per sweep): same iterates as the serial synchronous sweep
+#   mode="gauss-seidel"  one buffer updated in place: blocks read the newest values other
+#                        blocks have already written (block Gauss-Seidel / asynchronous
+#                        relaxation), which usually needs fewer sweeps
+# Workers read the model in place: a block's matrix is a view into the shared buffers,
+# and the only rows a worker copies are the current policy's (1/A of the model).
+# ParallelDP.policy_iteration works on the same deterministic policies as
+# demos/test.py (one action per state, nothing for inactive/wall states).
+
+MODES = ("jacobi", "gauss-seidel")
+
+_worker = {}
+
+
+def _share(array):
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(specs, num_states, num_actions):
+    """Pool initializer: map every shared buffer once per worker process."""
+    _worker.clear()
+    _worker["shm"] = []
+    for key, spec in specs.items():
+        shm, array = _attach(spec)
+        _worker["shm"].append(shm)
+        _worker[key] = array
+    _worker["num_states"] = num_states
+    _worker["num_actions"] = num_actions
+    _worker["cache"] = {}
+
+
+def _row_view(first, last):
+    """Rows [first, last) of the shared model as a CSR matrix over the shared buffers (no copy)."""
+    indptr = _worker["indptr"][first:last + 1]
+    lo, hi = indptr[0], indptr[-1]
+    P = sparse.csr_matrix((last - first, _worker["num_states"]))
+    # assigned directly: the constructor copies slices of a larger buffer (and downcasts indices)
+    P.data, P.indices, P.indptr = _worker["data"][lo:hi], _worker["indices"][lo:hi], indptr - lo
+    return P
+
+
+def _block_rows(block, policy_version=None):
+    """
+    CSR rows and rewards of the block's (state, policy action) pairs, cached until the
+    policy changes; with policy_version=None all A rows of every state in the block, as
+    views into the shared buffers (value iteration and policy improvement).
+    """
+    key = (block, policy_version)
+    cache = _worker["cache"]
+    if key not in cache:
+        start, stop = block
+        A = _worker["num_actions"]
+        if policy_version is None:
+            cache[key] = (_row_view(start * A, stop * A), _worker["R"][start * A:stop * A])
+        else:
+            P_rows, R_rows = _block_rows(block)
+            rows = np.arange(stop - start) * A + np.maximum(_worker["policy"][start:stop], 0)
+            for old_key in [k for k in cache if k[1] is not None and k[1] != policy_version]:
+                del cache[old_key]
+            cache[key] = (P_rows[rows], R_rows[rows])
+    return cache[key]
+
+
+def _sweep_block(task):
+    """One backup of every state in [start, stop); returns the block's largest change."""
+    kind, block, read, write, gamma, policy_version = task
+    start, stop = block
+    V_read, V_write = _worker[read], _worker[write]
+    active = _worker["active"][start:stop]
+    A = _worker["num_actions"]
+
+    if kind == "evaluate":
+        P_rows, R_rows = _block_rows(block, policy_version)
+        new = R_rows + gamma * (P_rows @ V_read)
+        new[_worker["policy"][start:stop] < 0] = 0.0
+    else:
+        P_rows, R_rows = _block_rows(block)
+        q = (R_rows + gamma * (P_rows @ V_read)).reshape(-1, A)
+        new = q.max(axis=1)
+    new[~active] = 0.0
+
+    delta = float(np.max(np.abs(new - V_read[start:stop]))) if len(new) else 0.0
+    V_write[start:stop] = new
+    return delta
+
+
+def _improve_block(task):
+    """Greedy action for every state in [start, stop) w.r.t. V; returns the number of changed actions."""
+    block, values, gamma = task
+    start, stop = block
+    A = _worker["num_actions"]
+    P_rows, R_rows = _block_rows(block)
+    q = (R_rows + gamma * (P_rows @ _worker[values])).reshape(-1, A)
+    best = np.where(_worker["active"][start:stop], np.argmax(q, axis=1), -1)
+    policy = _worker["policy"][start:stop]
+    changed = int(np.sum(best != policy))
+    policy[:] = best
+    return changed
+
+
+class ParallelDP:
+    def __init__(self, model, workers=None, blocks_per_worker=4, mode="jacobi"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.model = model
+        self.mode = mode
+        self.workers = workers or os.cpu_count()
+        S, A = model.num_states, model.num_actions
+
+        P = model.P_continue
+        arrays = {
+            "indptr": P.indptr.astype(np.int64),
+            "indices": P.indices.astype(np.int64),
+            "data": P.data,
+            "R": model.R,
+            "active": model.active,
+            "V0": np.zeros(S),
+            "V1": np.zeros(S),
+            "policy": np.where(model.active, 0, -1).astype(np.int64),
+        }
+        self._shm, specs = [], {}
+        for key, array in arrays.items():
+            shm, spec = _share(array)
+            self._shm.append(shm)
+            specs[key] = spec
+        self._views = {key: np.ndarray(spec[1], dtype=np.dtype(spec[2]), buffer=shm.buf)
+                       for (key, spec), shm in zip(specs.items(), self._shm)}
+
+        num_blocks = max(1, min(S, self.workers * blocks_per_worker))
+        bounds = np.linspace(0, S, num_blocks + 1).astype(int)
+        self.blocks = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+        self._pool = mp.Pool(self.workers, initializer=_init_worker, initargs=(specs, S, A))
+        self._policy_version = 0
+        self._current = "V0"                                     # buffer holding the latest V
+
+    # ---------- lifecycle ----------
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._views = {}
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- state ----------
+    @property
+    def V(self):
+        return self._views[self._current].copy()
+
+    @property
+    def policy_actions(self):
+        return self._views["policy"].copy()
+
+    def set_policy(self, actions):
+        """Deterministic policy as one action per state (-1 / ignored for inactive states)."""
+        self._views["policy"][:] = np.where(self.model.active, actions, -1)
+        self._policy_version += 1
+
+    # ---------- sweeps ----------
+    def _run_sweeps(self, kind, gamma, theta, max_sweeps):
+        sweeps, delta = 0, np.inf
+        while max_sweeps is None or sweeps < max_sweeps:
+            read = self._current
+            write = ("V1" if read == "V0" else "V0") if self.mode == "jacobi" else read
+            tasks = [(kind, block, read, write, gamma, self._policy_version) for block in self.blocks]
+            delta = max(self._pool.map(_sweep_block, tasks, chunksize=1))
+            self._current = write                                # swap buffers (Jacobi)
+            sweeps += 1
+            if delta < theta:
+                break
+        return sweeps, delta
+
+    def evaluate(self, gamma=0.95, theta=1e-6, max_sweeps=None):
+        """Evaluate the current policy starting from the current V. Returns (V, sweeps)."""
+        sweeps, _ = self._run_sweeps("evaluate", gamma, theta, max_sweeps)
+        return self.V, sweeps
+
+    def value_iteration(self, gamma=0.95, theta=1e-6, max_sweeps=None):
+        """V <- max_a Q until the largest change is below theta. Returns (V, sweeps)."""
+        sweeps, _ = self._run_sweeps("optimal", gamma, theta, max_sweeps)
+        return self.V, sweeps
+
+    def improve(self, gamma=0.95):
+        """Greedy policy improvement over all blocks. Returns the number of states whose action changed."""
+        tasks = [(block, self._current, gamma) for block in self.blocks]
+        changed = sum(self._pool.map(_improve_block, tasks, chunksize=1))
+        self._policy_version += 1
+        return changed
+
+    def policy_iteration(self, gamma=0.95, theta=1e-6, max_iterations=10_000, instrument=None):
+        """
+        Policy iteration: evaluate (warm-started from the previous V) and improve until
+        no action changes. Returns (policy, V, history) with policy as a one-hot (S, A)
+        array like demos/test.py, and per-iteration sweeps and seconds.
+        instrument: rl_utils.instrumentation.Recorder (evaluate / improve timers, counters).
+        """
+        rec = instrument
+        history = []
+        for iteration in range(1, max_iterations + 1):
+            start = time.perf_counter()
+            t0 = clock() if rec else 0
+            _, sweeps = self.evaluate(gamma, theta)
+            t1 = clock() if rec else 0
+            changed = self.improve(gamma)
+            if rec:
+                rec.span(EVALUATE, t0, t1)
+                rec.span(IMPROVE, t1, clock())
+                rec.add("iterations")
+                rec.add("sweeps", sweeps)
+                rec.add("backups", sweeps * int(self.model.active.sum()))
+            history.append({"iteration": iteration, "sweeps": sweeps, "policy_changes": changed,
+                            "seconds": time.perf_counter() - start})
+            if changed == 0:
+                break
+
+        actions = self.policy_actions
+        policy = np.zeros((self.model.num_states, self.model.num_actions))
+        rows = np.flatnonzero(actions >= 0)
+        policy[rows, actions[rows]] = 1.0
+        return policy, self.V, history
+
+
+# =========================
+# Strong-scaling benchmark
+# =========================
+
+def strong_scaling(model, worker_counts=None, gamma=0.95, theta=1e-6, mode="jacobi", task="value_iteration"):
+    """
+    Time the same problem (value iteration or policy iteration) with 1..N workers.
+    Returns a list of {workers, seconds, sweeps, speedup, efficiency}; speedup and
+    efficiency are relative to the first entry of worker_counts.
+    """
+    worker_counts = worker_counts or list(range(1, (os.cpu_count() or 1) + 1))
+    results = []
+    for workers in worker_counts:
+        with ParallelDP(model, workers=workers, mode=mode) as dp:
+            start = time.perf_counter()
+            if task == "value_iteration":
+                _, sweeps = dp.value_iteration(gamma, theta)
+            else:
+                _, _, history = dp.policy_iteration(gamma, theta)
+                sweeps = sum(h["sweeps"] for h in history)
+            seconds = time.perf_counter() - start
+        results.append({"workers": workers, "seconds": seconds, "sweeps": sweeps})
+
+    base_seconds, base_workers = results[0]["seconds"], results[0]["workers"]
+    for r in results:
+        r["speedup"] = base_seconds / r["seconds"]
+        r["efficiency"] = r["speedup"] * base_workers / r["workers"]
+    return results
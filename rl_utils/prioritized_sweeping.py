@@ -0,0 +1,109 @@
+import heapq
+import time
+
+import numpy as np
+
+# =========================
+# Prioritized sweeping (asynchronous value iteration)
+# =========================
+# Instead of backing up every state every sweep, keep a priority queue of states and
+# always back up the most urgent one. Moore & Atkeson's priorities: when a backup changes
+# V(s) by delta > theta, every predecessor p of s (a state that can reach it) is queued
+# with priority gamma * max_a P(s|p, a) * delta, a bound on how much that change can move
+# p's Bellman error, or keeps its current priority if that is larger. Changes of at most
+# theta are not propagated, so converged regions cost nothing and, as with the theta of
+# full-sweep value iteration, the result is within about theta / (1 - gamma) of V*.
+# Works on any rl_utils.sparse_model.SparseModel (built from compiled tables or from a
+# P[s][a] dict model).
+
+
+def predecessor_lists(model):
+    """
+    preds[s'] = [(p, max_a P(s'|p, a)), ...] over the active states p that reach s' through
+    a bootstrapping outcome.
+    """
+    S, A = model.num_states, model.num_actions
+    P = model.P_continue.tocoo()
+    pred, succ, prob = P.row // A, P.col, P.data
+    keep = model.active[pred]
+    pred, succ, prob = pred[keep], succ[keep], prob[keep]
+
+    # max over actions: sort by (s', p) and reduce each run of equal keys
+    key = succ.astype(np.int64) * S + pred
+    order = np.argsort(key, kind="stable")
+    key, prob = key[order], prob[order]
+    if len(key):
+        first = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+        key, prob = key[first], np.maximum.reduceat(prob, first)
+
+    preds = [[] for _ in range(S)]
+    for k, w in zip(key.tolist(), prob.tolist()):
+        preds[k // S].append((k % S, w))
+    return preds
+
+
+def prioritized_value_iteration(model, gamma=0.95, theta=1e-6, V=None, max_backups=None):
+    """
+    Prioritized sweeping. Starts from the Bellman errors of one vectorized backup and stops
+    when the queue is empty (or after max_backups).
+    Returns (V, stats) with stats = {backups, error_evaluations, seconds}; the Bellman error
+    of every active state is evaluated once (the initial full backup), backups are the rest.
+    """
+    start = time.perf_counter()
+    S, A = model.num_states, model.num_actions
+    P = model.P_continue
+    indptr, indices, data = P.indptr.tolist(), P.indices.tolist(), P.data.tolist()
+    R = model.R.tolist()
+    preds = predecessor_lists(model)
+
+    V_init = np.zeros(S) if V is None else np.array(V, dtype=np.float64)
+    V_init[~model.active] = 0.0
+
+    # initial priorities for all states in one vectorized backup
+    errors = np.abs(model.q_values(V_init, gamma).max(axis=1) - V_init)
+    errors[~model.active] = 0.0
+    values = V_init.tolist()
+
+    def best_q(s):
+        best = -np.inf
+        for row in range(s * A, s * A + A):
+            q = R[row]
+            for k in range(indptr[row], indptr[row + 1]):
+                q += gamma * data[k] * values[indices[k]]
+            if q > best:
+                best = q
+        return best
+
+    queued = [0.0] * S                                           # priority a state is queued with (0 = not queued)
+    heap = []
+    for s in np.flatnonzero(errors > theta).tolist():
+        queued[s] = float(errors[s])
+        heap.append((-queued[s], s))
+    heapq.heapify(heap)
+
+    backups = 0
+    while heap and (max_backups is None or backups < max_backups):
+        neg_priority, s = heapq.heappop(heap)
+        if -neg_priority != queued[s]:
+            continue                                              # stale entry
+        queued[s] = 0.0
+
+        new = best_q(s)
+        delta = abs(new - values[s])
+        values[s] = new
+        backups += 1
+        if delta <= theta:
+            continue
+
+        for p, prob in preds[s]:
+            priority = gamma * prob * delta
+            if priority > theta and priority > queued[p]:
+                queued[p] = priority
+                heapq.heappush(heap, (-priority, p))
+
+    stats = {
+        "backups": backups,
+        "error_evaluations": int(model.active.sum()),
+        "seconds": time.perf_counter() - start,
+    }
+    return np.array(values), stats
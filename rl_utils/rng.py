@@ -0,0 +1,89 @@
+import numpy as np
+
+# =========================
+# Shared randomness layer
+# =========================
+# Hot loops (epsilon-greedy, Double Q coin flips, bandit rewards) draw one scalar per
+# step; every np.random.* call for a single value costs far more than the number itself.
+# BlockRNG wraps a np.random.Generator and serves scalars from pre-drawn blocks (uniforms
+# and standard normals), refilled in bulk when used up. Array draws go straight to
+# rng.generator.
+#
+# Seeding: stream(seed, *key) gives a deterministic, independent stream per key, e.g.
+# stream(seed, worker_id) or stream(seed, worker_id, env_id), built from
+# np.random.SeedSequence(seed, spawn_key=key) so it does not depend on creation order;
+# parallel runs are reproducible run by run. Code that is not given a stream uses the
+# process-wide global_stream() (reseed it with seed_global).
+
+BLOCK_SIZE = 4096
+
+
+class BlockRNG:
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        self.generator = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.block_size = block_size
+        self._uniforms, self._u = [], 0
+        self._normals, self._n = [], 0
+
+    def random(self):
+        """Uniform float in [0, 1)."""
+        if self._u == len(self._uniforms):
+            self._uniforms, self._u = self.generator.random(self.block_size).tolist(), 0
+        value = self._uniforms[self._u]
+        self._u += 1
+        return value
+
+    def integers(self, high):
+        """Uniform int in [0, high), from one block uniform."""
+        if self._u == len(self._uniforms):
+            self._uniforms, self._u = self.generator.random(self.block_size).tolist(), 0
+        value = self._uniforms[self._u]
+        self._u += 1
+        return int(value * high)
+
+    def choice(self, options):
+        """Uniform pick from a sequence or 1-D array."""
+        return options[self.integers(len(options))]
+
+    def normal(self, loc=0.0, scale=1.0):
+        if self._n == len(self._normals):
+            self._normals, self._n = self.generator.standard_normal(self.block_size).tolist(), 0
+        value = self._normals[self._n]
+        self._n += 1
+        return loc + scale * value
+
+
+def stream(seed, *key, block_size=BLOCK_SIZE):
+    """Independent stream for (seed, *key), e.g. stream(seed, worker_id, env_id)."""
+    sequence = np.random.SeedSequence(seed, spawn_key=tuple(int(k) for k in key))
+    return BlockRNG(np.random.default_rng(sequence), block_size)
+
+
+def spawn(seed, n, block_size=BLOCK_SIZE):
+    """n independent streams: stream(seed, 0), ..., stream(seed, n - 1)."""
+    return [stream(seed, i, block_size=block_size) for i in range(n)]
+
+
+_global = None
+
+
+def global_stream():
+    global _global
+    if _global is None:
+        _global = BlockRNG()
+    return _global
+
+
+def seed_global(seed):
+    global _global
+    _global = BlockRNG(seed)
+    return _global
+
+
+def make_rng(rng=None):
+    """rng argument convention: None -> global stream, int -> new seeded stream, BlockRNG -> as is."""
+    if rng is None:
+        return global_stream()
+    if isinstance(rng, BlockRNG):
+        return rng
+    return BlockRNG(rng)
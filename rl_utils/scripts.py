@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import sys
+
+# =========================
+# Loading the repo's scripts as modules
+# =========================
+# Most algorithms live in folders whose names are not valid Python packages
+# ("Double Q-Learning/double-q_learning.py", "demos/test.py", ...), so shared code
+# that needs them (benchmarks, sweeps, planners) loads them by path instead.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(relative_path, module_name=None):
+    """Import REPO_ROOT/relative_path once and return the module (cached in sys.modules)."""
+    path = os.path.join(REPO_ROOT, relative_path)
+    if module_name is None:
+        stem = os.path.splitext(relative_path)[0]
+        module_name = "repo_" + "".join(ch if ch.isalnum() else "_" for ch in stem)
+
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
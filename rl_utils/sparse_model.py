@@ -0,0 +1,254 @@
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+# =========================
+# CSR-backed MDP model
+# =========================
+# Replaces the nested P[s][a] = [(prob, next_s, reward, done)] dicts of demos/test.py
+# for large state spaces:
+#   P       CSR matrix (S*A, S), row s*A + a holds the next-state probabilities of (s, a)
+#   R       (S*A,) expected immediate reward of (s, a)
+#   done    bool per stored entry of P (aligned with P.data): that outcome ends the episode
+#   active  (S,) bool, states that get evaluated (e.g. False for wall cells, whose value stays 0)
+# A policy evaluation sweep is then one sparse matrix-vector product.
+
+
+class SparseModel:
+    def __init__(self, P, R, done, num_states, num_actions, active=None):
+        self.P = sparse.csr_matrix(P)
+        self.R = np.asarray(R, dtype=np.float64)
+        self.done = np.asarray(done, dtype=bool)
+        self.num_states = num_states
+        self.num_actions = num_actions
+        self.active = np.ones(num_states, dtype=bool) if active is None else np.asarray(active, dtype=bool)
+
+        # probabilities of the outcomes that bootstrap (done outcomes contribute reward only);
+        # own index arrays, since eliminate_zeros() compacts them in place
+        self.P_continue = sparse.csr_matrix(
+            (self.P.data * ~self.done, self.P.indices.copy(), self.P.indptr.copy()), shape=self.P.shape
+        )
+        self.P_continue.eliminate_zeros()
+
+    @classmethod
+    def from_tables(cls, tables, active=None):
+        """Deterministic model from rl_utils.compiled_tables.TransitionTables (no Python loop)."""
+        S, A = tables.num_states, tables.num_actions
+        P = sparse.csr_matrix(
+            (np.ones(S * A), tables.next_state.ravel(), np.arange(S * A + 1)), shape=(S * A, S)
+        )
+        return cls(P, tables.reward.ravel(), tables.done.ravel(), S, A, active)
+
+    @classmethod
+    def from_dict(cls, P_dict, num_states, num_actions, active=None):
+        """Model from the P[s][a] = [(prob, next_s, reward, done)] dict format (stochastic allowed)."""
+        rows, cols, probs, dones = [], [], [], []
+        R = np.zeros(num_states * num_actions)
+        for s in range(num_states):
+            for a in range(num_actions):
+                row = s * num_actions + a
+                for (prob, ns, rew, done) in P_dict[s][a]:
+                    rows.append(row)
+                    cols.append(ns)
+                    probs.append(prob)
+                    dones.append(done)
+                    R[row] += prob * rew
+
+        # build CSR directly so every (row, next_s, done) outcome keeps its own entry
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(num_states * num_actions + 1, dtype=np.int64)
+        np.add.at(indptr, np.asarray(rows, dtype=np.int64) + 1, 1)
+        P = sparse.csr_matrix(
+            (np.asarray(probs)[order], np.asarray(cols, dtype=np.int64)[order], np.cumsum(indptr)),
+            shape=(num_states * num_actions, num_states),
+        )
+        return cls(P, R, np.asarray(dones)[order], num_states, num_actions, active)
+
+    def policy_operator(self, policy):
+        """
+        P_pi (S, S) and r_pi (S,) for a (possibly stochastic) policy of shape (S, A).
+        Rows of inactive states are zero, so their value stays 0.
+        """
+        S, A = self.num_states, self.num_actions
+        weights = (np.asarray(policy, dtype=np.float64) * self.active[:, None]).ravel()
+        Pi = sparse.csr_matrix((weights, np.arange(S * A), np.arange(0, S * A + 1, A)), shape=(S, S * A))
+        Pi.eliminate_zeros()
+        return (Pi @ self.P_continue).tocsr(), Pi @ self.R
+
+    def q_values(self, V, gamma):
+        """Q[s, a] = R(s, a) + gamma * sum_s' P(s'|s, a) V(s') over non-terminal outcomes, shape (S, A)."""
+        return (self.R + gamma * (self.P_continue @ V)).reshape(self.num_states, self.num_actions)
+
+
+# =========================
+# Vectorized policy evaluation / improvement
+# =========================
+
+def _sweep(P_pi, r_pi, V, gamma, theta, max_sweeps=None):
+    """Jacobi sweeps V <- r_pi + gamma * P_pi V until the max change < theta or max_sweeps; returns (V, sweeps, delta)."""
+    sweeps, delta = 0, np.inf
+    while max_sweeps is None or sweeps < max_sweeps:
+        V_new = r_pi + gamma * (P_pi @ V)
+        delta = np.max(np.abs(V_new - V)) if len(V) else 0.0
+        V = V_new
+        sweeps += 1
+        if delta < theta:
+            break
+    return V, sweeps, delta
+
+
+def evaluate_policy(model, policy, gamma=0.95, theta=1e-6, V=None, max_sweeps=None):
+    """
+    Synchronous (Jacobi) policy evaluation; every sweep is V <- r_pi + gamma * P_pi V.
+    Stops when the largest change in a sweep is below theta, or after max_sweeps.
+    Returns (V, sweeps).
+    """
+    P_pi, r_pi = model.policy_operator(policy)
+    V = np.zeros(model.num_states) if V is None else np.array(V, dtype=np.float64)
+    V, sweeps, _ = _sweep(P_pi, r_pi, V, gamma, theta, max_sweeps)
+    return V, sweeps
+
+
+# =========================
+# Exact policy evaluation: solve (I - gamma P_pi) V = r_pi
+# =========================
+
+EVALUATION_BACKENDS = ("sweep", "direct", "gmres", "bicgstab")
+
+
+def bellman_residual(P_pi, r_pi, V, gamma):
+    """max |r_pi + gamma P_pi V - V|, the error left in the policy's Bellman equation."""
+    return float(np.max(np.abs(r_pi + gamma * (P_pi @ V) - V))) if len(V) else 0.0
+
+
+def solve_policy_values(P_pi, r_pi, gamma=0.95, backend="direct", tol=1e-10, V=None, maxiter=None):
+    """
+    Values of a fixed policy from its operator (P_pi, r_pi):
+      "sweep"    -> Jacobi sweeps until the change is below tol
+      "direct"   -> sparse LU solve (scipy.sparse.linalg.spsolve)
+      "gmres"    -> restarted GMRES, warm-started from V
+      "bicgstab" -> BiCGSTAB, warm-started from V
+    If a Krylov solver does not converge within maxiter, sweeps finish the job from its iterate.
+    Returns (V, residual) with residual = bellman_residual(...).
+    """
+    if backend not in EVALUATION_BACKENDS:
+        raise ValueError(f"backend must be one of {EVALUATION_BACKENDS}")
+
+    n = P_pi.shape[0]
+    V = np.zeros(n) if V is None else np.array(V, dtype=np.float64)
+
+    if backend == "sweep":
+        V, _, _ = _sweep(P_pi, r_pi, V, gamma, tol)
+        return V, bellman_residual(P_pi, r_pi, V, gamma)
+
+    A = sparse.identity(n, format="csr") - gamma * P_pi
+
+    if backend == "direct":
+        V = sparse_linalg.spsolve(A.tocsc(), r_pi)
+    else:
+        solver = sparse_linalg.gmres if backend == "gmres" else sparse_linalg.bicgstab
+        V, info = solver(A, r_pi, x0=V, rtol=tol, atol=0.0, maxiter=maxiter)
+        if info != 0:
+            V, _, _ = _sweep(P_pi, r_pi, V, gamma, tol)
+
+    return V, bellman_residual(P_pi, r_pi, V, gamma)
+
+
+def evaluate_policy_exact(model, policy, gamma=0.95, backend="direct", tol=1e-10, V=None):
+    """evaluate_policy via a linear solve of (I - gamma P_pi) V = r_pi. Returns (V, residual)."""
+    P_pi, r_pi = model.policy_operator(policy)
+    return solve_policy_values(P_pi, r_pi, gamma=gamma, backend=backend, tol=tol, V=V)
+
+
+def greedy_policy(model, V, gamma=0.95):
+    """One-hot greedy policy (S, A) w.r.t. V; inactive states get an all-zero row."""
+    best = np.argmax(model.q_values(V, gamma), axis=1)
+    policy = np.zeros((model.num_states, model.num_actions))
+    policy[np.arange(model.num_states), best] = 1.0
+    policy[~model.active] = 0.0
+    return policy
+
+
+# =========================
+# Modified (truncated, warm-started) policy iteration
+# =========================
+
+def modified_policy_iteration(model, gamma=0.95, theta=1e-6, eval_sweeps="adaptive", warm_start=True,
+                              adaptive_ratio=0.1, max_iterations=10_000):
+    """
+    Policy iteration where each evaluation step
+      - starts from the previous V (warm_start=True) instead of zeros, and
+      - runs only eval_sweeps sweeps:
+          int        -> exactly k sweeps (classic modified policy iteration)
+          "adaptive" -> until the sweep change drops below adaptive_ratio times the
+                        change of the first sweep (less work when the policy barely moved)
+          None       -> until the change is below theta (full evaluation)
+    Stops once the greedy policy no longer changes and the last sweep changed V by less
+    than theta, so the result is the same fixed point as full policy iteration.
+    eval_sweeps=None, warm_start=False reproduces plain policy iteration.
+
+    Returns (policy, V, history); history has one dict per outer iteration with the
+    evaluation sweeps, state backups (evaluation + improvement), seconds, last sweep
+    change and number of states whose action changed.
+    """
+    n_active = int(model.active.sum())
+    V = np.zeros(model.num_states)
+    policy = np.ones((model.num_states, model.num_actions)) / model.num_actions   # start uniform
+    policy[~model.active] = 0.0
+    history = []
+
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        P_pi, r_pi = model.policy_operator(policy)
+        if not warm_start:
+            V = np.zeros(model.num_states)
+
+        if eval_sweeps == "adaptive":
+            V, sweeps, delta = _sweep(P_pi, r_pi, V, gamma, theta, max_sweeps=1)
+            if delta >= theta:
+                V, more_sweeps, delta = _sweep(P_pi, r_pi, V, gamma, max(theta, adaptive_ratio * delta))
+                sweeps += more_sweeps
+        else:
+            V, sweeps, delta = _sweep(P_pi, r_pi, V, gamma, theta, max_sweeps=eval_sweeps)
+
+        # policy improvement: one backup per state over all actions
+        new_policy = greedy_policy(model, V, gamma)
+        changed = int(np.sum(np.argmax(new_policy, axis=1) != np.argmax(policy, axis=1)))
+        policy = new_policy
+
+        history.append({
+            "iteration": iteration,
+            "sweeps": sweeps,
+            "backups": (sweeps + 1) * n_active,
+            "seconds": time.perf_counter() - start,
+            "delta": float(delta),
+            "policy_changes": changed,
+        })
+
+        if changed == 0 and delta < theta:
+            break
+
+    return policy, V, history
+
+
+# =========================
+# Synchronous value iteration (full sweeps)
+# =========================
+
+def value_iteration(model, gamma=0.95, theta=1e-6, V=None, max_sweeps=None):
+    """
+    V <- max_a [R(s, a) + gamma * P V] over all active states every sweep, until the
+    largest change is below theta. Returns (V, sweeps); backups = sweeps * active states.
+    """
+    V = np.zeros(model.num_states) if V is None else np.array(V, dtype=np.float64)
+    sweeps = 0
+    while max_sweeps is None or sweeps < max_sweeps:
+        V_new = np.where(model.active, model.q_values(V, gamma).max(axis=1), 0.0)
+        delta = np.max(np.abs(V_new - V)) if len(V) else 0.0
+        V = V_new
+        sweeps += 1
+        if delta < theta:
+            break
+    return V, sweeps
@@ -0,0 +1,79 @@
+import numpy as np
+
+# =========================
+# State encoding for the tabular agents
+# =========================
+# Every tabular agent keeps Q as a contiguous (num_states, num_actions) array indexed by
+# an int state id: Q[s, a] is one scalar lookup, Q[s] one row, Q[states] a batch. An
+# encoder maps the environment's states to ids (encode) and back (decode):
+#   GridEncoder(rows, cols)     (r, c) <-> r * cols + c, the layout VectorGridWorld uses
+#   HashableEncoder(states)     any hashable state, ids handed out in order of first use
+# Training loops encode the environment's state once per step and stay on ints after that.
+
+
+class GridEncoder:
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.num_states = rows * cols
+
+    def encode(self, state):
+        row, col = state
+        return row * self.cols + col
+
+    def decode(self, state_id):
+        return divmod(state_id, self.cols)
+
+    def encode_batch(self, rows, cols):
+        """Arrays of rows and cols -> array of ids."""
+        return np.asarray(rows) * self.cols + np.asarray(cols)
+
+    def decode_batch(self, state_ids):
+        """Array of ids -> (rows, cols) arrays."""
+        return np.divmod(np.asarray(state_ids), self.cols)
+
+    def grid(self, table):
+        """(num_states, ...) table viewed as (rows, cols, ...), e.g. for printing Q."""
+        return table.reshape(self.rows, self.cols, *table.shape[1:])
+
+
+class HashableEncoder:
+    """
+    Ids for arbitrary hashable states. States listed up front get ids 0, 1, ...; an
+    unseen state gets the next free id, up to `capacity` (default: only the listed states),
+    so a Q table of shape (encoder.num_states, num_actions) covers every id handed out.
+    """
+
+    def __init__(self, states=(), capacity=None):
+        self._ids = {}
+        self._states = []
+        for state in states:
+            self._add(state)
+        self.num_states = len(self._states) if capacity is None else capacity
+        if len(self._states) > self.num_states:
+            raise ValueError("capacity is smaller than the number of listed states")
+
+    def _add(self, state):
+        state_id = self._ids.get(state)
+        if state_id is None:
+            state_id = self._ids[state] = len(self._states)
+            self._states.append(state)
+        return state_id
+
+    def encode(self, state):
+        state_id = self._ids.get(state)
+        if state_id is not None:
+            return state_id
+        if len(self._states) >= self.num_states:
+            raise ValueError(f"no free state id for {state!r} (capacity {self.num_states})")
+        return self._add(state)
+
+    def decode(self, state_id):
+        return self._states[state_id]
+
+    def __len__(self):
+        """Number of ids handed out so far."""
+        return len(self._states)
+
+    def __contains__(self, state):
+        return state in self._ids
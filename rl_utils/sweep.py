@@ -0,0 +1,265 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from rl_utils.rng import stream
+from rl_utils.scripts import load_script
+
+# =========================
+# Seed / hyperparameter sweeps over a process pool
+# =========================
+# A job is a dict of plain values, e.g.
+#   {"algorithm": "sarsa", "seed": 3, "alpha": 0.1, "epsilon": 0.1, "gamma": 0.99,
+#    "episodes": 200, "rows": 5, "cols": 5}
+# and runs one of the single-run trainers (QLearningAgent.train, train_sarsa,
+# train_double_qlearning) in a worker process with the rl_utils.rng stream
+# stream(sweep_seed, job["seed"]): the same seed gives every configuration the same
+# random numbers, and a job's result does not depend on which worker ran it or when.
+#
+# run_sweep streams results back as jobs finish: each result (return curve, wall time,
+# path of the final Q table) is appended to out_dir/results.jsonl and the Q table is
+# saved by the worker to out_dir/q/<job id>.npy, so the parent never holds the tables.
+# Rerunning the same sweep on the same out_dir skips jobs already in results.jsonl, so a
+# killed sweep resumes where it stopped; the job id covers the sweep seed, so the same
+# jobs under another --sweep-seed run as new jobs rather than being skipped. aggregate()
+# folds results into per-configuration mean and 95% confidence-interval curves with
+# running (Welford) sums, one curve at a time.
+# Run: python -m rl_utils.sweep --out sweeps/demo --algorithms q_learning sarsa --seeds 8
+
+ALGORITHMS = ("q_learning", "sarsa", "double_q")
+
+_TRAINERS = {
+    "q_learning": "Q-Learning/q_learning.py",
+    "sarsa": "SARSA/sarsa.py",
+    "double_q": "Double Q-Learning/double-q_learning.py",
+}
+
+
+def grid(**axes):
+    """Cartesian product of the given value lists, one job dict per combination."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def job_id(job, sweep_seed=0):
+    """Stable id of a job run under sweep_seed (same parameters and seed -> same id, across runs)."""
+    return hashlib.sha1(json.dumps([job, sweep_seed], sort_keys=True).encode()).hexdigest()[:16]
+
+
+def config_key(job):
+    """The job's parameters without the seed, as a hashable key for aggregation."""
+    return tuple(sorted((k, v) for k, v in job.items() if k != "seed"))
+
+
+# ---------- worker ----------
+class Trial:
+    """
+    One configuration of a tabular agent that can be trained in steps: train(n) runs n
+    more episodes on the same agent with the same random stream, so train(a) then
+    train(b) gives the same agent as one run of a + b episodes.
+    """
+
+    def __init__(self, job, sweep_seed=0):
+        if job["algorithm"] not in ALGORITHMS:
+            raise ValueError(f"algorithm must be one of {ALGORITHMS}")
+        self.job = job
+        self.module = load_script(_TRAINERS[job["algorithm"]])
+        self.rng = stream(sweep_seed, job.get("seed", 0))
+        self.agent = None
+        self.returns = []                                   # total reward of every episode so far
+
+    @property
+    def episodes(self):
+        return len(self.returns)
+
+    def train(self, episodes):
+        job, module = self.job, self.module
+        rows, cols = job.get("rows", 5), job.get("cols", 5)
+        alpha, gamma, epsilon = job["alpha"], job["gamma"], job["epsilon"]
+
+        if job["algorithm"] == "q_learning":
+            if self.agent is None:
+                self.agent = module.QLearningAgent(rows, cols, 4, alpha, gamma, epsilon, rng=self.rng)
+                self._env = module.GridWorld(rows, cols)
+            self.agent.train(self._env, episodes, returns=self.returns)
+        elif job["algorithm"] == "sarsa":
+            self.agent = module.train_sarsa(episodes, rows, cols, alpha, gamma, epsilon, rng=self.rng,
+                                            returns=self.returns, agent=self.agent)
+        else:
+            self.agent = module.train_double_qlearning(episodes, rows, cols, 4, epsilon, gamma, alpha,
+                                                       rng=self.rng, returns=self.returns, agent=self.agent)
+        return self
+
+    def score(self, window=10, at=None):
+        """Mean return of the last `window` episodes (of the first `at` episodes, if given)."""
+        end = self.episodes if at is None else at
+        return float(np.mean(self.returns[max(0, end - window):end]))
+
+    @property
+    def q(self):
+        if self.job["algorithm"] == "q_learning":
+            return self.agent.Q
+        if self.job["algorithm"] == "sarsa":
+            return self.agent.q_values
+        return self.agent.Q_A + self.agent.Q_B
+
+
+def train_job(job, sweep_seed=0):
+    """Run one job in this process; returns (final Q table, list of episode returns)."""
+    trial = Trial(job, sweep_seed).train(job["episodes"])
+    return trial.q, trial.returns
+
+
+def _run_job(job, sweep_seed, q_dir):
+    start = time.perf_counter()
+    q, returns = train_job(job, sweep_seed)
+    seconds = time.perf_counter() - start
+
+    key = job_id(job, sweep_seed)
+    q_path = None
+    if q_dir is not None:
+        q_path = os.path.join(q_dir, key + ".npy")
+        tmp = q_path + ".tmp.npy"
+        np.save(tmp, q)
+        os.replace(tmp, q_path)                                  # never a half-written table
+    return {"id": key, "job": job, "sweep_seed": sweep_seed, "returns": returns, "seconds": seconds,
+            "q_path": q_path}
+
+
+# ---------- parent ----------
+def iter_results(path):
+    """Results already in a results.jsonl, one at a time (a line cut off by a kill is skipped)."""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                pass
+
+
+def run_sweep(jobs, out_dir, max_workers=None, sweep_seed=0, save_q=True):
+    """
+    Run every job not yet finished in out_dir over a ProcessPoolExecutor; yields each
+    result dict as it finishes (already appended to out_dir/results.jsonl).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    q_dir = os.path.join(out_dir, "q") if save_q else None
+    if q_dir is not None:
+        os.makedirs(q_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.jsonl")
+
+    done = {result["id"] for result in iter_results(results_path)}
+    pending = {}
+    for job in jobs:
+        pending.setdefault(job_id(job, sweep_seed), job)
+    pending = [job for key, job in pending.items() if key not in done]
+    if not pending:
+        return
+
+    with open(results_path, "a+") as out, ProcessPoolExecutor(max_workers) as pool:
+        # a kill mid-write leaves a partial last line: end it so new results start clean
+        if out.tell() and (out.seek(out.tell() - 1), out.read(1))[1] != "\n":
+            out.write("\n")
+        futures = [pool.submit(_run_job, job, sweep_seed, q_dir) for job in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            yield result
+
+
+class CurveStats:
+    """Running mean / variance of equal-length curves (Welford), without keeping the curves."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = None
+        self._m2 = None
+
+    def add(self, curve):
+        curve = np.asarray(curve, dtype=np.float64)
+        self.n += 1
+        if self.mean is None:
+            self.mean = curve.copy()
+            self._m2 = np.zeros_like(curve)
+            return
+        delta = curve - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (curve - self.mean)
+
+    def std(self):
+        return np.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else np.zeros_like(self.mean)
+
+    def ci(self, z=1.96):
+        """(low, high) normal-approximation confidence band of the mean curve."""
+        half = z * self.std() / np.sqrt(self.n)
+        return self.mean - half, self.mean + half
+
+
+def aggregate(results):
+    """
+    Fold results (an iterable of result dicts, e.g. run_sweep(...) or iter_results(path))
+    into {config_key: {"n", "mean", "ci_low", "ci_high", "seconds"}} of return curves.
+    """
+    stats, seconds = {}, {}
+    for result in results:
+        key = config_key(result["job"])
+        stats.setdefault(key, CurveStats()).add(result["returns"])
+        seconds[key] = seconds.get(key, 0.0) + result["seconds"]
+
+    summary = {}
+    for key, curve in stats.items():
+        low, high = curve.ci()
+        summary[key] = {"n": curve.n, "mean": curve.mean, "ci_low": low, "ci_high": high,
+                        "seconds": seconds[key] / curve.n}
+    return summary
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Seed x hyperparameter sweep of the tabular agents")
+    parser.add_argument("--out", required=True, help="output directory (results.jsonl, q/)")
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument("--seeds", type=int, default=8)
+    parser.add_argument("--alpha", type=float, nargs="+", default=[0.1, 0.5])
+    parser.add_argument("--epsilon", type=float, nargs="+", default=[0.05, 0.2])
+    parser.add_argument("--gamma", type=float, nargs="+", default=[0.99])
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=6)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sweep-seed", type=int, default=0)
+    parser.add_argument("--no-q", action="store_true", help="do not save the final Q tables")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    jobs = grid(algorithm=args.algorithms, seed=range(args.seeds), alpha=args.alpha, epsilon=args.epsilon,
+                gamma=args.gamma, episodes=[args.episodes], rows=[args.rows], cols=[args.cols])
+
+    start = time.perf_counter()
+    finished = 0
+    for result in run_sweep(jobs, args.out, args.workers, args.sweep_seed, save_q=not args.no_q):
+        finished += 1
+        print(f"[{finished}] {result['id']} {result['job']['algorithm']} seed={result['job']['seed']} "
+              f"{result['seconds']:.2f}s")
+    print(f"{finished} jobs run in {time.perf_counter() - start:.1f}s "
+          f"({len(jobs) - finished} already done in {args.out})")
+
+    tail = max(args.episodes // 10, 1)
+    print(f"\n{'algorithm':>10} {'alpha':>6} {'epsilon':>7} {'gamma':>6} {'n':>3} "
+          f"{'return (last ' + str(tail) + ' ep.)':>24} {'s/run':>6}")
+    summary = aggregate(iter_results(os.path.join(args.out, "results.jsonl")))
+    for key, s in sorted(summary.items()):
+        params = dict(key)
+        mean, low, high = s["mean"][-tail:].mean(), s["ci_low"][-tail:].mean(), s["ci_high"][-tail:].mean()
+        print(f"{params['algorithm']:>10} {params['alpha']:>6} {params['epsilon']:>7} {params['gamma']:>6} "
+              f"{s['n']:>3} {mean:>10.2f} [{low:.2f}, {high:.2f}] {s['seconds']:>6.2f}")
@@ -0,0 +1,153 @@
+import time
+
+# =========================
+# Budgets and stopping criteria for the tabular training loops
+# =========================
+# QLearningAgent.train, train_sarsa and train_double_qlearning take control=TrainingControl(...)
+# and stop at whichever comes first:
+#   episodes / env_steps / wall_seconds   budgets
+#   delta_tolerance, delta_window         the last delta_window updates all changed Q by
+#                                         less than delta_tolerance (running max |dQ| < tol)
+#   stable_episodes                       the greedy action of every state updated stayed
+#                                         the same for that many episodes in a row
+# max_episode_steps truncates a single episode (the next one starts from reset) without
+# stopping training. Budgets hit mid-episode end that episode at once.
+#
+# Everything is tracked incrementally by the loop's calls, O(1) per step:
+#   control.step()                        after every env step; True -> end the episode now
+#   control.update(row, delta, q_row)     after every Q update (q_row only if tracks_policy)
+#   control.end_episode(truncated)        after every episode; True -> stop training
+# The max over a window of updates is "all below tol", i.e. a count of consecutive updates
+# below tol reaching the window; the greedy policy is a dict row -> argmax, refreshed for
+# the one row each update touches (with a hashed Q table rows are reused after eviction,
+# which shows up as a policy change). control.report() says why and when training stopped.
+
+STOP_REASONS = ("episodes", "env_steps", "wall_time", "delta", "policy_stable")
+
+
+class TrainingReport:
+    def __init__(self, reason, episodes, env_steps, seconds, truncated_episodes, calm_updates, stable_for,
+                 last_max_delta):
+        self.reason = reason                          # one of STOP_REASONS
+        self.episodes = episodes                      # episodes run (truncated ones included)
+        self.env_steps = env_steps
+        self.seconds = seconds
+        self.truncated_episodes = truncated_episodes  # ended by max_episode_steps or a budget
+        self.calm_updates = calm_updates              # consecutive updates with |dQ| < delta_tolerance (or None)
+        self.stable_for = stable_for                  # episodes in a row without a greedy-policy change (or None)
+        self.last_max_delta = last_max_delta          # max |dQ| within the last episode
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return (f"TrainingReport(reason={self.reason!r}, episodes={self.episodes}, env_steps={self.env_steps}, "
+                f"seconds={self.seconds:.3f})")
+
+
+class TrainingControl:
+    def __init__(self, episodes=None, env_steps=None, wall_seconds=None, max_episode_steps=None,
+                 delta_tolerance=None, delta_window=1000, stable_episodes=None, clock_every=256):
+        self.episodes = episodes
+        self.env_steps = env_steps
+        self.wall_seconds = wall_seconds
+        self.max_episode_steps = max_episode_steps
+        self.delta_tolerance = delta_tolerance
+        self.delta_window = delta_window
+        self.stable_episodes = stable_episodes
+        self.clock_every = clock_every                # env steps between wall-clock reads
+        self.tracks_policy = stable_episodes is not None
+        self.reason = None
+
+    def start(self, episodes=None):
+        """
+        Reset the counters for a training run. `episodes` (the trainer's own episode
+        argument) caps this run on top of the control's episode budget.
+        """
+        budget = self.episodes
+        if episodes is not None:
+            budget = episodes if budget is None else min(budget, episodes)
+        if budget is None and self.env_steps is None and self.wall_seconds is None \
+                and self.delta_tolerance is None and self.stable_episodes is None:
+            raise ValueError("no budget or stopping criterion: training would never stop")
+        self._episode_budget = budget
+
+        self.reason = "episodes" if budget == 0 else None
+        self.episode = 0
+        self.steps = 0
+        self.truncated = 0
+        self._episode_steps = 0
+        self._started = time.perf_counter()
+        self._next_clock = self.clock_every
+        self._calm = 0
+        self._episode_max_delta = 0.0
+        self._last_max_delta = 0.0
+        self._policy = {}
+        self._policy_changed = False
+        self._stable_for = 0
+        self._seconds = 0.0
+        return self
+
+    @property
+    def stopped(self):
+        return self.reason is not None
+
+    def step(self):
+        """Count one env step; True if the episode has to end now."""
+        self.steps += 1
+        self._episode_steps += 1
+        if self.env_steps is not None and self.steps >= self.env_steps:
+            self.reason = "env_steps"
+            return True
+        if self.wall_seconds is not None and self.steps >= self._next_clock:
+            self._next_clock += self.clock_every
+            if time.perf_counter() - self._started >= self.wall_seconds:
+                self.reason = "wall_time"
+                return True
+        return self._episode_steps == self.max_episode_steps
+
+    def update(self, row, delta, q_row=None):
+        """Record one Q update of `row` by `delta`; q_row is the row's greedy-policy values."""
+        delta = abs(delta)
+        if delta > self._episode_max_delta:
+            self._episode_max_delta = delta
+        if self.delta_tolerance is not None:
+            self._calm = self._calm + 1 if delta < self.delta_tolerance else 0
+        if q_row is not None:
+            greedy = int(q_row.argmax())
+            if self._policy.get(row) != greedy:
+                self._policy[row] = greedy
+                self._policy_changed = True
+
+    def end_episode(self, truncated=False):
+        """Close an episode; True if training should stop."""
+        self.episode += 1
+        self.truncated += truncated
+        self._episode_steps = 0
+        self._last_max_delta, self._episode_max_delta = self._episode_max_delta, 0.0
+        self._stable_for = 0 if self._policy_changed else self._stable_for + 1
+        self._policy_changed = False
+
+        if self.reason is not None:                   # a budget ran out mid-episode
+            pass
+        elif self.delta_tolerance is not None and self._calm >= self.delta_window:
+            self.reason = "delta"
+        elif self.stable_episodes is not None and self._stable_for >= self.stable_episodes:
+            self.reason = "policy_stable"
+        elif self._episode_budget is not None and self.episode >= self._episode_budget:
+            self.reason = "episodes"
+        elif self.env_steps is not None and self.steps >= self.env_steps:
+            self.reason = "env_steps"
+        elif self.wall_seconds is not None and time.perf_counter() - self._started >= self.wall_seconds:
+            self.reason = "wall_time"
+        if self.reason is None:
+            return False
+        self._seconds = time.perf_counter() - self._started
+        return True
+
+    def report(self):
+        seconds = self._seconds if self.stopped else time.perf_counter() - self._started
+        return TrainingReport(self.reason, self.episode, self.steps, seconds, self.truncated,
+                              self._calm if self.delta_tolerance is not None else None,
+                              self._stable_for if self.tracks_policy else None,
+                              float(self._last_max_delta))
@@ -0,0 +1,107 @@
+import numpy as np
+
+from rl_utils.compiled_tables import grid_tables
+from rl_utils.rng import make_rng
+
+# =========================
+# Vectorized GridWorld
+# =========================
+# Same dynamics as GridWorld in Q-Learning/q_learning.py and the Environment classes in
+# SARSA/sarsa.py and Double Q-Learning/double-q_learning.py:
+#   actions 0=up, 1=right, 2=left, 3=down
+#   moving off the grid leaves the agent where it is
+#   reward -1 per step, 0 (and done) when the terminal cell is reached
+# but N agents are stored as flat state ids (row * cols + col) in one NumPy array,
+# so a single step() call moves every environment forward.
+# The dynamics are compiled into next_state/reward/done tables (rl_utils.compiled_tables),
+# so a step is one array lookup; any other compiled environment (e.g. the walled maze in
+# demos/test.py) can be run the same way through VectorGridWorld.from_tables.
+# slip > 0 makes the dynamics stochastic: each environment's action is replaced by a
+# uniformly random one with probability slip, drawn from rng (a seed or an rl_utils.rng
+# stream; None -> the shared global stream).
+# Run: python -m rl_utils.vector_gridworld   (from the repository root; steps/s demo)
+
+
+class VectorGridWorld:
+    def __init__(self, num_envs, rows, cols, start=(0, 0), terminal=None, tables=None, slip=0.0, rng=None):
+        self.num_envs = num_envs
+        self.rows = rows
+        self.cols = cols
+        self.num_states = rows * cols
+        self.start = start
+        self.terminal = terminal if terminal is not None else (rows - 1, cols - 1)
+        self.start_id = self.coord_to_state_id(*self.start)
+        self.terminal_id = self.coord_to_state_id(*self.terminal)
+
+        self.tables = tables if tables is not None else grid_tables(rows, cols, self.terminal)
+        self.num_actions = self.tables.num_actions
+        self.slip = slip
+        self.rng = make_rng(rng)
+
+        # current (already auto-reset) state of every environment
+        self.states = np.full(num_envs, self.start_id, dtype=np.int64)
+
+    @classmethod
+    def from_tables(cls, num_envs, tables, rows, cols, start=(0, 0), terminal=None, slip=0.0, rng=None):
+        return cls(num_envs, rows, cols, start=start, terminal=terminal, tables=tables, slip=slip, rng=rng)
+
+    def coord_to_state_id(self, row, col):
+        return row * self.cols + col
+
+    def state_id_to_coord(self, state_ids):
+        """Split flat ids into (rows, cols) arrays, e.g. for indexing a Q[rows, cols, actions] table."""
+        return np.divmod(state_ids, self.cols)
+
+    def reset(self):
+        self.states[:] = self.start_id
+        return self.states.copy()
+
+    def step(self, actions):
+        """
+        Move every environment by one step.
+        actions: int array of shape (num_envs,)
+        Returns (next_states, rewards, dones) as arrays of shape (num_envs,).
+        next_states are the cells actually reached (the terminal cell for finished
+        episodes), so they can be bootstrapped from; finished environments are reset
+        to the start cell internally and self.states holds the state to act from next.
+        """
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs,):
+            raise ValueError("Expected one action per environment")
+        if np.any((actions < 0) | (actions >= self.num_actions)):
+            raise ValueError("Invalid action")
+
+        if self.slip:
+            generator = self.rng.generator
+            slipped = generator.random(self.num_envs) < self.slip
+            actions = np.where(slipped, generator.integers(self.num_actions, size=self.num_envs), actions)
+
+        next_states, rewards, dones = self.tables.step(self.states, actions)
+
+        # auto-reset finished environments
+        self.states = np.where(dones, self.start_id, next_states)
+
+        return next_states, rewards, dones
+
+
+# =========================
+# Demo
+# =========================
+
+if __name__ == "__main__":
+    import time
+
+    num_envs, rows, cols = 10_000, 4, 4
+    env = VectorGridWorld(num_envs, rows, cols)
+    env.reset()
+
+    steps = 1_000
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = env.rng.generator.integers(env.num_actions, size=num_envs)
+        next_states, rewards, dones = env.step(actions)
+        episodes += int(dones.sum())
+    elapsed = time.perf_counter() - start
+
+    print(f"{num_envs * steps / elapsed:,.0f} env steps/sec, {episodes} episodes finished")